@@ -8,11 +8,13 @@ This script:
 4. Updates the database with the scores
 """
 
+import argparse
 import os
 import sys
+from functools import partial
+
 import torch
 import requests
-from pathlib import Path
 from PIL import Image
 from io import BytesIO
 from torchvision import transforms
@@ -23,30 +25,50 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import database and model modules
 from database import get_engine, MockProperty
-from niceness.scoring.modeltest import NicenessModel
+from model_registry import NICENESS_CHECKPOINT_PATH, registry
 
 # =====================
 # Configuration
 # =====================
-CHECKPOINT_PATH = Path(__file__).parent / "niceness" / "checkpoints" / "property_model.pth"
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 BATCH_SIZE = 1  # Process one image at a time for simplicity
 
+# Score through a running niceness/scoring/server.py instead of loading the model here
+NICENESS_SERVER_URL = os.getenv("NICENESS_SERVER_URL")
+# CPU runtime: eager | int8 | torchscript | onnx (the last two need NICENESS_ARTIFACT_PATH)
+NICENESS_RUNTIME = os.getenv("NICENESS_RUNTIME", "eager")
+NICENESS_ARTIFACT_PATH = os.getenv("NICENESS_ARTIFACT_PATH")
+# bf16/channels_last/compile for the eager runtime, set from --bf16/--channels-last/--compile
+ACCELERATION = {}
+# Persistent encoder embedding cache directory; rescoring after a head-only fine-tune skips the encoder
+NICENESS_EMBEDDING_CACHE = os.getenv("NICENESS_EMBEDDING_CACHE")
+# Also add the downloaded images to the CLIP index behind /search/photos (set to 0 to skip)
+PHOTO_SEARCH_INDEX = os.getenv("PHOTO_SEARCH_INDEX", "1") == "1"
+
 # =====================
 # Load Model
 # =====================
-print("Loading niceness model...")
-model = NicenessModel(embed_dim=1024)
-if CHECKPOINT_PATH.exists():
-    state_dict = torch.load(CHECKPOINT_PATH, map_location=DEVICE)
-    model.load_state_dict(state_dict)
-    print(f"✅ Model loaded from {CHECKPOINT_PATH}")
-else:
-    print(f"⚠️  Warning: Model checkpoint not found at {CHECKPOINT_PATH}")
-    print("Using untrained model (scores may not be meaningful)")
-
-model = model.to(DEVICE)
-model.eval()
+client = None
+if NICENESS_SERVER_URL:
+    from niceness.scoring.client import NicenessClient
+    client = NicenessClient(NICENESS_SERVER_URL)
+    print(f"Scoring via inference server at {NICENESS_SERVER_URL}")
+
+_embedding_cache = None
+
+
+def get_model():
+    """The niceness scorer, loaded through the model registry on first use."""
+    return registry.get("niceness")
+
+
+def get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None and NICENESS_EMBEDDING_CACHE and NICENESS_RUNTIME in ("eager", "int8"):
+        from niceness.scoring.embedding_cache import EmbeddingCache
+        _embedding_cache = EmbeddingCache.for_model(get_model(), NICENESS_EMBEDDING_CACHE)
+        print(f"Using embedding cache at {_embedding_cache.root} ({len(_embedding_cache)} embeddings)")
+    return _embedding_cache
 
 # Image preprocessing
 test_transform = transforms.Compose([
@@ -60,6 +82,17 @@ test_transform = transforms.Compose([
 # =====================
 # Image Scoring Function
 # =====================
+def download_image(image_url):
+    """Download an image, returning its bytes or None on error."""
+    try:
+        response = requests.get(image_url, timeout=10)
+        response.raise_for_status()
+        return response.content
+    except requests.RequestException as e:
+        print(f"  ❌ Error downloading image from {image_url}: {e}")
+        return None
+
+
 @torch.no_grad()
 def score_image_from_url(image_url):
     """
@@ -71,22 +104,35 @@ def score_image_from_url(image_url):
     Returns:
         float: Niceness score (0-10 scale) or None if error
     """
+    content = download_image(image_url)
+    return score_image_bytes(content) if content is not None else None
+
+
+@torch.no_grad()
+def score_image_bytes(content):
+    """Score an encoded image. Returns the niceness score or None on error."""
     try:
-        # Download image
-        response = requests.get(image_url, timeout=10)
-        response.raise_for_status()
+        if client is not None:
+            return client.score_bytes([content])[0]
+
+        model = get_model()
+        embedding_cache = get_embedding_cache()
+        if embedding_cache is not None:
+            from niceness.scoring.inference import score_sources_cached
+            return score_sources_cached(model, [content], embedding_cache)[0]
         
         # Open image
-        image = Image.open(BytesIO(response.content)).convert('RGB')
+        image = Image.open(BytesIO(content)).convert('RGB')
         
         # Preprocess and score
+        if NICENESS_RUNTIME != "eager" or any(ACCELERATION.values()):
+            from niceness.scoring.inference import score_batch
+            return score_batch(model, [image])[0]
+
         image_tensor = test_transform(image).unsqueeze(0).to(DEVICE)
         score = model.forward_ava(image_tensor)
         
         return score.item()
-    except requests.RequestException as e:
-        print(f"  ❌ Error downloading image from {image_url}: {e}")
-        return None
     except Exception as e:
         print(f"  ❌ Error processing image: {e}")
         return None
@@ -94,8 +140,17 @@ def score_image_from_url(image_url):
 # =====================
 # Main Scoring Process
 # =====================
-def apply_niceness_scores():
-    """Apply niceness scores to all properties in the database."""
+def apply_niceness_scores(acceleration=None):
+    """
+    Apply niceness scores to all properties in the database.
+
+    `acceleration` holds load_runtime's bf16/channels_last/compile options.
+    """
+    if acceleration and any(acceleration.values()):
+        from niceness.scoring.inference import load_runtime
+        ACCELERATION.update(acceleration)
+        registry.register("niceness", partial(load_runtime, NICENESS_RUNTIME, str(NICENESS_CHECKPOINT_PATH),
+                                              NICENESS_ARTIFACT_PATH, **acceleration))
     print("\n" + "="*60)
     print("Starting Niceness Score Application")
     print("="*60 + "\n")
@@ -118,6 +173,7 @@ def apply_niceness_scores():
         scored_count = 0
         skipped_count = 0
         error_count = 0
+        downloaded = []  # (bytes, property_id, url) for the photo search index
         
         for i, property_obj in enumerate(properties, 1):
             print(f"[{i}/{total_properties}] Processing property ID {property_obj.id}")
@@ -137,7 +193,10 @@ def apply_niceness_scores():
             
             # Score the image
             print(f"  📥 Downloading and scoring image...")
-            score = score_image_from_url(property_obj.image)
+            content = download_image(property_obj.image)
+            score = score_image_bytes(content) if content is not None else None
+            if content is not None:
+                downloaded.append((content, property_obj.id, property_obj.image))
             
             if score is not None:
                 # Update database
@@ -153,6 +212,14 @@ def apply_niceness_scores():
         
         # Commit all changes
         session.commit()
+
+        if PHOTO_SEARCH_INDEX and downloaded:
+            from photo_search import index_property_photos
+            try:
+                encoded = index_property_photos(downloaded)
+                print(f"🔎 Photo search index: {encoded} new photo(s) encoded\n")
+            except Exception as e:
+                print(f"⚠️  Could not update the photo search index: {e}\n")
         
         # Summary
         print("="*60)
@@ -190,8 +257,13 @@ def apply_niceness_scores():
         print("\n✅ Niceness scores have been applied to the database!\n")
 
 if __name__ == "__main__":
+    from niceness.scoring.acceleration import add_acceleration_args
+
+    parser = argparse.ArgumentParser(description="Apply niceness scores to property images in the database")
+    add_acceleration_args(parser)
+    args = parser.parse_args()
     try:
-        apply_niceness_scores()
+        apply_niceness_scores({"bf16": args.bf16, "channels_last": args.channels_last, "compile": args.compile})
     except KeyboardInterrupt:
         print("\n\n⚠️  Process interrupted by user")
         sys.exit(1)
@@ -5,20 +5,40 @@ Provides a small `/auth` router with `POST /auth/signup` and
 simple PBKDF2-based password hashing scheme. Returns a lightweight
 random token on signin and keeps an in-memory token->user mapping.
 
+Password hashing is deliberately slow, so it runs in a small dedicated
+thread pool (hashlib releases the GIL while hashing) rather than in the
+request threadpool shared with every other endpoint:
+
+- At most AUTH_HASH_WORKERS hashes run at once and AUTH_HASH_QUEUE_LIMIT
+  more may wait; beyond that requests get 429 with Retry-After.
+- Failed sign-ins are throttled per email (AUTH_EMAIL_MAX_FAILURES per
+  15 minutes), and all attempts per client IP (AUTH_IP_MAX_ATTEMPTS per
+  minute, 0 disables). Throttled requests get 429 before any hashing.
+- Hashes record their iteration count. When AUTH_PBKDF2_ITERATIONS changes
+  (or for hashes in the old salt$hash format) the password is rehashed
+  transparently on the next successful sign-in.
+
 Note: This is a minimal implementation for local/dev use. Replace the
 token generation and storage with a secure JWT/session store for
 production.
 """
 from __future__ import annotations
 
+import asyncio
 import os
 import secrets
 import hashlib
 import binascii
-from typing import Dict
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
 import database
@@ -27,6 +47,21 @@ from models import User
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+# =====================
+# Configuration
+# =====================
+HASH_ALGORITHM = "pbkdf2_sha256"
+HASH_ITERATIONS = int(os.getenv("AUTH_PBKDF2_ITERATIONS", "100000"))
+LEGACY_ITERATIONS = 100_000  # Hashes stored as salt$hash before iterations were recorded
+HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("AUTH_HASH_QUEUE_LIMIT", "16"))
+EMAIL_MAX_FAILURES = int(os.getenv("AUTH_EMAIL_MAX_FAILURES", "5"))
+EMAIL_WINDOW_SECONDS = 15 * 60
+IP_MAX_ATTEMPTS = int(os.getenv("AUTH_IP_MAX_ATTEMPTS", "30"))
+IP_WINDOW_SECONDS = 60
+THROTTLE_MAX_KEYS = int(os.getenv("AUTH_THROTTLE_MAX_KEYS", "100000"))  # Per throttle, least recent evicted
+RETRY_AFTER_SECONDS = 1
+
 
 class SignupRequest(BaseModel):
     name: str
@@ -47,53 +82,261 @@ class TokenResponse(BaseModel):
 TOKENS: Dict[str, int] = {}
 
 
-def _hash_password(password: str) -> str:
-    """Hash a password using PBKDF2-HMAC-SHA256 and return salt$hash hex."""
+# =====================
+# Password Hashing
+# =====================
+def _hash_password(password: str, iterations: int = HASH_ITERATIONS) -> str:
+    """Hash a password using PBKDF2-HMAC-SHA256 and return algorithm$iterations$salt$hash (hex)."""
     salt = os.urandom(16)
-    dk = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100_000)
-    return f"{binascii.hexlify(salt).decode()}${binascii.hexlify(dk).decode()}"
+    dk = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{HASH_ALGORITHM}${iterations}${binascii.hexlify(salt).decode()}${binascii.hexlify(dk).decode()}"
+
+
+def _parse_hash(stored: str) -> tuple[int, bytes, bytes]:
+    """(iterations, salt, hash) of a stored hash in either the current or the legacy salt$hash format."""
+    parts = stored.split("$")
+    if len(parts) == 2:
+        iterations, (salt_hex, hash_hex) = LEGACY_ITERATIONS, parts
+    elif len(parts) == 4 and parts[0] == HASH_ALGORITHM:
+        iterations, salt_hex, hash_hex = int(parts[1]), parts[2], parts[3]
+    else:
+        raise ValueError("unrecognised password hash format")
+    return iterations, binascii.unhexlify(salt_hex), binascii.unhexlify(hash_hex)
 
 
 def _verify_password(password: str, stored: str) -> bool:
     try:
-        salt_hex, hash_hex = stored.split("$")
-        salt = binascii.unhexlify(salt_hex)
-        expected = binascii.unhexlify(hash_hex)
-        dk = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100_000)
+        iterations, salt, expected = _parse_hash(stored)
+        dk = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
         return secrets.compare_digest(dk, expected)
     except Exception:
         return False
 
 
-@router.post("/signup")
-def signup(req: SignupRequest):
+def _needs_rehash(stored: str) -> bool:
+    """True for legacy-format hashes and hashes made with a different iteration count."""
+    try:
+        iterations, _, _ = _parse_hash(stored)
+    except Exception:
+        return False
+    return not stored.startswith(f"{HASH_ALGORITHM}$") or iterations != HASH_ITERATIONS
+
+
+_dummy_hash: Optional[str] = None
+_dummy_lock = threading.Lock()
+
+
+def _verify_unknown_user(password: str) -> bool:
+    """Spend the same time as a real verification so unknown emails cannot be told apart by latency."""
+    global _dummy_hash
+    with _dummy_lock:
+        if _dummy_hash is None:
+            _dummy_hash = _hash_password(secrets.token_urlsafe(16))
+    _verify_password(password, _dummy_hash)
+    return False
+
+
+class HashPool:
+    """Bounded worker pool for password hashing with admission control."""
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="pbkdf2")
+        self.slots = threading.BoundedSemaphore(max(1, workers) + max(0, queue_limit))
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` in the pool. Raises 429 when every worker is busy and the queue is full."""
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise HTTPException(status_code=429, detail="too many sign-in attempts in progress, retry shortly",
+                                headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        # Release the slot when the work finishes, even if the client has gone away
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    def _done(self, _future):
+        self.slots.release()
+        with self.lock:
+            self.completed += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"completed": self.completed, "rejected": self.rejected}
+
+
+hash_pool = HashPool()
+
+
+# =====================
+# Attempt Throttling
+# =====================
+class AttemptThrottle:
+    """
+    Sliding-window attempt counter per key (email or IP address).
+
+    Memory is bounded: every `record` drops keys whose attempts have all
+    expired, and beyond `max_keys` the least recently attempted key is
+    dropped, so spraying random emails cannot grow the table forever.
+    """
+
+    def __init__(self, max_attempts: int, window_seconds: float, max_keys: int = THROTTLE_MAX_KEYS):
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self.max_keys = max(1, max_keys)
+        self.attempts: "OrderedDict[str, deque]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _prune(self, key: str, now: float) -> Optional[deque]:
+        attempts = self.attempts.get(key)
+        if attempts is None:
+            return None
+        while attempts and now - attempts[0] > self.window_seconds:
+            attempts.popleft()
+        if not attempts:
+            del self.attempts[key]
+            return None
+        return attempts
+
+    def _sweep(self, now: float) -> None:
+        # Keys are in least-recently-attempted order, so expired ones are at the front;
+        # each key is swept at most once, so this is amortised O(1) per record
+        while self.attempts:
+            key, attempts = next(iter(self.attempts.items()))
+            if now - attempts[-1] <= self.window_seconds:
+                break
+            del self.attempts[key]
+
+    def retry_after(self, key: str) -> Optional[int]:
+        """Seconds until `key` may try again, or None if it is not throttled."""
+        if self.max_attempts <= 0:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            attempts = self._prune(key, now)
+            if attempts is None or len(attempts) < self.max_attempts:
+                return None
+            return max(1, int(self.window_seconds - (now - attempts[0])) + 1)
+
+    def record(self, key: str) -> None:
+        if self.max_attempts <= 0:
+            return
+        now = time.monotonic()
+        with self.lock:
+            self.attempts.setdefault(key, deque()).append(now)
+            self.attempts.move_to_end(key)
+            self._sweep(now)
+            while len(self.attempts) > self.max_keys:
+                self.attempts.popitem(last=False)
+
+    def reset(self, key: str) -> None:
+        with self.lock:
+            self.attempts.pop(key, None)
+
+
+email_throttle = AttemptThrottle(EMAIL_MAX_FAILURES, EMAIL_WINDOW_SECONDS)
+ip_throttle = AttemptThrottle(IP_MAX_ATTEMPTS, IP_WINDOW_SECONDS)
+
+
+def _check_throttle(throttle: AttemptThrottle, key: str) -> None:
+    retry_after = throttle.retry_after(key)
+    if retry_after is not None:
+        raise HTTPException(status_code=429, detail="too many attempts, try again later",
+                            headers={"Retry-After": str(retry_after)})
+
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+# =====================
+# Database Helpers
+# =====================
+def _find_user(email: str) -> Optional[User]:
     engine = database.get_engine()
     with Session(engine) as session:
-        statement = select(User).where(User.email == req.email)
-        existing = session.exec(statement).first()
-        if existing:
-            raise HTTPException(status_code=400, detail="email already registered")
+        return session.exec(select(User).where(User.email == email)).first()
 
-        user = User(name=req.name, email=req.email, hashed_password=_hash_password(req.password))
+
+def _create_user(name: str, email: str, hashed_password: str) -> Optional[User]:
+    """Insert a user; None if the email was registered concurrently."""
+    engine = database.get_engine()
+    with Session(engine) as session:
+        user = User(name=name, email=email, hashed_password=hashed_password)
         session.add(user)
-        session.commit()
+        try:
+            session.commit()
+        except IntegrityError:
+            return None
         session.refresh(user)
+        return user
 
-        return {"id": user.id, "name": user.name, "email": user.email}
 
-
-@router.post("/signin", response_model=TokenResponse)
-def signin(req: SigninRequest):
+def _update_password_hash(user_id: int, hashed_password: str) -> None:
     engine = database.get_engine()
     with Session(engine) as session:
-        statement = select(User).where(User.email == req.email)
-        user = session.exec(statement).first()
-        if not user or not _verify_password(req.password, user.hashed_password):
-            raise HTTPException(status_code=401, detail="invalid credentials")
+        user = session.get(User, user_id)
+        if user is not None:
+            user.hashed_password = hashed_password
+            session.add(user)
+            session.commit()
+
+
+# =====================
+# Endpoints
+# =====================
+@router.post("/signup")
+async def signup(req: SignupRequest, request: Request):
+    ip = _client_ip(request)
+    _check_throttle(ip_throttle, ip)
+    ip_throttle.record(ip)
+
+    if await run_in_threadpool(_find_user, req.email):
+        raise HTTPException(status_code=400, detail="email already registered")
+
+    hashed_password = await hash_pool.run(_hash_password, req.password)
+    user = await run_in_threadpool(_create_user, req.name, req.email, hashed_password)
+    if user is None:
+        raise HTTPException(status_code=400, detail="email already registered")
+
+    return {"id": user.id, "name": user.name, "email": user.email}
+
+
+@router.post("/signin", response_model=TokenResponse)
+async def signin(req: SigninRequest, request: Request):
+    ip = _client_ip(request)
+    email = req.email.lower()
+    _check_throttle(ip_throttle, ip)
+    _check_throttle(email_throttle, email)
+    ip_throttle.record(ip)
+
+    user = await run_in_threadpool(_find_user, req.email)
+    if user is None:
+        valid = await hash_pool.run(_verify_unknown_user, req.password)
+    else:
+        valid = await hash_pool.run(_verify_password, req.password, user.hashed_password)
+    if not valid:
+        email_throttle.record(email)
+        raise HTTPException(status_code=401, detail="invalid credentials")
+    email_throttle.reset(email)
+
+    if _needs_rehash(user.hashed_password):
+        try:
+            new_hash = await hash_pool.run(_hash_password, req.password)
+            await run_in_threadpool(_update_password_hash, user.id, new_hash)
+        except HTTPException:
+            pass  # Pool is saturated; the hash is upgraded on a later sign-in
 
-        token = secrets.token_urlsafe(32)
-        TOKENS[token] = user.id
-        return {"access_token": token}
+    token = secrets.token_urlsafe(32)
+    TOKENS[token] = user.id
+    return {"access_token": token}
 
 
-__all__ = ["router", "TOKENS"]
+__all__ = ["router", "TOKENS", "hash_pool"]
@@ -0,0 +1,171 @@
+"""
+Property endpoint latency during a sign-in storm.
+
+    python benchmark_auth.py --seconds 10 --storm-clients 64
+
+Starts the API in a uvicorn subprocess (throwaway SQLite database, no
+background indexing, output discarded) so the client threads below do not
+share its GIL, then measures `GET /properties/{id}` latency twice:
+once on its own and once while --storm-clients threads hammer
+`POST /auth/signin`. Prints p50/p95/p99 for both phases and the sign-in
+status counts (200 / 401 / 429). Exits non-zero when the storm p95 is more
+than --max-slowdown times the baseline p95.
+
+Per-IP throttling is disabled for the run (every request comes from
+127.0.0.1), so only the hashing pool's admission control protects the API.
+The clients and the API share the machine's CPUs, so on a one- or two-core
+box the storm phase also measures the cost of serving the storm's requests.
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# =====================
+# Configuration
+# =====================
+SECONDS = 10.0
+PROPERTY_CLIENTS = 4
+STORM_CLIENTS = 64
+MAX_SLOWDOWN = 2.0
+PASSWORD = "correct horse battery staple"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_api(port: int):
+    """Serve main:app in a subprocess with background startup work disabled. Returns (process, base URL)."""
+    env = dict(os.environ)
+    env.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(), "benchmark.db"))
+    env.update({
+        "SEMANTIC_INDEX_ON_STARTUP": "0",
+        "PHOTO_SEARCH_SYNC_ON_STARTUP": "0",
+        "AUTH_IP_MAX_ATTEMPTS": "0",
+        "AUTH_EMAIL_MAX_FAILURES": "0",
+    })
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API exited with status {process.returncode} during startup")
+        try:
+            if requests.get(f"{base_url}/properties/1", timeout=1).status_code < 500:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API did not start within 60s")
+
+
+def percentiles(latencies) -> dict:
+    if not latencies:
+        return {"n": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(latencies)
+
+    def at(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {"n": len(ordered), "p50": at(0.50), "p95": at(0.95), "p99": at(0.99)}
+
+
+def measure_properties(base_url: str, seconds: float, clients: int) -> list:
+    stop = time.monotonic() + seconds
+
+    def worker(_):
+        session, latencies = requests.Session(), []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            session.get(f"{base_url}/properties/1", timeout=30)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        return [latency for latencies in pool.map(worker, range(clients)) for latency in latencies]
+
+
+def sign_in_storm(base_url: str, clients: int, email: str, stop_event: threading.Event, statuses: Counter):
+    lock = threading.Lock()
+
+    def worker(i):
+        session = requests.Session()
+        # Mix of correct and wrong passwords, as in a credential-stuffing burst
+        payload = {"email": email, "password": PASSWORD if i % 4 == 0 else f"wrong-{i}"}
+        while not stop_event.is_set():
+            try:
+                status = session.post(f"{base_url}/auth/signin", json=payload, timeout=30).status_code
+            except requests.RequestException:
+                status = "error"
+            with lock:
+                statuses[status] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Property endpoint latency with and without a sign-in storm")
+    parser.add_argument("--seconds", type=float, default=SECONDS, help="Duration of each phase")
+    parser.add_argument("--property-clients", type=int, default=PROPERTY_CLIENTS)
+    parser.add_argument("--storm-clients", type=int, default=STORM_CLIENTS)
+    parser.add_argument("--max-slowdown", type=float, default=MAX_SLOWDOWN,
+                        help="Fail when storm p95 exceeds baseline p95 by this factor")
+    args = parser.parse_args(argv)
+
+    process, base_url = start_api(free_port())
+    email = "storm@example.com"
+    requests.post(f"{base_url}/auth/signup", json={"name": "Storm", "email": email, "password": PASSWORD},
+                  timeout=30)
+
+    print(f"Baseline: {args.property_clients} client(s) on GET /properties/1 for {args.seconds:.0f}s")
+    baseline = percentiles(measure_properties(base_url, args.seconds, args.property_clients))
+
+    print(f"Storm: + {args.storm_clients} client(s) on POST /auth/signin")
+    stop_event, statuses = threading.Event(), Counter()
+    threads = sign_in_storm(base_url, args.storm_clients, email, stop_event, statuses)
+    try:
+        storm = percentiles(measure_properties(base_url, args.seconds, args.property_clients))
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=30)
+        process.terminate()
+        process.wait(timeout=30)
+
+    print(f"\n{'phase':<10} {'requests':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, stats in (("baseline", baseline), ("storm", storm)):
+        print(f"{name:<10} {stats['n']:>9} {stats['p50']:>8.1f} {stats['p95']:>8.1f} {stats['p99']:>8.1f}")
+    print(f"\nSign-in responses: {dict(statuses)}")
+    print(f"CPUs: {os.cpu_count()}")
+
+    slowdown = storm["p95"] / baseline["p95"] if baseline["p95"] else float("inf")
+    print(f"\nStorm p95 is {slowdown:.2f}x baseline (limit {args.max_slowdown:.2f}x)")
+    if slowdown > args.max_slowdown:
+        print("❌ Property latency degraded during the sign-in storm")
+        return 1
+    print("✓ Property latency stayed flat")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
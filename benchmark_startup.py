@@ -0,0 +1,114 @@
+"""
+Import-time budget check for the API.
+
+    python benchmark_startup.py --budget 1.5 --runs 5
+
+Imports `main` in fresh interpreters (`python -X importtime`) and reports
+the median wall time and the slowest top-level imports. Exits non-zero when
+the median exceeds --budget seconds (IMPORT_BUDGET_SECONDS) or when any of
+the --forbid modules (torch, chromadb, ...) were imported, so it can gate
+CI and deploys. Importing main must not load models or connect to the
+database; those happen at startup or on first use.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# =====================
+# Configuration
+# =====================
+MODULE = "main"
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "2.0"))
+RUNS = 5
+FORBIDDEN_MODULES = [
+    "torch",
+    "torchvision",
+    "open_clip",
+    "sentence_transformers",
+    "chromadb",
+    "onnxruntime",
+]
+
+CHECK_SNIPPET = """
+import sys
+import {module}
+loaded = [name for name in {forbidden!r} if name in sys.modules]
+print("FORBIDDEN:" + ",".join(loaded))
+"""
+
+
+def run_once(module, forbidden, cwd):
+    """Import `module` in a fresh interpreter. Returns (seconds, forbidden modules loaded, importtime log)."""
+    code = CHECK_SNIPPET.format(module=module, forbidden=forbidden)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=cwd, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    loaded = []
+    for line in result.stdout.splitlines():
+        if line.startswith("FORBIDDEN:"):
+            loaded = [name for name in line[len("FORBIDDEN:"):].split(",") if name]
+    return elapsed, loaded, result.stderr
+
+
+def slowest_imports(importtime_log, top=10):
+    """Top-level packages with the largest cumulative import time, as (name, seconds)."""
+    totals = {}
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only count modules imported directly by the top level (no indentation)
+        if name.startswith("  "):
+            continue
+        name = name.strip()
+        totals[name] = totals.get(name, 0) + int(cumulative) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail when importing the API takes longer than a budget")
+    parser.add_argument("--module", default=MODULE)
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_SECONDS, help="Seconds (median)")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--forbid", nargs="*", default=FORBIDDEN_MODULES,
+                        help="Modules that must not be imported by the module")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    args = parser.parse_args(argv)
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    # The first run warms the filesystem and bytecode caches and is not counted
+    run_once(args.module, args.forbid, cwd)
+    times, loaded, log = [], set(), ""
+    for _ in range(args.runs):
+        elapsed, forbidden, log = run_once(args.module, args.forbid, cwd)
+        times.append(elapsed)
+        loaded.update(forbidden)
+
+    median = statistics.median(times)
+    print(f"import {args.module}: median {median:.3f}s, min {min(times):.3f}s, max {max(times):.3f}s "
+          f"over {args.runs} run(s) (budget {args.budget:.3f}s)")
+    print("\nSlowest imports (cumulative):")
+    for name, seconds in slowest_imports(log, args.top):
+        print(f"  {seconds:7.3f}s  {name}")
+
+    failed = False
+    if loaded:
+        print(f"\n❌ Heavy modules imported at import time: {', '.join(sorted(loaded))}")
+        failed = True
+    if median > args.budget:
+        print(f"\n❌ Import time {median:.3f}s is over the {args.budget:.3f}s budget")
+        failed = True
+    if not failed:
+        print("\n✓ Within budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
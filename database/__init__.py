@@ -1,10 +1,11 @@
 import logging, os
 import json
 from typing import Optional
-from sqlalchemy import Engine
+from sqlalchemy import Engine, event, inspect, or_, text
 from sqlmodel import create_engine, SQLModel, Session, Field, select
 
 from models import * # Needed to register models before SQLModel.metadata.create_all is called
+from models.costs import COST_VERSION, apply_costs
 
 log = logging.getLogger(__name__)
 
@@ -27,6 +28,12 @@ class MockProperty(SQLModel, table=True):
     description: Optional[str] = None
     image: Optional[str] = Field(default=None)  # URL to property image
     niceness_score: Optional[float] = Field(default=None)  # AI-generated aesthetic score
+    postcode: Optional[str] = Field(default=None, index=True)  # Normalised postcode parsed from address
+    latitude: Optional[float] = Field(default=None)  # Set by geo/geocoding.py backfill
+    longitude: Optional[float] = Field(default=None)
+    # Rent plus estimated bills per person per month, materialised by models/costs.py
+    total_monthly_cost_pp: Optional[float] = Field(default=None, index=True)
+    cost_version: Optional[str] = Field(default=None, index=True)
 
 
 class UserPreferences(SQLModel, table=True):
@@ -40,6 +47,126 @@ class UserPreferences(SQLModel, table=True):
     created_at: str = Field(default="")  # ISO timestamp
     updated_at: str = Field(default="")  # ISO timestamp
 
+
+class NicenessJob(SQLModel, table=True):
+    """Queued niceness scoring job for an uploaded property image"""
+    __tablename__ = "niceness_jobs"
+    __table_args__ = {'extend_existing': True}
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    property_id: int = Field(index=True)
+    image_path: str  # Local path of the image to score
+    status: str = Field(default="pending", index=True)  # pending | running | done | failed
+    score: Optional[float] = Field(default=None)
+    error: Optional[str] = Field(default=None)
+    created_at: str = Field(default="")  # ISO timestamp
+    updated_at: str = Field(default="")  # ISO timestamp
+    property_image_id: Optional[int] = Field(default=None, index=True)  # Gallery photo being scored
+
+
+class PropertyImage(SQLModel, table=True):
+    """One photo in a property's gallery, with its own niceness score"""
+    __tablename__ = "property_images"
+    __table_args__ = {'extend_existing': True}
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    property_id: int = Field(index=True)
+    image: str  # URL served under /images/
+    image_path: str  # Local path of the file
+    content_hash: str = Field(index=True)  # sha256 of the file, same key as the embedding cache
+    position: int = Field(default=0)  # Display order within the gallery
+    score: Optional[float] = Field(default=None)  # Per-photo niceness score, None until scored
+    created_at: str = Field(default="")  # ISO timestamp
+
+
+class PostcodeLocation(SQLModel, table=True):
+    """Persistent postcode -> coordinates cache for geo/geocoding.py"""
+    __tablename__ = "postcode_locations"
+    __table_args__ = {'extend_existing': True}
+
+    postcode: str = Field(primary_key=True)  # Normalised, e.g. "S1 2AB"
+    latitude: Optional[float] = Field(default=None)  # None when the postcode is unknown
+    longitude: Optional[float] = Field(default=None)
+    found: bool = Field(default=True)
+    fetched_at: str = Field(default="")  # ISO timestamp
+
+
+class PropertyLandmarkDistance(SQLModel, table=True):
+    """Distance from a property to a landmark, backfilled by geo/distances.py"""
+    __tablename__ = "property_landmark_distances"
+    __table_args__ = {'extend_existing': True}
+
+    property_id: int = Field(primary_key=True)
+    landmark_id: int = Field(primary_key=True, index=True)
+    distance_km: float = Field(index=True)
+    method: str = Field(default="andoyer")  # Formula used, see geo/distances.py
+    computed_at: str = Field(default="")  # ISO timestamp
+
+
+class EpcCacheEntry(SQLModel, table=True):
+    """Raw EPC API responses cached by enrichment/epc.py"""
+    __tablename__ = "epc_cache"
+    __table_args__ = {'extend_existing': True}
+
+    cache_key: str = Field(primary_key=True)  # "<POSTCODE>|<normalised address line 1>"
+    response: Optional[str] = Field(default=None)  # JSON of the first matching row, None if not found
+    found: bool = Field(default=True)
+    fetched_at: str = Field(default="")  # ISO timestamp
+    expires_at: str = Field(default="", index=True)  # ISO timestamp
+
+
+def migrate_missing_columns(engine: Engine) -> None:
+    """
+    Add columns declared on the models but missing from existing tables.
+
+    create_all only creates missing tables, so databases created before a
+    column was added (e.g. the committed database.db) would otherwise fail
+    on every query touching it. New columns must be nullable.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            added = [column for column in table.columns if column.name not in existing]
+            for column in added:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                log.info(f"Added column {table.name}.{column.name}")
+            for index in table.indexes:
+                if any(column in index.columns for column in added):
+                    index.create(conn, checkfirst=True)
+
+def _materialise_costs(mapper, connection, target):
+    apply_costs(target)
+
+
+# Keep total_monthly_cost_pp in step with rent/bills on every ORM insert and update
+for _model in (MockProperty, Property):
+    event.listen(_model, "before_insert", _materialise_costs)
+    event.listen(_model, "before_update", _materialise_costs)
+
+
+def refresh_stale_costs(engine: Engine, batch_size: int = 500) -> int:
+    """Recompute costs for rows computed with different constants (or never). Returns rows updated."""
+    updated = 0
+    with Session(engine) as session:
+        for model in (MockProperty, Property):
+            stale = or_(model.cost_version == None, model.cost_version != COST_VERSION)
+            while True:
+                rows = session.exec(select(model).where(stale).limit(batch_size)).all()
+                if not rows:
+                    break
+                for row in rows:
+                    apply_costs(row)
+                    session.add(row)
+                session.commit()
+                updated += len(rows)
+    if updated:
+        log.info(f"Recomputed total monthly cost for {updated} properties (cost version {COST_VERSION})")
+    return updated
+
 def init() -> Engine:
     db_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "database")
     os.makedirs(db_dir, exist_ok=True)
@@ -53,6 +180,8 @@ def init() -> Engine:
 
     engine = create_engine(connection_string, echo=True)
     SQLModel.metadata.create_all(engine)
+    migrate_missing_columns(engine)
+    refresh_stale_costs(engine)
     log.info(f"SQLite database initialized at: {connection_string}")
     return engine
 
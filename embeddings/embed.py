@@ -1,33 +1,109 @@
-7ygtfc import torch
+import torch
 import open_clip
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from PIL import Image
 
 class Embedder:
     def __init__(self, model_name='ViT-B-32', pretrained='laion2b_s34b_b79k', device=None):
         self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        self.model_name = model_name
+        self.pretrained = pretrained
         self.model, _, self.preprocess = open_clip.create_model_and_transforms(model_name, pretrained=pretrained)
         self.model = self.model.to(self.device)
+        self.model.eval()
         self.tokenizer = open_clip.get_tokenizer(model_name)
-lm 5rjm fc  stc3\z5f, [/]
-    def embed_text(self, text: str):
-        text_tokens = self.tokenizer([text]).to(self.device)
+
+    @staticmethod
+    def normalize(embeddings):
+        """L2-normalize each row, so dot products are cosine similarities."""
+        return embeddings / embeddings.norm(dim=-1, keepdim=True).clamp_min(1e-12)
+
+    def embed_text(self, text: str, normalize=True):
+        return self.embed_texts([text], normalize=normalize)
+
+    def embed_image(self, image_path: str, normalize=True):
+        return self.embed_images([image_path], normalize=normalize)
+
+    def embed_texts(self, texts, batch_size=64, normalize=True):
+        """Encode a list of strings. Returns a [N, D] float32 CPU tensor."""
+        chunks = []
         with torch.no_grad():
-            text_features = self.model.encode_text(text_tokens)
-        return text_features
+            for start in range(0, len(texts), batch_size):
+                text_tokens = self.tokenizer(list(texts[start:start + batch_size])).to(self.device)
+                chunks.append(self.model.encode_text(text_tokens).float().cpu())
+        embeddings = torch.cat(chunks) if chunks else torch.empty(0, self.embedding_dim)
+        return self.normalize(embeddings) if normalize else embeddings
+
+    def load_images(self, sources, num_workers=8):
+        """
+        Decode and preprocess images (paths or encoded bytes) in a thread pool.
+
+        Returns one preprocessed tensor per source, or None where decoding failed.
+        """
+        def load(source):
+            try:
+                if isinstance(source, (bytes, bytearray)):
+                    source = BytesIO(source)
+                with Image.open(source) as image:
+                    return self.preprocess(image.convert('RGB'))
+            except Exception as e:
+                print(f"Error loading image: {e}")
+                return None
 
-    def embed_image(self, image_path: str):
-        image = Image.open(image_path).convert('RGB')
-        image_input = self.preprocess(image).unsqueeze(0).to(self.device)
+        if num_workers <= 1 or len(sources) <= 1:
+            return [load(source) for source in sources]
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            return list(pool.map(load, sources))
+
+    def embed_preprocessed(self, tensors, batch_size=32, normalize=True):
+        """Encode preprocessed image tensors [C, H, W]. Returns a [N, D] float32 CPU tensor."""
+        chunks = []
         with torch.no_grad():
-            image_features = self.model.encode_image(image_input)
-        return image_features
+            for start in range(0, len(tensors), batch_size):
+                batch = torch.stack(tensors[start:start + batch_size]).to(self.device)
+                chunks.append(self.model.encode_image(batch).float().cpu())
+        embeddings = torch.cat(chunks) if chunks else torch.empty(0, self.embedding_dim)
+        return self.normalize(embeddings) if normalize else embeddings
+
+    def embed_images(self, sources, batch_size=32, num_workers=8, normalize=True):
+        """Encode images (paths or bytes), decoding in parallel. Raises ValueError if any fails to load."""
+        tensors = self.load_images(sources, num_workers)
+        failed = [i for i, tensor in enumerate(tensors) if tensor is None]
+        if failed:
+            raise ValueError(f"Could not load {len(failed)} image(s), first at index {failed[0]}")
+        return self.embed_preprocessed(tensors, batch_size, normalize)
+
+    @property
+    def embedding_dim(self):
+        return self.model.visual.output_dim
+
+    @staticmethod
+    def top_k_similarity(queries, keys, k=10, normalized=True):
+        """
+        Cosine similarity of every query [Q, D] against every key [N, D].
+
+        Returns (scores [Q, k], indices [Q, k]), best match first. Pass
+        normalized=False when the inputs are not already L2-normalized.
+        """
+        queries = torch.as_tensor(queries, dtype=torch.float32)
+        keys = torch.as_tensor(keys, dtype=torch.float32)
+        if queries.dim() == 1:
+            queries = queries.unsqueeze(0)
+        if not normalized:
+            queries, keys = Embedder.normalize(queries), Embedder.normalize(keys)
+        similarity = queries @ keys.T
+        return similarity.topk(min(k, keys.shape[0]), dim=1)
 
     @staticmethod
     def cosine_similarity(embedding1, embedding2):
         embedding1 = embedding1 / embedding1.norm(dim=-1, keepdim=True)
         embedding2 = embedding2 / embedding2.norm(dim=-1, keepdim=True)
-        similarity = (embedding1 @ embedding2.T).item()
-        return round(similarity * 100, 2)
+        similarity = embedding1 @ embedding2.T
+        if similarity.numel() == 1:
+            return round(similarity.item() * 100, 2)
+        # Pairwise matrix for batched inputs
+        return (similarity * 100).round(decimals=2)
 
     def similarity_image_text(self, image_embedding, text_embedding):
         return self.cosine_similarity(image_embedding, text_embedding)
@@ -36,4 +112,4 @@ lm 5rjm fc  stc3\z5f, [/]
         return self.cosine_similarity(text_embedding_one, text_embedding_two)
 
     def similarity_image_image(self, image_embedding_one, image_embedding_two):
-        return self.cosine_similarity(image_embedding_one, image_embedding_two)
\ No newline at end of file
+        return self.cosine_similarity(image_embedding_one, image_embedding_two)
@@ -0,0 +1,249 @@
+"""
+Persistent CLIP embedding store for property photos.
+
+Every photo is encoded once with the open_clip `Embedder` and stored
+L2-normalized, keyed by the sha256 of the file (the same key as the niceness
+embedding cache), so renamed or re-uploaded photos are never re-encoded.
+Each entry can carry metadata such as the property it belongs to. Layout:
+
+    <store_dir>/<model>-<pretrained>/
+        store.npz      vectors: [N, D] float16 matrix, one row per photo
+                       index:   JSON {"keys": [sha256, ...], "metadata": {sha256: {...}}}
+
+Vectors and index live in one file that `save()` replaces in a single
+rename, so a crash can never leave them out of step. Stores written as
+separate vectors.npy / index.json by older versions are still read, and
+are converted the next time they change.
+
+Index a directory of photos:
+
+    python photo_store.py --images-dir ../images
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+# =====================
+# Configuration
+# =====================
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "store")
+IMAGE_PATTERNS = ['*.jpg', '*.jpeg', '*.png', '*.webp', '*.avif', '*.gif']
+
+
+def file_hash(path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def source_key(source) -> str:
+    """Store key of an image given as a path or as encoded bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    return file_hash(source)
+
+
+class PhotoEmbeddingStore:
+    """In-memory matrix of normalized photo embeddings, saved to disk on `save()`."""
+
+    def __init__(self, model_name='ViT-B-32', pretrained='laion2b_s34b_b79k', store_dir=STORE_DIR):
+        self.root = os.path.join(store_dir, f"{model_name}-{pretrained}")
+        self.store_path = os.path.join(self.root, "store.npz")
+        self.legacy_paths = (os.path.join(self.root, "vectors.npy"), os.path.join(self.root, "index.json"))
+        self.lock = threading.Lock()
+        self.keys = []
+        self.metadata = {}
+        self.vectors = None
+        self.rows = {}
+        self._loaded_version = None
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        """Replace the in-memory store with the one on disk (if any)."""
+        if os.path.exists(self.store_path):
+            with np.load(self.store_path, allow_pickle=False) as data:
+                index = json.loads(str(data["index"]))
+                vectors = data["vectors"]
+            self._loaded_version = self._disk_version()
+        elif all(os.path.exists(path) for path in self.legacy_paths):
+            vectors_path, index_path = self.legacy_paths
+            with open(index_path) as f:
+                index = json.load(f)
+            vectors = np.load(vectors_path)
+        else:
+            return
+        self.keys = index["keys"]
+        self.metadata = index.get("metadata", {})
+        self.vectors = vectors if self.keys else None
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+
+    def _disk_version(self):
+        # Every save is a rename onto store.npz, so the inode changes even within one mtime tick
+        stat = os.stat(self.store_path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _changed_on_disk(self):
+        return os.path.exists(self.store_path) and self._disk_version() != self._loaded_version
+
+    def refresh(self):
+        """
+        Pick up entries another process saved since this store was loaded.
+
+        Unsaved local entries are kept and merged on top of the disk version.
+        """
+        with self.lock:
+            if not self._changed_on_disk():
+                return
+            local_keys, local_metadata = list(self.keys), dict(self.metadata)
+            local_vectors, dirty = self.vectors, self._dirty
+            self._load()
+            if dirty:
+                missing = [i for i, key in enumerate(local_keys) if key not in self.rows]
+                for i in missing:
+                    self.rows[local_keys[i]] = len(self.keys)
+                    self.keys.append(local_keys[i])
+                if missing:
+                    extra = local_vectors[missing]
+                    self.vectors = extra if self.vectors is None else np.concatenate([self.vectors, extra])
+                self.metadata.update(local_metadata)
+                self._dirty = True
+
+    @classmethod
+    def for_embedder(cls, embedder, store_dir=STORE_DIR):
+        return cls(embedder.model_name, embedder.pretrained, store_dir)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def add(self, keys, embeddings, metadata=None):
+        """Append embeddings [N, D] for new keys; existing keys only get their metadata updated."""
+        embeddings = np.asarray(embeddings, dtype=np.float16)
+        metadata = metadata or [None] * len(keys)
+        with self.lock:
+            new_rows = []
+            for key, embedding, meta in zip(keys, embeddings, metadata):
+                if meta is not None:
+                    self.metadata[key] = meta
+                if key in self.rows:
+                    continue
+                self.rows[key] = len(self.keys)
+                self.keys.append(key)
+                new_rows.append(embedding)
+            if new_rows:
+                stacked = np.stack(new_rows)
+                self.vectors = stacked if self.vectors is None else np.concatenate([self.vectors, stacked])
+            self._dirty = True
+
+    def set_metadata(self, key, metadata):
+        with self.lock:
+            self.metadata[key] = metadata
+            self._dirty = True
+
+    def get(self, keys) -> np.ndarray:
+        """Stored embeddings for `keys` (all must be present) as float32 [N, D]."""
+        return self.vectors[[self.rows[key] for key in keys]].astype(np.float32)
+
+    def search(self, queries, k=10):
+        """
+        Top-k stored photos for each normalized query embedding [D] or [Q, D].
+
+        Returns, per query, a list of (key, similarity, metadata) best first.
+        """
+        self.refresh()
+        if not self.keys:
+            return [[] for _ in range(1 if np.ndim(queries) == 1 else len(queries))]
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        with self.lock:
+            vectors, keys = self.vectors, list(self.keys)
+        similarity = queries @ vectors.astype(np.float32).T
+        k = min(k, len(keys))
+        top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        results = []
+        for q, candidates in enumerate(top):
+            order = candidates[np.argsort(-similarity[q, candidates])]
+            results.append([(keys[i], float(similarity[q, i]), self.metadata.get(keys[i])) for i in order])
+        return results
+
+    def save(self):
+        """Write the store atomically if anything changed since the last save."""
+        self.refresh()
+        with self.lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            vectors = self.vectors if self.vectors is not None else np.empty((0, 0), np.float16)
+            index = json.dumps({"keys": self.keys, "metadata": self.metadata})
+            tmp_path = self.store_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, vectors=vectors, index=np.array(index))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.store_path)
+            self._loaded_version = self._disk_version()
+            self._dirty = False
+            for path in self.legacy_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def index_images(self, embedder, sources, metadata=None, batch_size=32, num_workers=8, keys=None) -> int:
+        """
+        Make sure every photo in `sources` (paths or encoded bytes) is in the
+        store, encoding only unseen ones.
+
+        `metadata` is an optional list (one dict per source) stored with each
+        entry; `keys` may pass precomputed `source_key`s. Returns the number
+        of photos encoded.
+        """
+        metadata = metadata or [None] * len(sources)
+        pending = {}
+        for i, (source, meta) in enumerate(zip(sources, metadata)):
+            try:
+                key = keys[i] if keys is not None else source_key(source)
+            except OSError as e:
+                print(f"Skipping {source}: {e}")
+                continue
+            if key in self.rows:
+                if meta is not None:
+                    self.set_metadata(key, meta)
+            elif key not in pending:
+                pending[key] = (source, meta)
+
+        encoded = 0
+        items = list(pending.items())
+        for start in range(0, len(items), batch_size):
+            chunk = items[start:start + batch_size]
+            tensors = embedder.load_images([source for _, (source, _) in chunk], num_workers)
+            loaded = [(key, meta, tensor) for (key, (_, meta)), tensor in zip(chunk, tensors) if tensor is not None]
+            if not loaded:
+                continue
+            embeddings = embedder.embed_preprocessed([tensor for _, _, tensor in loaded], batch_size)
+            self.add([key for key, _, _ in loaded], embeddings.numpy(), [meta for _, meta, _ in loaded])
+            encoded += len(loaded)
+        self.save()
+        return encoded
+
+
+if __name__ == "__main__":
+    from embed import Embedder
+
+    parser = argparse.ArgumentParser(description="Build or update the CLIP photo embedding store")
+    parser.add_argument("--images-dir", default="images")
+    parser.add_argument("--store-dir", default=STORE_DIR)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=8, help="Decode threads")
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(args.images_dir, pattern))})
+    embedder = Embedder()
+    store = PhotoEmbeddingStore.for_embedder(embedder, args.store_dir)
+    encoded = store.index_images(embedder, paths, [{"image_path": p} for p in paths], args.batch_size, args.workers)
+    print(f"✓ Encoded {encoded} new photo(s); store has {len(store)} at {store.root}")
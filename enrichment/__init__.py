@@ -0,0 +1,8 @@
+"""enrichment package
+
+Batch jobs that enrich properties with data from external APIs. Submodules
+only need the standard library, requests and the database models; import
+them explicitly: `from enrichment import epc`.
+"""
+
+__all__ = ["epc", "epc_stub_server"]
@@ -0,0 +1,247 @@
+"""
+Batch EPC enrichment for `models.property.Property`.
+
+EPC records are fetched from the Open Data Communities API by address and
+postcode. Several requests run at once (--workers), all sharing one
+token-bucket rate limit (--rate requests/second), and timeouts, 429s and
+5xx responses are retried with backoff. Raw records go into the
+`epc_cache` table, so re-running only fetches new or expired addresses:
+found records are kept for CACHE_TTL_DAYS, misses for NOT_FOUND_TTL_DAYS.
+
+Each property then gets its EPC rating, floor area, estimated annual energy
+consumption and annual energy cost stored as columns (`Property.apply_epc`).
+
+    python -m enrichment.epc --workers 8 --rate 10
+
+Point EPC_API_URL (or --base-url) at enrichment/epc_stub_server.py to run
+without the real API.
+"""
+
+import argparse
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlmodel import Session, select
+
+from database import EpcCacheEntry
+from http_retry import MAX_RETRIES, RequestError, request_with_retry
+from models import Property
+from models.property import EPC_API_BASE_URL, EPC_API_KEY
+
+log = logging.getLogger(__name__)
+
+# =====================
+# Configuration
+# =====================
+MAX_WORKERS = 4
+RATE_LIMIT_PER_SECOND = 5.0
+TIMEOUT_SECONDS = 15
+CACHE_TTL_DAYS = 90
+NOT_FOUND_TTL_DAYS = 7
+
+
+class EpcError(RequestError):
+    pass
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` acquisitions per second, with bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def epc_cache_key(address_line_1: str, postcode: str) -> str:
+    address = re.sub(r"[^a-z0-9]+", " ", (address_line_1 or "").lower()).strip()
+    postcode = re.sub(r"\s+", "", postcode or "").upper()
+    return f"{postcode}|{address}"
+
+
+# =====================
+# EPC API
+# =====================
+def fetch_epc(address_line_1: str, postcode: str, limiter: RateLimiter, base_url: str = EPC_API_BASE_URL,
+              api_key: Optional[str] = EPC_API_KEY, retries: int = MAX_RETRIES,
+              timeout: float = TIMEOUT_SECONDS) -> Optional[dict]:
+    """
+    The best matching EPC row for an address, or None if there is none.
+
+    Every attempt waits for the shared rate limiter. Raises EpcError for
+    non-retryable statuses (e.g. 401 without EPC_API_KEY), invalid
+    responses, and when retries run out.
+    """
+    headers = {"Accept": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Basic {api_key}"
+    description = f"EPC lookup for {address_line_1}, {postcode}"
+    response = request_with_retry(
+        "GET", base_url, retries, timeout, EpcError, description, before_attempt=limiter.acquire,
+        params={"address": address_line_1, "postcode": postcode, "size": 1}, headers=headers,
+    )
+    # The API answers 200 with an empty body when nothing matches
+    if not response.content.strip():
+        return None
+    try:
+        rows = response.json().get("rows") or []
+    except (ValueError, AttributeError) as e:
+        raise EpcError(f"{description} returned an invalid body: {e}") from e
+    return rows[0] if rows else None
+
+
+def fetch_epcs(queries: Iterable[tuple], max_workers: int = MAX_WORKERS, rate: float = RATE_LIMIT_PER_SECOND,
+               **fetch_kwargs) -> dict:
+    """
+    Fetch (address_line_1, postcode) queries concurrently under one rate limit.
+
+    Returns {cache key: row or None}; queries that kept failing are left out and logged.
+    """
+    unique = {epc_cache_key(address, postcode): (address, postcode) for address, postcode in queries}
+    limiter = RateLimiter(rate)
+
+    def fetch(item):
+        key, (address, postcode) = item
+        try:
+            return key, fetch_epc(address, postcode, limiter, **fetch_kwargs), None
+        except EpcError as e:
+            return key, None, e
+
+    results, failed = {}, 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for key, row, error in pool.map(fetch, unique.items()):
+            if error is not None:
+                log.warning(str(error))
+                failed += 1
+            else:
+                results[key] = row
+    if failed:
+        log.warning(f"{failed}/{len(unique)} EPC lookup(s) failed and were not cached")
+    return results
+
+
+# =====================
+# Cache
+# =====================
+def cached_epcs(session: Session, queries: Iterable[tuple], refresh: bool = False, **fetch_kwargs) -> dict:
+    """
+    {cache key: EPC row or None} for (address_line_1, postcode) queries,
+    fetching only uncached or expired ones (all with refresh=True). New
+    cache rows are committed.
+    """
+    queries = {epc_cache_key(address, postcode): (address, postcode) for address, postcode in queries}
+    if not queries:
+        return {}
+    now = datetime.now()
+    cached = {entry.cache_key: entry for entry in session.exec(
+        select(EpcCacheEntry).where(EpcCacheEntry.cache_key.in_(list(queries)))
+    ).all()}
+
+    results, missing = {}, []
+    for key, query in queries.items():
+        entry = cached.get(key)
+        if not refresh and entry is not None and entry.expires_at > now.isoformat():
+            results[key] = json.loads(entry.response) if entry.found else None
+        else:
+            missing.append(query)
+
+    if missing:
+        fetched = fetch_epcs(missing, **fetch_kwargs)
+        for key, row in fetched.items():
+            ttl = CACHE_TTL_DAYS if row is not None else NOT_FOUND_TTL_DAYS
+            entry = cached.get(key) or EpcCacheEntry(cache_key=key)
+            entry.response = json.dumps(row) if row is not None else None
+            entry.found = row is not None
+            entry.fetched_at = now.isoformat()
+            entry.expires_at = (now + timedelta(days=ttl)).isoformat()
+            session.add(entry)
+            results[key] = row
+        session.commit()
+        log.info(f"Fetched {len(fetched)}/{len(missing)} EPC record(s); {len(queries) - len(missing)} from cache")
+    return results
+
+
+# =====================
+# Enrichment Job
+# =====================
+def enrich_properties(session: Session, refresh: bool = False, **fetch_kwargs) -> dict:
+    """
+    Store EPC-derived energy columns on properties that have none (all with
+    refresh=True, which also bypasses the cache). Returns counts.
+    """
+    statement = select(Property)
+    if not refresh:
+        statement = statement.where(Property.energy_cost_annual == None)
+    properties = session.exec(statement).all()
+
+    stats = {"properties": len(properties), "enriched": 0, "not_found": 0, "failed": 0}
+    records = cached_epcs(session, [(p.address_line_1, p.postcode) for p in properties], refresh=refresh,
+                          **fetch_kwargs)
+    for property_obj in properties:
+        key = epc_cache_key(property_obj.address_line_1, property_obj.postcode)
+        if key not in records:
+            stats["failed"] += 1
+            continue
+        epc = records[key]
+        if epc is None:
+            stats["not_found"] += 1
+            continue
+        try:
+            property_obj.apply_epc(epc)
+        except (KeyError, TypeError, ValueError) as e:
+            log.warning(f"Unusable EPC record for property {property_obj.id}: {e}")
+            stats["failed"] += 1
+            continue
+        session.add(property_obj)
+        stats["enriched"] += 1
+    session.commit()
+    return stats
+
+
+__all__ = [
+    "EpcError",
+    "RateLimiter",
+    "epc_cache_key",
+    "fetch_epc",
+    "fetch_epcs",
+    "cached_epcs",
+    "enrich_properties",
+]
+
+
+if __name__ == "__main__":
+    from database import get_engine
+
+    parser = argparse.ArgumentParser(description="Enrich properties with EPC energy data")
+    parser.add_argument("--refresh", action="store_true", help="Re-fetch every property, ignoring the cache")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Requests in flight")
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT_PER_SECOND, help="Requests per second")
+    parser.add_argument("--base-url", default=EPC_API_BASE_URL, help="EPC API (or stub server) search URL")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with Session(get_engine()) as session:
+        stats = enrich_properties(session, args.refresh, max_workers=args.workers, rate=args.rate,
+                                  base_url=args.base_url)
+    print(f"✓ Enriched {stats['enriched']}/{stats['properties']} properties in {time.perf_counter() - start:.1f}s "
+          f"({stats['not_found']} without an EPC, {stats['failed']} failed)")
@@ -0,0 +1,145 @@
+"""
+Local stand-in for the EPC domestic search API.
+
+    python -m enrichment.epc_stub_server --port 8767 --max-rps 10
+    EPC_API_URL=http://127.0.0.1:8767/api/v1/domestic/search python -m enrichment.epc
+
+Serves `GET /api/v1/domestic/search?address=...&postcode=...` with one
+deterministic record per address, shaped like the real API's rows, so
+enrichment runs are repeatable:
+
+    {"column-names": [...], "rows": [{"lmk-key", "address1", "postcode",
+     "current-energy-rating", "energy-consumption-current", "total-floor-area"}]}
+
+Postcodes ending in "ZZ" have no certificate (200 with an empty body, as
+the real API does). Requests beyond --max-rps in any one-second window get
+429, so client rate limiting can be checked via GET /stats.
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# =====================
+# Configuration
+# =====================
+HOST = "127.0.0.1"
+PORT = 8767
+SEARCH_PATH = "/api/v1/domestic/search"
+RATINGS = "ABCDEFG"
+COLUMNS = ["lmk-key", "address1", "postcode", "current-energy-rating", "energy-consumption-current",
+           "total-floor-area"]
+
+
+def fake_record(address: str, postcode: str):
+    """Deterministic EPC row for an address, or None when the postcode ends in "ZZ"."""
+    compact = postcode.replace(" ", "").upper()
+    if compact.endswith("ZZ"):
+        return None
+    digest = hashlib.sha1(f"{address.lower().strip()}|{compact}".encode()).digest()
+    return {
+        "lmk-key": digest.hex()[:32],
+        "address1": address,
+        "postcode": postcode,
+        "current-energy-rating": RATINGS[digest[0] % len(RATINGS)],
+        "energy-consumption-current": str(100 + digest[1] % 250),  # kWh/m2 per year
+        "total-floor-area": f"{40 + digest[2] % 120}.0",
+    }
+
+
+class EpcRequestHandler(BaseHTTPRequestHandler):
+    max_rps = 0
+    latency_ms = 0.0
+    counters = None  # {"requests", "throttled", "peak_rps"}, shared per server
+    window = None  # [second, requests in that second]
+    lock = None
+
+    def _send(self, status: int, body: bytes, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            with self.lock:
+                self._send(200, json.dumps(self.counters).encode())
+            return
+        if url.path != SEARCH_PATH:
+            self._send(404, b'{"error": "Not found"}')
+            return
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self.lock:
+            second = int(time.monotonic())
+            if self.window[0] != second:
+                self.window[:] = [second, 0]
+            self.window[1] += 1
+            self.counters["requests"] += 1
+            self.counters["peak_rps"] = max(self.counters["peak_rps"], self.window[1])
+            throttled = self.max_rps and self.window[1] > self.max_rps
+            if throttled:
+                self.counters["throttled"] += 1
+        if throttled:
+            self._send(429, b'{"error": "Too many requests"}', {"Retry-After": "1"})
+            return
+
+        query = parse_qs(url.query)
+        record = fake_record(query.get("address", [""])[0], query.get("postcode", [""])[0])
+        if record is None:
+            self._send(200, b"")
+        else:
+            self._send(200, json.dumps({"column-names": COLUMNS, "rows": [record]}).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host=HOST, port=PORT, max_rps=0, latency_ms=0.0):
+    """Create (but do not start) the stub server; port=0 picks a free port."""
+    counters = {"requests": 0, "throttled": 0, "peak_rps": 0}
+    handler = type("BoundEpcRequestHandler", (EpcRequestHandler,), {
+        "max_rps": max_rps,
+        "latency_ms": latency_ms,
+        "counters": counters,
+        "window": [0, 0],
+        "lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.counters = counters
+    return server
+
+
+def start_in_background(**kwargs):
+    """Start a stub server on a daemon thread. Returns (server, search URL)."""
+    server = make_server(**{"port": 0, **kwargs})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{server.server_address[0]}:{server.server_address[1]}{SEARCH_PATH}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local EPC API stand-in")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--max-rps", type=int, default=0, help="Answer requests beyond this rate with 429")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.max_rps, args.latency_ms)
+    print(f"Serving EPC API stub on http://{args.host}:{args.port}{SEARCH_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
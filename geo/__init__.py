@@ -0,0 +1,8 @@
+"""geo package
+
+Geocoding and location helpers for properties. Submodules only need the
+standard library, requests, NumPy and the database models; import them explicitly:
+`from geo import geocoding`.
+"""
+
+__all__ = ["geocoding", "distances", "spatial_index", "postcodes_stub_server"]
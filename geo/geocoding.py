@@ -0,0 +1,250 @@
+"""
+Bulk postcode geocoding with a persistent cache.
+
+Postcodes are parsed from free-text addresses, looked up in the
+`postcode_locations` table and only the misses go to postcodes.io, 100 per
+bulk `POST /postcodes` request, with a few requests in flight at once and
+retries (with backoff) on timeouts, 429 and 5xx responses. Unknown postcodes
+are cached too, and looked up again after NOT_FOUND_TTL_DAYS.
+
+Backfill coordinates for every property that has none:
+
+    python -m geo.geocoding --backfill
+
+Point POSTCODES_IO_URL (or --base-url) at geo/postcodes_stub_server.py to
+run without the real API.
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlmodel import Session, select
+
+from database import MockProperty, PostcodeLocation
+from http_retry import MAX_RETRIES, RequestError, request_with_retry
+
+log = logging.getLogger(__name__)
+
+# =====================
+# Configuration
+# =====================
+POSTCODES_IO_URL = os.getenv("POSTCODES_IO_URL", "https://api.postcodes.io")
+BULK_LIMIT = 100  # postcodes.io accepts at most 100 postcodes per bulk request
+MAX_WORKERS = 4
+TIMEOUT_SECONDS = 10
+NOT_FOUND_TTL_DAYS = 30
+
+# Outward code (A9, A99, A9A, AA9, AA99, AA9A) followed by inward code (9AA)
+POSTCODE_PATTERN = re.compile(r"\b([A-Z]{1,2}\d[A-Z\d]?)\s*(\d[A-Z]{2})\b", re.IGNORECASE)
+
+
+class GeocodingError(RequestError):
+    pass
+
+
+# =====================
+# Postcodes
+# =====================
+def normalize_postcode(postcode: str) -> str:
+    """Upper-case postcode with a single space before the inward code, e.g. "s12ab" -> "S1 2AB"."""
+    compact = re.sub(r"\s+", "", postcode).upper()
+    return f"{compact[:-3]} {compact[-3:]}"
+
+
+def extract_postcode(address: Optional[str]) -> Optional[str]:
+    """The last UK postcode in a free-text address, normalised, or None."""
+    if not address:
+        return None
+    matches = POSTCODE_PATTERN.findall(address)
+    if not matches:
+        return None
+    outward, inward = matches[-1]
+    return normalize_postcode(outward + inward)
+
+
+# =====================
+# postcodes.io
+# =====================
+def _post_bulk(url: str, payload: dict, retries: int, timeout: float) -> dict:
+    """POST a bulk query and return the JSON body. Raises GeocodingError on any failure once retries run out."""
+    response = request_with_retry("POST", url, retries, timeout, GeocodingError, json=payload)
+    try:
+        body = response.json()
+    except ValueError as e:
+        raise GeocodingError(f"POST {url} returned invalid JSON: {e}") from e
+    if not isinstance(body, dict):
+        raise GeocodingError(f"POST {url} returned an unexpected body")
+    return body
+
+
+def lookup_postcodes(postcodes: Iterable[str], base_url: str = POSTCODES_IO_URL, max_workers: int = MAX_WORKERS,
+                     retries: int = MAX_RETRIES, timeout: float = TIMEOUT_SECONDS) -> dict:
+    """
+    Geocode postcodes with the postcodes.io bulk API (no cache).
+
+    Returns {postcode: (latitude, longitude) or None if unknown}. Postcodes
+    in a chunk whose request kept failing are left out and logged.
+    """
+    postcodes = sorted({normalize_postcode(postcode) for postcode in postcodes})
+    chunks = [postcodes[i:i + BULK_LIMIT] for i in range(0, len(postcodes), BULK_LIMIT)]
+    url = f"{base_url.rstrip('/')}/postcodes"
+
+    def fetch(chunk):
+        try:
+            items = _post_bulk(url, {"postcodes": chunk}, retries, timeout).get("result") or []
+            locations = {}
+            for item in items:
+                result = item.get("result")
+                location = (result["latitude"], result["longitude"]) if result else None
+                if location is not None and None in location:
+                    location = None  # postcodes.io has a few postcodes without coordinates
+                locations[normalize_postcode(item["query"])] = location
+            return locations
+        except GeocodingError as e:
+            log.warning(f"Skipping {len(chunk)} postcode(s): {e}")
+        except (AttributeError, KeyError, TypeError) as e:
+            log.warning(f"Skipping {len(chunk)} postcode(s): malformed response ({e!r})")
+        return {}
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks) or 1))) as pool:
+        for locations in pool.map(fetch, chunks):
+            results.update(locations)
+    return results
+
+
+# =====================
+# Cached Geocoding
+# =====================
+def _is_fresh(entry: PostcodeLocation, now: datetime) -> bool:
+    if entry.found:
+        return True
+    try:
+        return now - datetime.fromisoformat(entry.fetched_at) < timedelta(days=NOT_FOUND_TTL_DAYS)
+    except ValueError:
+        return False
+
+
+def geocode_postcodes(session: Session, postcodes: Iterable[str], **lookup_kwargs) -> dict:
+    """
+    {postcode: (latitude, longitude) or None} using the cache table, looking up
+    only missing (or expired not-found) postcodes. Keys are normalised
+    postcodes. The new cache rows are committed.
+    """
+    wanted = {normalize_postcode(postcode) for postcode in postcodes if postcode}
+    if not wanted:
+        return {}
+    now = datetime.now()
+    cached = {entry.postcode: entry for entry in session.exec(
+        select(PostcodeLocation).where(PostcodeLocation.postcode.in_(wanted))
+    ).all()}
+
+    results = {}
+    missing = []
+    for postcode in wanted:
+        entry = cached.get(postcode)
+        if entry is not None and _is_fresh(entry, now):
+            results[postcode] = (entry.latitude, entry.longitude) if entry.found else None
+        else:
+            missing.append(postcode)
+
+    if missing:
+        fetched = lookup_postcodes(missing, **lookup_kwargs)
+        timestamp = now.isoformat()
+        for postcode, location in fetched.items():
+            entry = cached.get(postcode) or PostcodeLocation(postcode=postcode)
+            entry.latitude, entry.longitude = location if location else (None, None)
+            entry.found = location is not None
+            entry.fetched_at = timestamp
+            session.add(entry)
+            results[postcode] = location
+        session.commit()
+        log.info(f"Geocoded {len(fetched)}/{len(missing)} postcode(s); {len(wanted) - len(missing)} from cache")
+    return results
+
+
+def geocode_postcode(postcode: str, session: Optional[Session] = None, **lookup_kwargs):
+    """(latitude, longitude) of one postcode, or None if unknown."""
+    if session is None:
+        from database import get_engine
+        with Session(get_engine()) as session:
+            return geocode_postcode(postcode, session, **lookup_kwargs)
+    return geocode_postcodes(session, [postcode], **lookup_kwargs).get(normalize_postcode(postcode))
+
+
+def backfill_property_locations(session: Session, refresh: bool = False, **lookup_kwargs) -> dict:
+    """
+    Parse postcodes and set coordinates on properties that have none (all
+    properties with refresh=True), geocoding every distinct postcode in one
+    bulk pass. Returns counts of what happened.
+    """
+    statement = select(MockProperty)
+    if not refresh:
+        statement = statement.where(MockProperty.latitude == None)
+    properties = session.exec(statement).all()
+
+    stats = {"properties": len(properties), "geocoded": 0, "no_postcode": 0, "not_found": 0}
+    by_postcode = {}
+    for property_obj in properties:
+        postcode = extract_postcode(property_obj.address)
+        if postcode is None:
+            stats["no_postcode"] += 1
+            continue
+        property_obj.postcode = postcode
+        by_postcode.setdefault(postcode, []).append(property_obj)
+
+    locations = geocode_postcodes(session, by_postcode, **lookup_kwargs)
+    for postcode, properties_at in by_postcode.items():
+        location = locations.get(postcode)
+        for property_obj in properties_at:
+            if location is None:
+                stats["not_found"] += 1
+            else:
+                property_obj.latitude, property_obj.longitude = location
+                stats["geocoded"] += 1
+            session.add(property_obj)
+    session.commit()
+    return stats
+
+
+__all__ = [
+    "GeocodingError",
+    "normalize_postcode",
+    "extract_postcode",
+    "lookup_postcodes",
+    "geocode_postcodes",
+    "geocode_postcode",
+    "backfill_property_locations",
+]
+
+
+if __name__ == "__main__":
+    from database import get_engine
+
+    parser = argparse.ArgumentParser(description="Geocode property postcodes into the database")
+    parser.add_argument("--backfill", action="store_true", help="Set coordinates on properties")
+    parser.add_argument("--refresh", action="store_true", help="Re-geocode properties that already have coordinates")
+    parser.add_argument("--postcodes", nargs="*", default=[], help="Geocode these postcodes and print them")
+    parser.add_argument("--base-url", default=POSTCODES_IO_URL, help="postcodes.io (or stub server) base URL")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Bulk requests in flight")
+    args = parser.parse_args()
+    if not args.backfill and not args.postcodes:
+        parser.error("nothing to do: pass --backfill and/or --postcodes")
+
+    lookup_kwargs = {"base_url": args.base_url, "max_workers": args.workers}
+    with Session(get_engine()) as session:
+        if args.postcodes:
+            for postcode, location in sorted(geocode_postcodes(session, args.postcodes, **lookup_kwargs).items()):
+                print(f"{postcode}: {location if location else 'not found'}")
+        if args.backfill:
+            start = time.perf_counter()
+            stats = backfill_property_locations(session, refresh=args.refresh, **lookup_kwargs)
+            print(f"✓ Backfilled {stats['geocoded']}/{stats['properties']} properties in "
+                  f"{time.perf_counter() - start:.2f}s ({stats['no_postcode']} without a postcode, "
+                  f"{stats['not_found']} unknown postcodes)")
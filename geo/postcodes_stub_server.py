@@ -0,0 +1,170 @@
+"""
+Local stand-in for the postcodes.io API.
+
+    python -m geo.postcodes_stub_server --port 8766 --fail-every 5
+    POSTCODES_IO_URL=http://127.0.0.1:8766 python -m geo.geocoding --backfill
+
+Serves the two endpoints geo/geocoding.py and models.address use, with
+deterministic coordinates derived from the postcode so runs are repeatable:
+
+    GET  /postcodes/<postcode>            -> {"status": 200, "result": {...}}
+    POST /postcodes {"postcodes": [...]}  -> {"status": 200, "result": [{"query", "result"}]}
+    GET  /stats                           -> request counts
+
+Postcodes whose inward code ends in "ZZ" are unknown (null result / 404).
+--fail-every N answers every Nth request with 429 to exercise retries, and
+--latency-ms adds a fixed delay per request.
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+# =====================
+# Configuration
+# =====================
+HOST = "127.0.0.1"
+PORT = 8766
+BULK_LIMIT = 100
+# Rough bounding box of Great Britain
+LATITUDE_RANGE = (50.0, 58.5)
+LONGITUDE_RANGE = (-5.5, 1.5)
+
+
+def fake_location(postcode: str):
+    """Deterministic coordinates for a postcode, or None for unknown ("...ZZ") postcodes."""
+    compact = postcode.replace(" ", "").upper()
+    if compact.endswith("ZZ"):
+        return None
+    digest = hashlib.sha1(compact.encode()).digest()
+    u = int.from_bytes(digest[:4], "big") / 2 ** 32
+    v = int.from_bytes(digest[4:8], "big") / 2 ** 32
+    latitude = LATITUDE_RANGE[0] + u * (LATITUDE_RANGE[1] - LATITUDE_RANGE[0])
+    longitude = LONGITUDE_RANGE[0] + v * (LONGITUDE_RANGE[1] - LONGITUDE_RANGE[0])
+    return round(latitude, 6), round(longitude, 6)
+
+
+def postcode_result(postcode: str):
+    location = fake_location(postcode)
+    if location is None:
+        return None
+    compact = postcode.replace(" ", "").upper()
+    return {"postcode": f"{compact[:-3]} {compact[-3:]}", "latitude": location[0], "longitude": location[1]}
+
+
+class PostcodesRequestHandler(BaseHTTPRequestHandler):
+    fail_every = 0
+    latency_ms = 0.0
+    counters = None  # {"requests", "bulk_requests", "postcodes", "throttled"}, shared per server
+    lock = None
+
+    def _send_json(self, status: int, payload: dict, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _admit(self) -> bool:
+        """Count the request; False (after answering 429) if it is chosen to fail."""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self.lock:
+            self.counters["requests"] += 1
+            throttled = self.fail_every and self.counters["requests"] % self.fail_every == 0
+            if throttled:
+                self.counters["throttled"] += 1
+        if throttled:
+            self._send_json(429, {"status": 429, "error": "Too many requests"}, {"Retry-After": "0"})
+            return False
+        return True
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.lock:
+                self._send_json(200, dict(self.counters))
+            return
+        if not self.path.startswith("/postcodes/"):
+            self._send_json(404, {"status": 404, "error": "Not found"})
+            return
+        if not self._admit():
+            return
+        postcode = unquote(self.path[len("/postcodes/"):])
+        with self.lock:
+            self.counters["postcodes"] += 1
+        result = postcode_result(postcode)
+        if result is None:
+            self._send_json(404, {"status": 404, "error": "Postcode not found"})
+        else:
+            self._send_json(200, {"status": 200, "result": result})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/postcodes":
+            self._send_json(404, {"status": 404, "error": "Not found"})
+            return
+        if not self._admit():
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            postcodes = json.loads(self.rfile.read(length) or b"{}")["postcodes"]
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"status": 400, "error": f"Invalid JSON query submitted: {e}"})
+            return
+        if len(postcodes) > BULK_LIMIT:
+            self._send_json(400, {"status": 400, "error": f"No more than {BULK_LIMIT} postcodes per request"})
+            return
+        with self.lock:
+            self.counters["bulk_requests"] += 1
+            self.counters["postcodes"] += len(postcodes)
+        result = [{"query": postcode, "result": postcode_result(postcode)} for postcode in postcodes]
+        self._send_json(200, {"status": 200, "result": result})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host=HOST, port=PORT, fail_every=0, latency_ms=0.0):
+    """Create (but do not start) the stub server; port=0 picks a free port."""
+    counters = {"requests": 0, "bulk_requests": 0, "postcodes": 0, "throttled": 0}
+    handler = type("BoundPostcodesRequestHandler", (PostcodesRequestHandler,), {
+        "fail_every": fail_every,
+        "latency_ms": latency_ms,
+        "counters": counters,
+        "lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.counters = counters
+    return server
+
+
+def start_in_background(**kwargs):
+    """Start a stub server on a daemon thread. Returns (server, base_url)."""
+    server = make_server(**{"port": 0, **kwargs})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local postcodes.io stand-in")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every Nth request with 429")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.fail_every, args.latency_ms)
+    print(f"Serving postcodes.io stub on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
@@ -0,0 +1,221 @@
+"""
+In-memory spatial index over property and landmark coordinates.
+
+`SpatialIndex` buckets points into a uniform latitude/longitude grid (a
+fixed-precision geohash) of roughly `cell_km` square cells. Queries only
+look at the cells overlapping the search area and then compute exact
+distances for those candidates with the vectorised formulas in
+geo/distances.py:
+
+    radius(lat, lon, km)                  points within km, nearest first
+    bbox(min_lat, min_lon, max_lat, max_lon)
+    nearest(lat, lon, k)                  k nearest, by expanding the radius
+
+`spatial_indexes(session)` returns the process-wide property and landmark
+indexes. Committing an ORM change that adds, removes or moves a property or
+landmark in this process (e.g. `backfill_property_locations`) calls
+`invalidate()`, so the next query rebuilds. Changes made by other processes,
+such as `python -m geo.geocoding --backfill`, are picked up by comparing a
+fingerprint of the stored coordinates at most every CHECK_INTERVAL_SECONDS.
+"""
+
+import math
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session as OrmSession, object_session
+from sqlmodel import Session, select
+
+from database import MockProperty
+from geo.distances import distance_matrix
+from models import Landmark
+
+# =====================
+# Configuration
+# =====================
+CELL_KM = 1.0
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON = 111.320  # At the equator; scaled by cos(latitude)
+CHECK_INTERVAL_SECONDS = 30.0
+DISTANCE_METHOD = "andoyer"
+
+
+class SpatialIndex:
+    """Uniform-grid index of (id, latitude, longitude) points."""
+
+    def __init__(self, ids, latitudes, longitudes, cell_km: float = CELL_KM):
+        self.ids = np.asarray(ids)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        reference_lat = float(np.max(np.abs(self.latitudes))) if len(self.ids) else 0.0
+        # Cells are square at the point furthest from the equator and narrower (in km) elsewhere
+        self.cell_lat = cell_km / KM_PER_DEGREE_LAT
+        self.cell_lon = cell_km / (KM_PER_DEGREE_LON * max(math.cos(math.radians(reference_lat)), 0.01))
+        rows = np.floor(self.latitudes / self.cell_lat).astype(np.int64)
+        cols = np.floor(self.longitudes / self.cell_lon).astype(np.int64)
+        buckets = {}
+        for position, cell in enumerate(zip(rows.tolist(), cols.tolist())):
+            buckets.setdefault(cell, []).append(position)
+        self.cells: dict[tuple, np.ndarray] = {cell: np.array(positions) for cell, positions in buckets.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _candidates(self, min_lat, min_lon, max_lat, max_lon) -> np.ndarray:
+        """Positions of points in grid cells overlapping the box."""
+        row_range = range(math.floor(min_lat / self.cell_lat), math.floor(max_lat / self.cell_lat) + 1)
+        col_range = range(math.floor(min_lon / self.cell_lon), math.floor(max_lon / self.cell_lon) + 1)
+        if len(row_range) * len(col_range) > len(self.cells):
+            # Query covers more cells than are occupied: walk the occupied ones instead
+            found = [positions for (row, col), positions in self.cells.items()
+                     if row in row_range and col in col_range]
+        else:
+            found = [self.cells[(row, col)] for row in row_range for col in col_range if (row, col) in self.cells]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> list:
+        """Ids of points inside the box (inclusive)."""
+        positions = self._candidates(min_lat, min_lon, max_lat, max_lon)
+        lat, lon = self.latitudes[positions], self.longitudes[positions]
+        inside = (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        return self.ids[positions[inside]].tolist()
+
+    def radius(self, lat: float, lon: float, km: float) -> list[tuple]:
+        """(id, distance_km) of points within `km` of (lat, lon), nearest first."""
+        if not len(self.ids) or km < 0:
+            return []
+        dlat = km / KM_PER_DEGREE_LAT
+        widest = min(abs(lat) + dlat, 89.9)
+        dlon = min(km / (KM_PER_DEGREE_LON * math.cos(math.radians(widest))), 180.0)
+        positions = self._candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        if not len(positions):
+            return []
+        distances = distance_matrix([lat], [lon], self.latitudes[positions], self.longitudes[positions],
+                                    DISTANCE_METHOD)[0]
+        within = distances <= km
+        positions, distances = positions[within], distances[within]
+        order = np.argsort(distances, kind="stable")
+        return [(self.ids[positions[i]].item(), float(distances[i])) for i in order]
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> list[tuple]:
+        """(id, distance_km) of the k nearest points, nearest first."""
+        k = min(k, len(self.ids))
+        if k <= 0:
+            return []
+        km = self.cell_lat * KM_PER_DEGREE_LAT
+        while True:
+            found = self.radius(lat, lon, km)
+            if len(found) >= k:
+                return found[:k]
+            if km > 20000:  # Half the Earth's circumference; everything is in range
+                return found[:k]
+            km *= 2
+
+    def nearest_many(self, latitudes, longitudes, k: int = 1) -> list[list[tuple]]:
+        """`nearest` for each query point."""
+        return [self.nearest(lat, lon, k) for lat, lon in zip(latitudes, longitudes)]
+
+
+# =====================
+# Property and Landmark Indexes
+# =====================
+class _IndexCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.properties: Optional[SpatialIndex] = None
+        self.landmarks: Optional[SpatialIndex] = None
+        self.fingerprint = None
+        self.checked_at = 0.0
+
+
+_cache = _IndexCache()
+
+
+def _fingerprint(session: Session) -> tuple:
+    """Cheap aggregate that changes whenever a coordinate is added, removed or moved."""
+    def aggregate(model):
+        return tuple(session.exec(select(
+            func.count(model.latitude), func.sum(model.latitude), func.sum(model.longitude), func.max(model.id)
+        )).one())
+    return aggregate(MockProperty), aggregate(Landmark)
+
+
+def _build(session: Session) -> tuple[SpatialIndex, SpatialIndex]:
+    properties = session.exec(
+        select(MockProperty.id, MockProperty.latitude, MockProperty.longitude)
+        .where(MockProperty.latitude != None, MockProperty.longitude != None)
+    ).all()
+    landmarks = session.exec(select(Landmark.id, Landmark.latitude, Landmark.longitude)).all()
+
+    def index(rows):
+        return SpatialIndex([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows])
+    return index(properties), index(landmarks)
+
+
+def spatial_indexes(session: Session) -> tuple[SpatialIndex, SpatialIndex]:
+    """(property index, landmark index), rebuilt if the stored coordinates changed."""
+    with _cache.lock:
+        now = time.monotonic()
+        if _cache.properties is None or now - _cache.checked_at >= CHECK_INTERVAL_SECONDS:
+            fingerprint = _fingerprint(session)
+            if _cache.properties is None or fingerprint != _cache.fingerprint:
+                _cache.properties, _cache.landmarks = _build(session)
+                _cache.fingerprint = fingerprint
+            _cache.checked_at = now
+        return _cache.properties, _cache.landmarks
+
+
+def invalidate() -> None:
+    """Force a rebuild on the next `spatial_indexes` call."""
+    with _cache.lock:
+        _cache.properties = _cache.landmarks = None
+
+
+# =====================
+# Invalidation on Commit
+# =====================
+_DIRTY_KEY = "spatial_index_dirty"
+
+
+def _mark_dirty(target) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info[_DIRTY_KEY] = True
+
+
+def _on_insert_or_delete(mapper, connection, target):
+    _mark_dirty(target)
+
+
+def _on_update(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.latitude.history.has_changes() or state.attrs.longitude.history.has_changes():
+        _mark_dirty(target)
+
+
+def _on_commit(session):
+    # Invalidate only once the change is visible to other sessions
+    if session.info.pop(_DIRTY_KEY, False):
+        invalidate()
+
+
+def _on_rollback(session):
+    session.info.pop(_DIRTY_KEY, None)
+
+
+for _model in (MockProperty, Landmark):
+    event.listen(_model, "after_insert", _on_insert_or_delete)
+    event.listen(_model, "after_delete", _on_insert_or_delete)
+    event.listen(_model, "after_update", _on_update)
+event.listen(OrmSession, "after_commit", _on_commit)
+event.listen(OrmSession, "after_rollback", _on_rollback)
+
+
+__all__ = [
+    "SpatialIndex",
+    "spatial_indexes",
+    "invalidate",
+]
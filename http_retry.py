@@ -0,0 +1,106 @@
+"""
+Retrying HTTP requests for the external API clients (geo/geocoding.py,
+enrichment/epc.py).
+
+`request_with_retry` retries timeouts, connection errors, 429 and 5xx
+responses with exponential backoff (or the server's Retry-After, capped),
+and turns every other failure - non-retryable statuses, request errors and
+exhausted retries - into a `RequestError` (or the caller's subclass of it),
+so batch jobs can log and skip one item instead of aborting. Parsing the
+body is left to the caller.
+
+Each thread reuses its own `requests.Session` (`session()`), so clients
+running in a thread pool keep one connection pool per worker.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+import requests
+
+# =====================
+# Configuration
+# =====================
+MAX_RETRIES = 4
+BACKOFF_SECONDS = 0.5
+MAX_RETRY_DELAY_SECONDS = 30.0  # Cap on server-requested Retry-After waits
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RequestError(Exception):
+    pass
+
+
+_local = threading.local()
+
+
+def session() -> requests.Session:
+    """This thread's requests.Session."""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def retry_delay(retry_after: Optional[str], attempt: int) -> float:
+    """
+    Seconds to wait before the next attempt: the server's Retry-After (delta
+    seconds or an HTTP-date) when it is usable, otherwise exponential backoff.
+    Capped at MAX_RETRY_DELAY_SECONDS.
+    """
+    delay = None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                pass
+    if delay is None or delay != delay:  # Missing, unparseable or NaN
+        delay = BACKOFF_SECONDS * 2 ** attempt
+    return min(max(delay, 0.0), MAX_RETRY_DELAY_SECONDS)
+
+
+def request_with_retry(method: str, url: str, retries: int = MAX_RETRIES, timeout: float = 10,
+                       error_class: type = RequestError, description: Optional[str] = None,
+                       before_attempt: Optional[Callable[[], None]] = None, **kwargs) -> requests.Response:
+    """
+    Send a request, retrying transient failures. Returns the first response
+    that is neither an error nor a retryable status.
+
+    `before_attempt` runs before every attempt (e.g. a rate limiter's
+    acquire). Raises `error_class`, described by `description` (default
+    "<METHOD> <url>"), when the request cannot succeed.
+    """
+    description = description or f"{method} {url}"
+    for attempt in range(retries + 1):
+        if before_attempt is not None:
+            before_attempt()
+        try:
+            response = session().request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error, retry_after = str(e), None
+        except requests.RequestException as e:
+            raise error_class(f"{description} failed: {e}") from e
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                if not response.ok:
+                    raise error_class(f"{description} failed: HTTP {response.status_code}")
+                return response
+            error = f"HTTP {response.status_code}"
+            retry_after = response.headers.get("Retry-After")
+        if attempt == retries:
+            raise error_class(f"{description} failed after {retries + 1} attempts: {error}")
+        time.sleep(retry_delay(retry_after, attempt) + random.uniform(0, BACKOFF_SECONDS))
+
+
+__all__ = [
+    "RequestError",
+    "session",
+    "retry_delay",
+    "request_with_retry",
+]
@@ -4,6 +4,8 @@ import importlib, sys, os
 # Add the current directory to Python path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from startup_timeline import timeline
+
 try:
     database = importlib.import_module("ichack26.database")
 except Exception:
@@ -23,14 +25,15 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import the database initialization function
-from database import init_with_mock_data, get_db, MockProperty, UserPreferences
+from database import init_with_mock_data, get_db, MockProperty, UserPreferences, NicenessJob, PropertyImage
 from sqlmodel import Session, select
 
 # Database will be initialized on first use via get_engine()
 print("[*] Database will be initialized on startup...")
 
 
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, BackgroundTasks, Query
+from typing import List
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
@@ -38,24 +41,49 @@ from pathlib import Path
 import json
 import shutil
 
-# Import semantic search modules
-
-from semantic_search.collection import Collection
+# Heavy dependencies (chromadb, numpy, torch, models) are imported inside the handlers that use them
+from niceness_jobs import latest_job_for_property, job_to_dict
+from property_images import (
+    add_property_image,
+    image_extension,
+    property_image_to_dict,
+    property_images,
+    remove_property_image,
+)
+from model_registry import registry as model_registry
+from auth import router as auth_router
 import threading
 import time
 def run_generate_embeddings():
     try:
+        model_registry.get("sentence-transformer")
+        timeline.mark("model loaded (sentence-transformer)")
         from semantic_search.generate_embeds import generate_embeddings
         generate_embeddings()
+        timeline.mark("semantic search index ready")
     except Exception as e:
         print(f"[WARNING] Error generating embeddings: {e}")
 
+def run_sync_photo_index():
+    """Index any property photos missing from the CLIP photo search store"""
+    try:
+        from database import get_engine
+        from photo_search import sync_photo_index
+        with Session(get_engine()) as session:
+            encoded = sync_photo_index(session)
+        print(f"[OK] Photo search index up to date ({encoded} new photo(s) encoded)")
+        timeline.mark("photo search index ready")
+    except Exception as e:
+        print(f"[WARNING] Error building photo search index: {e}")
+
 
 
 
 log = logging.getLogger(__name__)
 
 app = FastAPI()
+app.include_router(auth_router)
+timeline.mark("imports")
 
 @app.on_event("startup")
 def on_startup():
@@ -65,13 +93,17 @@ def on_startup():
         engine = get_engine()
         print("[OK] Database initialization completed successfully!")
         print(f"Database URL: {engine.url}")
+        timeline.mark("database ready")
     except Exception as e:
         print(f"[ERROR] Database initialization failed: {e}")
         import traceback
         traceback.print_exc()
     
     # Start embeddings generation in background
-    threading.Thread(target=run_generate_embeddings, daemon=True).start()
+    if os.getenv("SEMANTIC_INDEX_ON_STARTUP", "1") == "1":
+        threading.Thread(target=run_generate_embeddings, daemon=True).start()
+    if os.getenv("PHOTO_SEARCH_SYNC_ON_STARTUP", "1") == "1":
+        threading.Thread(target=run_sync_photo_index, daemon=True).start()
 
 app.add_middleware(
     CORSMiddleware,
@@ -136,6 +168,25 @@ def get_properties(db: Session = Depends(get_db)):
     return result
 
 
+@app.get("/properties/by-cost")
+def get_properties_by_cost(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0),
+                           max_monthly_cost: float = None, descending: bool = False,
+                           db: Session = Depends(get_db)):
+    """Properties sorted by all-in monthly cost per person (rent plus bills if not included)."""
+    column = MockProperty.total_monthly_cost_pp
+    statement = select(MockProperty).where(column != None)
+    if max_monthly_cost is not None:
+        statement = statement.where(column <= max_monthly_cost)
+    statement = statement.order_by(column.desc() if descending else column, MockProperty.id)
+    properties = db.exec(statement.offset(offset).limit(limit)).all()
+    
+    return [{
+        **property_summary(prop),
+        "bills_included": prop.bills_included,
+        "total_monthly_cost_pp": prop.total_monthly_cost_pp,
+    } for prop in properties]
+
+
 @app.get("/properties/{id}")
 def get_property(id: int, db: Session = Depends(get_db)):
     """Return a single property by its ID. Returns 404 if not found."""
@@ -148,6 +199,8 @@ def get_property(id: int, db: Session = Depends(get_db)):
     except (json.JSONDecodeError, TypeError):
         amenities = []
     
+    from geo.distances import property_distances
+    
     return {
         "id": property.id,
         "price_per_person": property.price_per_person,
@@ -161,50 +214,128 @@ def get_property(id: int, db: Session = Depends(get_db)):
         "amenities": amenities,
         "description": property.description,
         "image": property.image,
+        "images": [image.image for image in property_images(db, id)],
+        "latitude": property.latitude,
+        "longitude": property.longitude,
+        "total_monthly_cost_pp": property.total_monthly_cost_pp,
+        "landmark_distances": property_distances(db, id),
         "niceness_rating": property.niceness_score,
     }
 
 @app.post("/properties/{property_id}/upload-image")
-async def upload_property_image(property_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Upload an image for a property"""
+async def upload_property_image(property_id: int, background_tasks: BackgroundTasks, file: UploadFile = File(...),
+                                db: Session = Depends(get_db)):
+    """Upload an image for a property and make it the cover photo"""
     # Verify property exists
     property_obj = db.get(MockProperty, property_id)
     if not property_obj:
         raise HTTPException(status_code=404, detail="Property not found")
     
-    # Validate filename
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="File must have a filename")
-    
-    # Validate file type
-    allowed_extensions = {"jpg", "jpeg", "png", "gif", "webp"}
-    file_ext = file.filename.split(".")[-1].lower()
-    if file_ext not in allowed_extensions:
-        raise HTTPException(status_code=400, detail=f"File type not allowed. Allowed: {allowed_extensions}")
-    
-    # Save file
-    filename = f"property_{property_id}.{file_ext}"
-    file_path = IMAGES_DIR / filename
+    # Validate filename and file type
+    try:
+        file_ext = image_extension(file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Added to the gallery; scored asynchronously in niceness_worker.py
+        image, job = add_property_image(db, property_id, await file.read(), file_ext, IMAGES_DIR)
         
         # Update database with image URL
-        image_url = f"/images/{filename}"
-        property_obj.image = image_url
+        property_obj.image = image.image
         db.add(property_obj)
         db.commit()
+        from photo_search import index_property_photos_safe
+        background_tasks.add_task(index_property_photos_safe, [(image.image_path, property_id, image.image)])
         
         return {
             "message": "Image uploaded successfully",
             "property_id": property_id,
-            "image": image_url,
-            "filename": filename
+            "image": image.image,
+            "filename": os.path.basename(image.image_path),
+            "niceness_job_id": job.id if job else None,
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
 
+@app.post("/properties/{property_id}/images")
+async def upload_property_images(property_id: int, background_tasks: BackgroundTasks,
+                                 files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
+    """Add several photos to a property's gallery. Photos it already has are not re-scored."""
+    property_obj = db.get(MockProperty, property_id)
+    if not property_obj:
+        raise HTTPException(status_code=404, detail="Property not found")
+    
+    # Validate every file before storing any of them
+    try:
+        extensions = [image_extension(file.filename) for file in files]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    uploaded = []
+    to_index = []
+    try:
+        for file, file_ext in zip(files, extensions):
+            image, job = add_property_image(db, property_id, await file.read(), file_ext, IMAGES_DIR)
+            to_index.append((image.image_path, property_id, image.image))
+            uploaded.append({
+                **property_image_to_dict(image),
+                "filename": file.filename,
+                "niceness_job_id": job.id if job else None,
+                "duplicate": job is None,
+            })
+        
+        if not property_obj.image and uploaded:
+            property_obj.image = uploaded[0]["image"]
+            db.add(property_obj)
+            db.commit()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upload images: {str(e)}")
+    
+    # CLIP-encode the new photos for /search/photos after the response is sent
+    from photo_search import index_property_photos_safe
+    background_tasks.add_task(index_property_photos_safe, to_index)
+    
+    return {
+        "message": f"Uploaded {len(uploaded)} image(s)",
+        "property_id": property_id,
+        "images": uploaded,
+        "queued": sum(1 for image in uploaded if image["niceness_job_id"] is not None),
+    }
+
+@app.get("/properties/{property_id}/images")
+def get_property_images(property_id: int, db: Session = Depends(get_db)):
+    """List a property's gallery photos with their individual niceness scores"""
+    property_obj = db.get(MockProperty, property_id)
+    if not property_obj:
+        raise HTTPException(status_code=404, detail="Property not found")
+    
+    return {
+        "property_id": property_id,
+        "niceness_rating": property_obj.niceness_score,
+        "images": [property_image_to_dict(image) for image in property_images(db, property_id)],
+    }
+
+@app.delete("/properties/{property_id}/images/{image_id}")
+def delete_property_image(property_id: int, image_id: int, background_tasks: BackgroundTasks,
+                          db: Session = Depends(get_db)):
+    """Remove a gallery photo; the property's niceness is re-aggregated without rescoring"""
+    image = db.get(PropertyImage, image_id)
+    if not image or image.property_id != property_id:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    image_url = image.image
+    remove_property_image(db, image)
+    from photo_search import forget_property_photo
+    background_tasks.add_task(forget_property_photo, property_id, image_url)
+    property_obj = db.get(MockProperty, property_id)
+    return {
+        "message": "Image deleted",
+        "property_id": property_id,
+        "image_id": image_id,
+        "niceness_rating": property_obj.niceness_score if property_obj else None,
+    }
+
 @app.get("/properties/{property_id}/image")
 def get_property_image(property_id: int, db: Session = Depends(get_db)):
     """Get image URL for a property"""
@@ -217,10 +348,44 @@ def get_property_image(property_id: int, db: Session = Depends(get_db)):
     
     return {"property_id": property_id, "image": property_obj.image}
 
+@app.get("/startup")
+def get_startup_timeline():
+    """Seconds after process start at which each startup milestone was reached"""
+    return timeline.to_dict()
+
+
+@app.get("/models")
+def get_models():
+    """Models loaded in this API process, with their sizes and load times"""
+    return {
+        "budget_mb": round(model_registry.budget_bytes / 1024 / 1024, 1),
+        "loaded_mb": round(model_registry.loaded_bytes() / 1024 / 1024, 1),
+        "models": model_registry.stats(),
+    }
+
+
+@app.get("/niceness/jobs/{job_id}")
+def get_niceness_job(job_id: int, db: Session = Depends(get_db)):
+    """Poll the status of a niceness scoring job"""
+    job = db.get(NicenessJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+@app.get("/properties/{property_id}/niceness-job")
+def get_property_niceness_job(property_id: int, db: Session = Depends(get_db)):
+    """Get the most recent niceness scoring job for a property"""
+    job = latest_job_for_property(db, property_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="No niceness job for this property")
+    return job_to_dict(job)
+
 @app.post("/prompt")
 def embed_prompt(request: PromptRequest):
     """Search for properties using semantic search."""
     try:
+        from semantic_search.collection import Collection
+        
         # Create collection instance
         collection_instance = Collection()
         
@@ -239,6 +404,145 @@ def embed_prompt(request: PromptRequest):
         raise HTTPException(status_code=500, detail=f"Failed to search: {str(e)}")
 
 
+@app.get("/search/photos")
+def search_property_photos(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100),
+                           db: Session = Depends(get_db)):
+    """Rank properties by how well their best photo matches a text query (CLIP)."""
+    try:
+        from photo_search import search_photos
+        matches = search_photos(q, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to search photos: {str(e)}")
+    
+    results = []
+    for match in matches:
+        prop = db.get(MockProperty, match["property_id"])
+        if not prop:
+            continue
+        results.append({
+            "id": prop.id,
+            "score": round(match["score"], 4),
+            "matched_image": match["image"],
+            "price_per_person": prop.price_per_person,
+            "city": prop.city,
+            "address": prop.address,
+            "bedrooms": prop.bedrooms,
+            "bathrooms": prop.bathrooms,
+            "image": prop.image,
+            "niceness_rating": prop.niceness_score,
+        })
+    
+    return {"query": q, "results": results}
+
+
+def property_summary(prop: MockProperty, distance_km: float = None) -> dict:
+    summary = {
+        "id": prop.id,
+        "price_per_person": prop.price_per_person,
+        "city": prop.city,
+        "address": prop.address,
+        "bedrooms": prop.bedrooms,
+        "bathrooms": prop.bathrooms,
+        "image": prop.image,
+        "latitude": prop.latitude,
+        "longitude": prop.longitude,
+        "niceness_rating": prop.niceness_score,
+    }
+    if distance_km is not None:
+        summary["distance_km"] = round(distance_km, 3)
+    return summary
+
+
+def resolve_point(db: Session, lat: float = None, lon: float = None, landmark_id: int = None,
+                  property_id: int = None) -> tuple:
+    """Query point from explicit coordinates, a landmark or a property."""
+    from models import Landmark
+    
+    if lat is not None and lon is not None:
+        return lat, lon
+    if landmark_id is not None:
+        target, kind = db.get(Landmark, landmark_id), "Landmark"
+    elif property_id is not None:
+        target, kind = db.get(MockProperty, property_id), "Property"
+    else:
+        raise HTTPException(status_code=400, detail="Pass lat and lon, landmark_id or property_id")
+    if not target:
+        raise HTTPException(status_code=404, detail=f"{kind} not found")
+    if target.latitude is None or target.longitude is None:
+        raise HTTPException(status_code=409, detail=f"{kind} has not been geocoded")
+    return target.latitude, target.longitude
+
+
+def properties_by_id(db: Session, ids: list) -> dict:
+    if not ids:
+        return {}
+    return {prop.id: prop for prop in db.exec(select(MockProperty).where(MockProperty.id.in_(ids))).all()}
+
+
+@app.get("/geo/properties/within")
+def get_properties_within(radius_km: float = Query(..., gt=0, le=100), lat: float = None, lon: float = None,
+                          landmark_id: int = None, db: Session = Depends(get_db)):
+    """Properties within radius_km of a point or landmark, nearest first."""
+    from geo.spatial_index import spatial_indexes
+    
+    point = resolve_point(db, lat, lon, landmark_id)
+    property_index, _ = spatial_indexes(db)
+    matches = property_index.radius(*point, radius_km)
+    props = properties_by_id(db, [property_id for property_id, _ in matches])
+    return [property_summary(props[property_id], distance) for property_id, distance in matches if property_id in props]
+
+
+@app.get("/geo/properties/bbox")
+def get_properties_in_bbox(min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                           limit: int = Query(500, ge=1, le=5000), db: Session = Depends(get_db)):
+    """Properties inside a map viewport."""
+    from geo.spatial_index import spatial_indexes
+    
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="min_lat/min_lon must not exceed max_lat/max_lon")
+    property_index, _ = spatial_indexes(db)
+    ids = property_index.bbox(min_lat, min_lon, max_lat, max_lon)[:limit]
+    props = properties_by_id(db, ids)
+    return [property_summary(props[property_id]) for property_id in ids if property_id in props]
+
+
+@app.get("/geo/properties/nearest")
+def get_nearest_properties(k: int = Query(10, ge=1, le=100), lat: float = None, lon: float = None,
+                           landmark_id: int = None, db: Session = Depends(get_db)):
+    """The k properties nearest a point or landmark."""
+    from geo.spatial_index import spatial_indexes
+    
+    point = resolve_point(db, lat, lon, landmark_id)
+    property_index, _ = spatial_indexes(db)
+    matches = property_index.nearest(*point, k)
+    props = properties_by_id(db, [property_id for property_id, _ in matches])
+    return [property_summary(props[property_id], distance) for property_id, distance in matches if property_id in props]
+
+
+@app.get("/geo/landmarks/nearest")
+def get_nearest_landmarks(k: int = Query(1, ge=1, le=50), lat: float = None, lon: float = None,
+                          property_id: int = None, db: Session = Depends(get_db)):
+    """The k landmarks (e.g. campuses) nearest a point or property."""
+    from models import Landmark
+    from geo.spatial_index import spatial_indexes
+    
+    point = resolve_point(db, lat, lon, property_id=property_id)
+    _, landmark_index = spatial_indexes(db)
+    results = []
+    for landmark_id, distance in landmark_index.nearest(*point, k):
+        landmark = db.get(Landmark, landmark_id)
+        if landmark:
+            results.append({
+                "id": landmark.id,
+                "name": landmark.name,
+                "postcode": landmark.postcode,
+                "latitude": landmark.latitude,
+                "longitude": landmark.longitude,
+                "distance_km": round(distance, 3),
+            })
+    return results
+
+
 @app.get("/properties/db")
 def get_properties_from_db(db: Session = Depends(get_db)):
     """Get properties from the SQLite database"""
@@ -0,0 +1,212 @@
+"""
+Process-wide registry of lazily loaded ML models.
+
+Importing a module that needs a model no longer loads it: callers ask the
+registry by name and the model is built on first use, then shared by every
+caller in the process.
+
+    from model_registry import registry
+    model = registry.get("sentence-transformer")
+
+    with registry.use("clip") as embedder:   # pinned while in use
+        ...
+
+Loaded models are counted against a RAM budget (MODEL_RAM_BUDGET_MB, unset
+or 0 for no limit). When a load takes the total over budget, the least
+recently used idle models are evicted; models pinned with `use()` are never
+evicted. An evicted model is simply reloaded on its next `get()`. Callers
+that keep their own reference to an evicted model keep it alive, so prefer
+`use()` or calling `get()` each time over caching the returned object.
+
+Like niceness_jobs.py this module must stay free of torch/model imports at
+module level; every loader imports its own dependencies.
+"""
+
+import gc
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+# =====================
+# Configuration
+# =====================
+MODEL_RAM_BUDGET_MB = float(os.getenv("MODEL_RAM_BUDGET_MB", "0"))
+SENTENCE_TRANSFORMER_MODEL = "all-MiniLM-L6-v2"
+CLIP_MODEL = "ViT-B-32"
+CLIP_PRETRAINED = "laion2b_s34b_b79k"
+NICENESS_CHECKPOINT_PATH = Path(__file__).parent / "niceness" / "checkpoints" / "property_model.pth"
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def model_size_bytes(obj) -> Optional[int]:
+    """Bytes held by the parameters and buffers of a torch module (or of its `.model`), if any."""
+    for candidate in (obj, getattr(obj, "model", None)):
+        if candidate is not None and hasattr(candidate, "parameters") and hasattr(candidate, "buffers"):
+            tensors = list(candidate.parameters()) + list(candidate.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+    return None
+
+
+class _Entry:
+    def __init__(self, name: str, loader: Callable):
+        self.name = name
+        self.loader = loader
+        self.instance = None
+        self.size_bytes = 0
+        self.load_seconds = 0.0
+        self.loads = 0
+        self.last_used = 0.0
+        self.in_use = 0
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Loads registered models on first use and evicts idle ones to stay within a RAM budget."""
+
+    def __init__(self, budget_mb: float = MODEL_RAM_BUDGET_MB):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable) -> None:
+        """Register (or replace) the loader for `name`. A loaded instance of a replaced loader is dropped."""
+        with self._lock:
+            previous = self._entries.get(name)
+            if previous is not None and previous.in_use:
+                raise RuntimeError(f"Model {name!r} is in use and cannot be re-registered")
+            self._entries[name] = _Entry(name, loader)
+
+    def _entry(self, name: str) -> _Entry:
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError(f"Unknown model {name!r}; registered: {sorted(self._entries)}") from None
+
+    def get(self, name: str):
+        """The shared instance of `name`, loading it first if needed."""
+        entry = self._entry(name)
+        with entry.lock:
+            if entry.instance is None:
+                self._load(entry)
+            entry.last_used = time.monotonic()
+            instance = entry.instance
+        self._enforce_budget(keep=name)
+        return instance
+
+    @contextmanager
+    def use(self, name: str):
+        """Like `get`, but the model cannot be evicted until the block exits."""
+        entry = self._entry(name)
+        with entry.lock:
+            entry.in_use += 1
+        try:
+            yield self.get(name)
+        finally:
+            with entry.lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    def is_loaded(self, name: str) -> bool:
+        return self._entry(name).instance is not None
+
+    def _load(self, entry: _Entry) -> None:
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        instance = entry.loader()
+        entry.load_seconds = time.perf_counter() - start
+        size = model_size_bytes(instance)
+        entry.size_bytes = size if size is not None else max(0, _rss_bytes() - rss_before)
+        entry.instance = instance
+        entry.loads += 1
+        print(f"[models] Loaded {entry.name} in {entry.load_seconds:.2f}s "
+              f"({entry.size_bytes / 1024 / 1024:.0f} MB, {self.loaded_bytes() / 1024 / 1024:.0f} MB total)")
+
+    def unload(self, name: str) -> bool:
+        """Drop the registry's reference to `name`. Returns False if it is not loaded or in use."""
+        entry = self._entry(name)
+        with entry.lock:
+            if entry.instance is None or entry.in_use:
+                return False
+            entry.instance = None
+        print(f"[models] Evicted {name} ({entry.size_bytes / 1024 / 1024:.0f} MB)")
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return True
+
+    def loaded_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._entries.values() if entry.instance is not None)
+
+    def _enforce_budget(self, keep: str) -> None:
+        """Evict least recently used idle models until the loaded total fits the budget."""
+        if self.budget_bytes <= 0:
+            return
+        with self._lock:
+            while self.loaded_bytes() > self.budget_bytes:
+                idle = [entry for entry in self._entries.values()
+                        if entry.instance is not None and not entry.in_use and entry.name != keep]
+                if not idle:
+                    print(f"[models] WARNING: {self.loaded_bytes() / 1024 / 1024:.0f} MB loaded exceeds "
+                          f"the {self.budget_bytes / 1024 / 1024:.0f} MB budget and nothing can be evicted")
+                    return
+                if not self.unload(min(idle, key=lambda entry: entry.last_used).name):
+                    return
+
+    def stats(self) -> list[dict]:
+        """Load state, size and load time of every registered model."""
+        now = time.monotonic()
+        return [{
+            "name": entry.name,
+            "loaded": entry.instance is not None,
+            "in_use": entry.in_use,
+            "size_mb": round(entry.size_bytes / 1024 / 1024, 1),
+            "load_seconds": round(entry.load_seconds, 3),
+            "loads": entry.loads,
+            "idle_seconds": round(now - entry.last_used, 1) if entry.loads else None,
+        } for entry in self._entries.values()]
+
+
+# =====================
+# Default Models
+# =====================
+def load_sentence_transformer():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(SENTENCE_TRANSFORMER_MODEL)
+
+
+def load_clip():
+    from embeddings.embed import Embedder
+    return Embedder(CLIP_MODEL, CLIP_PRETRAINED)
+
+
+def load_niceness():
+    """NicenessModel scorer configured from NICENESS_RUNTIME / NICENESS_ARTIFACT_PATH."""
+    from niceness.scoring.inference import load_runtime
+    runtime = os.getenv("NICENESS_RUNTIME", "eager")
+    return load_runtime(runtime, str(NICENESS_CHECKPOINT_PATH), os.getenv("NICENESS_ARTIFACT_PATH"))
+
+
+registry = ModelRegistry()
+registry.register("sentence-transformer", load_sentence_transformer)
+registry.register("clip", load_clip)
+registry.register("niceness", load_niceness)
+
+
+__all__ = [
+    "ModelRegistry",
+    "model_size_bytes",
+    "registry",
+]
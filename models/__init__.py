@@ -1,3 +1,4 @@
 from .address import Address
 from .landmark import Landmark
-from .property import Property
\ No newline at end of file
+from .property import Property
+from .user import User
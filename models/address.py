@@ -1,12 +1,7 @@
-import requests
-import urllib.parse
-
 from geopy.distance import geodesic
 from sqlmodel import SQLModel
 
 
-POSTCODES_IO_API_BASE_URL = "https://api.postcodes.io/postcodes"
-
 class Address(SQLModel):
     address_line_1: str
     address_line_2: str
@@ -17,9 +12,21 @@ class Address(SQLModel):
 
     @staticmethod
     def get_coordinates(postcode: str) -> tuple:
-        url = f"{POSTCODES_IO_API_BASE_URL}/{urllib.parse.quote(postcode)}"
-        res = requests.get(url).json()
-        return res["result"]["latitude"], res["result"]["longitude"]
+        """(latitude, longitude) of a postcode via the persistent geocoding cache."""
+        from geo.geocoding import geocode_postcode
+        location = geocode_postcode(postcode)
+        if location is None:
+            raise ValueError(f"Unknown postcode: {postcode}")
+        return location
+
+    @staticmethod
+    def get_coordinates_bulk(postcodes: list[str]) -> dict:
+        """{normalised postcode: (latitude, longitude) or None}, with one bulk request per 100 uncached postcodes."""
+        from database import get_engine
+        from geo.geocoding import geocode_postcodes
+        from sqlmodel import Session
+        with Session(get_engine()) as session:
+            return geocode_postcodes(session, postcodes)
 
     @staticmethod
     def distance(a: "Address", b: "Address") -> int:
@@ -27,6 +34,26 @@ class Address(SQLModel):
 
         return geodesic((a.latitude, a.longitude), (b.latitude, b.longitude)).km
 
+    @staticmethod
+    def distance_matrix(a: list["Address"], b: list["Address"], method: str = "andoyer"):
+        """[len(a), len(b)] NumPy array of distances in kilometres, computed in one vectorised call."""
+        from geo.distances import distance_matrix
+        return distance_matrix([x.latitude for x in a], [x.longitude for x in a],
+                               [y.latitude for y in b], [y.longitude for y in b], method)
+
+    @classmethod
+    def new_many(cls, rows: list[dict]) -> list["Address"]:
+        """Build many addresses (dicts of fields including "postcode"), geocoding them in bulk."""
+        from geo.geocoding import normalize_postcode
+        locations = cls.get_coordinates_bulk([row["postcode"] for row in rows])
+        addresses = []
+        for row in rows:
+            location = locations.get(normalize_postcode(row["postcode"]))
+            if location is None:
+                raise ValueError(f"Unknown postcode: {row['postcode']}")
+            addresses.append(cls(**row, latitude=location[0], longitude=location[1]))
+        return addresses
+
     @classmethod
     def new(cls, postcode: str, **kwargs) -> "Address":
         latitude, longitude = cls.get_coordinates(postcode)
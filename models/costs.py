@@ -0,0 +1,85 @@
+"""
+All-in monthly cost per person, materialised onto property rows.
+
+    total_monthly_cost_pp = monthly rent per person
+                            + estimated energy bills per person (only when bills are not included)
+
+Energy bills use the property's EPC-based consumption when it has been
+enriched, otherwise a typical household's consumption, priced at the
+current price cap and split across the bedrooms. For enriched rows
+`energy_cost_annual` is repriced at the same time, so it never lags a cap
+change.
+
+`apply_costs` stores the result together with COST_VERSION, a fingerprint
+of every constant the formula uses. The database registers it to run
+whenever a property row is inserted or updated, and rows whose
+`cost_version` differs from COST_VERSION (e.g. after a price-cap change) are
+recomputed at startup, so sorting by total cost stays an indexed query.
+"""
+
+import hashlib
+import json
+from typing import Optional
+
+from .property import (
+    ELECTRICITY_PRICE_CAP,
+    ELECTRICITY_STANDING_CHARGE_CAP,
+    ENERGY_STANDING_CHARGES,
+    GAS_PRICE_CAP,
+    GAS_STANDING_CHARGE_CAP,
+)
+
+# Ofgem typical domestic consumption values (medium household), kWh per year
+TYPICAL_ELECTRICITY_KWH = 2700
+TYPICAL_GAS_KWH = 11500
+WEEKS_PER_YEAR = 52
+
+COST_VERSION = hashlib.sha1(json.dumps([
+    ELECTRICITY_PRICE_CAP,
+    GAS_PRICE_CAP,
+    ELECTRICITY_STANDING_CHARGE_CAP,
+    GAS_STANDING_CHARGE_CAP,
+    TYPICAL_ELECTRICITY_KWH,
+    TYPICAL_GAS_KWH,
+    WEEKS_PER_YEAR,
+]).encode()).hexdigest()[:12]
+
+
+def typical_energy_cost_annual() -> float:
+    """GBP per year for a typical household at the current price cap."""
+    return ENERGY_STANDING_CHARGES + (TYPICAL_ELECTRICITY_KWH * ELECTRICITY_PRICE_CAP
+                                      + TYPICAL_GAS_KWH * GAS_PRICE_CAP) / 100
+
+
+def monthly_bills_per_person(bedrooms: int, energy_cost_annual: Optional[float] = None) -> float:
+    annual = energy_cost_annual if energy_cost_annual is not None else typical_energy_cost_annual()
+    return annual / 12 / max(bedrooms or 1, 1)
+
+
+def total_monthly_cost_pp(weekly_rent_pp: float, bills_included: bool, bedrooms: int,
+                          energy_cost_annual: Optional[float] = None) -> float:
+    rent = weekly_rent_pp * WEEKS_PER_YEAR / 12
+    if bills_included:
+        return rent
+    return rent + monthly_bills_per_person(bedrooms, energy_cost_annual)
+
+
+def apply_costs(obj) -> None:
+    """
+    Set `total_monthly_cost_pp` and `cost_version` on a `Property` (rent_weekly,
+    unihomes_bills) or `MockProperty` (price_per_person, bills_included).
+    Enriched `Property` rows also get `energy_cost_annual` repriced from
+    `energy_consumption_kwh`. Rows without a rent are left empty.
+    """
+    if hasattr(obj, "rent_weekly"):
+        rent, bills_included = obj.rent_weekly, bool(obj.unihomes_bills)
+        if obj.energy_consumption_kwh is not None:
+            obj.energy_cost_annual = obj.get_energy_cost_estimate(obj.energy_consumption_kwh)
+    else:
+        rent, bills_included = obj.price_per_person, bool(obj.bills_included)
+    if rent is None:
+        obj.total_monthly_cost_pp = None
+    else:
+        obj.total_monthly_cost_pp = round(total_monthly_cost_pp(
+            rent, bills_included, obj.bedrooms, getattr(obj, "energy_cost_annual", None)), 2)
+    obj.cost_version = COST_VERSION
@@ -1,12 +1,12 @@
-import datetime, os, requests
+import datetime, os
+from typing import Optional
 
 from .address import Address
 from sqlmodel import Field
 from pydantic import computed_field
-from urllib.parse import urlencode
 
 
-EPC_API_BASE_URL = "https://epc.opendatacommunities.org/api/v1/domestic/search"
+EPC_API_BASE_URL = os.getenv("EPC_API_URL", "https://epc.opendatacommunities.org/api/v1/domestic/search")
 EPC_API_KEY = os.getenv("EPC_API_KEY")
 
 # All data sourced from Ofgem: https://www.ofgem.gov.uk/information-consumers/energy-advice-households/energy-price-cap-explained
@@ -28,6 +28,17 @@ class Property(Address, table=True):
     contract_start: datetime.datetime
     contract_end: datetime.datetime
 
+    # Filled in by the EPC enrichment job (enrichment/epc.py)
+    epc_rating: Optional[str] = Field(default=None)
+    floor_area_m2: Optional[float] = Field(default=None)
+    energy_consumption_kwh: Optional[float] = Field(default=None)  # Estimated per year
+    energy_cost_annual: Optional[float] = Field(default=None, index=True)  # GBP per year at the price cap
+    epc_updated_at: Optional[str] = Field(default=None)  # ISO timestamp
+
+    # Materialised by models/costs.py on every insert/update
+    total_monthly_cost_pp: Optional[float] = Field(default=None, index=True)
+    cost_version: Optional[str] = Field(default=None, index=True)
+
     def get_energy_consumption_estimate(self, epc: dict) -> float:
         energy_per_m2 = int(epc["energy-consumption-current"])
         floor_area = float(epc["total-floor-area"])
@@ -37,10 +48,24 @@ class Property(Address, table=True):
         return ENERGY_STANDING_CHARGES + (consumption * ELECTRICITY_PRICE_CAP / 100)
 
     def get_epc(self) -> dict:
-        headers = {"Accept": "application/json", "Authorization": f"Basic {EPC_API_KEY}"}
-        search_params = urlencode({"address": self.address_line_1, "postcode": self.postcode, "size": 1})
-        res = requests.get(f"{EPC_API_BASE_URL}?{search_params}", headers=headers)
-        return res.json()["rows"][0]
+        """The EPC record for this address, via the enrichment cache. Raises LookupError if there is none."""
+        from database import get_engine
+        from enrichment.epc import cached_epcs, epc_cache_key
+        from sqlmodel import Session
+        with Session(get_engine()) as session:
+            epc = cached_epcs(session, [(self.address_line_1, self.postcode)]).get(
+                epc_cache_key(self.address_line_1, self.postcode))
+        if epc is None:
+            raise LookupError(f"No EPC record for {self.address_line_1}, {self.postcode}")
+        return epc
+
+    def apply_epc(self, epc: dict) -> None:
+        """Store the EPC-derived energy columns so they are not recomputed per request."""
+        self.epc_rating = epc.get("current-energy-rating")
+        self.floor_area_m2 = float(epc["total-floor-area"])
+        self.energy_consumption_kwh = self.get_energy_consumption_estimate(epc)
+        self.energy_cost_annual = self.get_energy_cost_estimate(self.energy_consumption_kwh)
+        self.epc_updated_at = datetime.datetime.now().isoformat()
 
     @computed_field
     @property
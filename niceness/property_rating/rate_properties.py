@@ -1,11 +1,35 @@
+"""
+Rate property images manually, or automatically with a NicenessModel checkpoint.
+
+    python rate_properties.py                      # manual 1-10 ratings
+    python rate_properties.py --auto               # model scores
+
+Rows are written to the output CSV as soon as they are rated. As before,
+a manual run starts a new CSV; pass --resume to keep the existing rows and
+skip images already in it. --auto runs always resume, so an interrupted run
+picks up where it stopped (--overwrite starts afresh).
+
+In --auto mode images are decoded and preprocessed in a thread pool and
+scored --batch-size at a time. Large directories can be split across
+processes with --num-shards/--shard-index; each shard writes its own
+<output>_shard<i>.csv, and --merge combines them into --output:
+
+    python rate_properties.py --auto --glob "**/*.webp" --num-shards 4 --shard-index 0
+    ...
+    python rate_properties.py --merge --num-shards 4
+"""
+
 import os
+import csv
 import glob
+import zlib
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import pandas as pd
 import torch
-from torchvision import transforms
-from modeltest import NicenessModel
+from inference import RUNTIMES, inference_transform, load_model, load_runtime, score_and_embed_tensors
+from acceleration import add_acceleration_args
 
 # =====================
 # Configuration
@@ -14,42 +38,181 @@ IMAGES_DIR = "images"
 RATINGS_CSV = "property_ratings.csv"
 MODEL_CHECKPOINT = "final_model.pth"
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+IMAGE_PATTERNS = ['*.jpg', '*.jpeg', '*.png', '*.webp', '*.avif']
+CSV_COLUMNS = ['image_path', 'filename', 'property_score']
+BATCH_SIZE = 32
+NUM_WORKERS = 8
+
 
 # =====================
-# Model / Transform
+# Image Selection
 # =====================
-inference_transform = transforms.Compose([
-    transforms.Resize(256),
-    transforms.CenterCrop(224),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                        std=[0.229, 0.224, 0.225])
-])
-
-
-def load_model(checkpoint_path: str) -> NicenessModel:
-    model = NicenessModel(embed_dim=1024)
-    if os.path.exists(checkpoint_path):
-        state_dict = torch.load(checkpoint_path, map_location=DEVICE)
-        model.load_state_dict(state_dict)
-        print(f"Loaded weights from {checkpoint_path}")
-    else:
-        print(f"WARNING: Checkpoint not found at {checkpoint_path}. Using random initialization.")
-    model = model.to(DEVICE)
-    model.eval()
-    return model
+def find_images(images_dir, patterns=IMAGE_PATTERNS):
+    """Sorted, de-duplicated images under `images_dir` matching any glob pattern ("**" recurses)."""
+    image_files = set()
+    for pattern in patterns:
+        image_files.update(glob.glob(os.path.join(images_dir, pattern), recursive=True))
+    return sorted(image_files)
+
+
+def in_shard(image_path, shard_index, num_shards):
+    """Stable assignment of a path to one of `num_shards` shards (independent of directory listing order)."""
+    return zlib.crc32(image_path.encode("utf-8")) % num_shards == shard_index
+
+
+def shard_output_path(output, shard_index):
+    stem, ext = os.path.splitext(output)
+    return f"{stem}_shard{shard_index}{ext or '.csv'}"
 
 
-@torch.no_grad()
-def score_image(model: NicenessModel, image_path: str) -> float | None:
+# =====================
+# Ratings CSV
+# =====================
+def rated_paths(csv_path):
+    """Image paths already present in `csv_path` (empty if it does not exist)."""
+    if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+        return set()
+    return set(pd.read_csv(csv_path, usecols=["image_path"])["image_path"])
+
+
+class RatingsWriter:
+    """Appends rating rows to a CSV, writing the header only for a new file."""
+
+    def __init__(self, csv_path, overwrite=False):
+        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+        is_new = overwrite or not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+        self.file = open(csv_path, "w" if overwrite else "a", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=CSV_COLUMNS)
+        if is_new:
+            self.writer.writeheader()
+        self.count = 0
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        # Flush per batch so a killed process keeps everything rated so far
+        self.file.flush()
+        self.count += len(rows)
+
+    def close(self):
+        self.file.close()
+
+
+def merge_shards(output, num_shards):
+    frames = []
+    for shard_index in range(num_shards):
+        path = shard_output_path(output, shard_index)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            frames.append(pd.read_csv(path))
+        else:
+            print(f"WARNING: {path} not found, skipping")
+    if not frames:
+        print("No shard files to merge")
+        return None
+    df = pd.concat(frames).drop_duplicates("image_path", keep="last").sort_values("image_path")
+    df.to_csv(output, index=False)
+    print(f"✓ Merged {len(df)} ratings from {len(frames)} shard(s) into {output}")
+    return df
+
+
+# =====================
+# Auto Rating
+# =====================
+def decode(image_path):
+    """Open, decode and preprocess one image. Returns (tensor, size) or (None, error)."""
     try:
-        image = Image.open(image_path).convert("RGB")
-        image_tensor = inference_transform(image).unsqueeze(0).to(DEVICE)
-        score = model.forward_ava(image_tensor).item()
-        return float(score)
+        with Image.open(image_path) as image:
+            size = image.size
+            return inference_transform(image.convert("RGB")), size
     except Exception as exc:
-        print(f"Error scoring {image_path}: {exc}")
-        return None
+        return None, exc
+
+
+def auto_rate(image_files, writer, model=None, client=None, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS):
+    """Score `image_files` in batches, appending each batch's rows to `writer`."""
+    failed = 0
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        for start in range(0, len(image_files), batch_size):
+            batch_paths = image_files[start:start + batch_size]
+            if client is not None:
+                try:
+                    loaded = batch_paths
+                    scores = client.score_paths(batch_paths)
+                except Exception as exc:
+                    # Retry one at a time so a single bad file only loses its own score
+                    print(f"Batch starting at {batch_paths[0]} failed ({exc}), scoring individually")
+                    loaded, scores = [], []
+                    for path in batch_paths:
+                        try:
+                            scores.append(client.score_paths([path])[0])
+                        except Exception as exc:
+                            print(f"Error scoring {path}: {exc}")
+                            failed += 1
+                            continue
+                        loaded.append(path)
+                    if not loaded:
+                        continue
+            else:
+                loaded, tensors = [], []
+                for path, (tensor, info) in zip(batch_paths, pool.map(decode, batch_paths)):
+                    if tensor is None:
+                        print(f"Error scoring {path}: {info}")
+                        failed += 1
+                        continue
+                    loaded.append(path)
+                    tensors.append(tensor)
+                if not tensors:
+                    continue
+                scores, _ = score_and_embed_tensors(model, torch.stack(tensors), DEVICE)
+                scores = scores.tolist()
+
+            rows = [{
+                'image_path': path,
+                'filename': os.path.basename(path),
+                'property_score': max(1.0, min(10.0, float(score))),
+            } for path, score in zip(loaded, scores)]
+            writer.write(rows)
+            done = min(start + batch_size, len(image_files))
+            print(f"[{done}/{len(image_files)}] scored {len(rows)} image(s), "
+                  f"batch mean {sum(r['property_score'] for r in rows) / len(rows):.2f}")
+    return failed
+
+
+# =====================
+# Manual Rating
+# =====================
+def manual_rate(image_files, writer):
+    for idx, image_path in enumerate(image_files, 1):
+        filename = os.path.basename(image_path)
+
+        print(f"\n[{idx}/{len(image_files)}] {filename}")
+        print(f"Path: {image_path}")
+
+        # Display image info
+        try:
+            img = Image.open(image_path)
+            print(f"Size: {img.size[0]}x{img.size[1]} pixels")
+            print(f"Format: {img.format}")
+        except:
+            print("(Could not read image info)")
+
+        while True:
+            try:
+                rating = float(input("Rate this property (1-10): ").strip())
+                if 1 <= rating <= 10:
+                    break
+                else:
+                    print("Please enter a number between 1 and 10")
+            except ValueError:
+                print("Invalid input. Please enter a number between 1 and 10")
+
+        writer.write([{
+            'image_path': image_path,
+            'filename': filename,
+            'property_score': rating
+        }])
+
+        print(f"✓ Rated: {rating}/10")
+
 
 # =====================
 # Rating Script
@@ -58,10 +221,35 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Rate property images manually or with a model")
     parser.add_argument("--auto", action="store_true", help="Auto-rate using a model checkpoint")
     parser.add_argument("--images-dir", default=IMAGES_DIR, help="Directory with property images")
+    parser.add_argument("--glob", nargs="+", default=IMAGE_PATTERNS,
+                        help="Glob pattern(s) relative to --images-dir; '**' matches subdirectories")
     parser.add_argument("--output", default=RATINGS_CSV, help="Output CSV path")
+    parser.add_argument("--overwrite", action="store_true", help="Start a new CSV instead of resuming (--auto)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Manual mode: keep the existing CSV and skip images already rated")
+    parser.add_argument("--num-shards", type=int, default=1, help="Split the images across this many processes")
+    parser.add_argument("--shard-index", type=int, default=0, help="Which shard this process rates")
+    parser.add_argument("--merge", action="store_true", help="Merge the shard CSVs into --output and exit")
     parser.add_argument("--checkpoint", default=MODEL_CHECKPOINT, help="Model checkpoint path")
+    parser.add_argument("--runtime", default="eager", choices=RUNTIMES,
+                        help="CPU runtime for --auto (torchscript/onnx need --artifact)")
+    parser.add_argument("--artifact", default=None, help="Exported model from export_model.py")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Images per forward pass in --auto mode")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="Decode threads in --auto mode")
+    add_acceleration_args(parser)
+    parser.add_argument("--server", default=os.getenv("NICENESS_SERVER_URL"),
+                        help="Score via a running niceness inference server instead of loading the checkpoint")
     args = parser.parse_args()
 
+    if args.merge:
+        exit(0 if merge_shards(args.output, args.num_shards) is not None else 1)
+    if not 0 <= args.shard_index < args.num_shards:
+        parser.error("--shard-index must be in [0, --num-shards)")
+    if args.overwrite and args.resume:
+        parser.error("--overwrite and --resume are mutually exclusive")
+    # Manual ratings replace the CSV unless asked to resume; auto-rating resumes unless asked to overwrite
+    overwrite = args.overwrite or not (args.auto or args.resume)
+
     print("\n" + "="*70)
     print("Property Photo Rating Tool")
     print("="*70)
@@ -75,76 +263,61 @@ if __name__ == "__main__":
         print("  8-9: Excellent (very appealing, great layout/design)")
         print("  10: Perfect (ideal property interior/exterior)")
     print("="*70)
-    
+
     # Get all images
-    image_files = []
-    for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp', '*.avif']:
-        image_files.extend(glob.glob(os.path.join(args.images_dir, ext)))
-    
+    image_files = find_images(args.images_dir, args.glob)
     if not image_files:
         print(f"No images found in {args.images_dir}")
         exit(1)
-    
-    image_files.sort()
-    ratings = []
-    
-    print(f"\nFound {len(image_files)} images to rate\n")
 
-    model = None
-    if args.auto:
-        print(f"Device: {DEVICE}")
-        model = load_model(args.checkpoint)
-    
-    # Rate each image
-    for idx, image_path in enumerate(image_files, 1):
-        filename = os.path.basename(image_path)
-        
-        print(f"\n[{idx}/{len(image_files)}] {filename}")
-        print(f"Path: {image_path}")
-        
-        # Display image info
-        try:
-            img = Image.open(image_path)
-            print(f"Size: {img.size[0]}x{img.size[1]} pixels")
-            print(f"Format: {img.format}")
-        except:
-            print("(Could not read image info)")
-        
-        # Get rating
+    output = args.output
+    if args.num_shards > 1:
+        image_files = [p for p in image_files if in_shard(p, args.shard_index, args.num_shards)]
+        output = shard_output_path(args.output, args.shard_index)
+        print(f"Shard {args.shard_index + 1}/{args.num_shards}: {len(image_files)} images -> {output}")
+
+    if not overwrite:
+        done = rated_paths(output)
+        if done:
+            image_files = [p for p in image_files if p not in done]
+            print(f"Resuming: {len(done)} image(s) already in {output}")
+
+    print(f"\nFound {len(image_files)} images to rate\n")
+    writer = RatingsWriter(output, overwrite=overwrite)
+    try:
         if args.auto:
-            rating = score_image(model, image_path)
-            if rating is None:
-                continue
-            rating = max(1.0, min(10.0, rating))
-            print(f"Auto score: {rating:.4f}")
+            model = None
+            client = None
+            if args.server:
+                from client import NicenessClient
+                client = NicenessClient(args.server)
+                print(f"Scoring via inference server at {args.server}")
+            elif args.runtime != "eager" or args.bf16 or args.channels_last or args.compile:
+                print(f"Runtime: {args.runtime}")
+                model = load_runtime(args.runtime, args.checkpoint, args.artifact,
+                                     bf16=args.bf16, channels_last=args.channels_last, compile=args.compile)
+            else:
+                print(f"Device: {DEVICE}")
+                model = load_model(args.checkpoint)
+            failed = auto_rate(image_files, writer, model, client, args.batch_size, args.workers)
+            if failed:
+                print(f"Skipped {failed} image(s) that could not be scored")
         else:
-            while True:
-                try:
-                    rating = float(input("Rate this property (1-10): ").strip())
-                    if 1 <= rating <= 10:
-                        break
-                    else:
-                        print("Please enter a number between 1 and 10")
-                except ValueError:
-                    print("Invalid input. Please enter a number between 1 and 10")
-        
-        ratings.append({
-            'image_path': image_path,
-            'filename': filename,
-            'property_score': rating
-        })
-        
-        print(f"✓ Rated: {rating}/10")
-    
-    # Save ratings
-    df = pd.DataFrame(ratings)
-    df.to_csv(args.output, index=False)
-    
+            manual_rate(image_files, writer)
+    finally:
+        writer.close()
+
+    # Summary over everything in the CSV, including earlier runs
+    df = pd.read_csv(output)
     print("\n" + "="*70)
-    print(f"Ratings saved to {args.output}")
-    print(f"Total images rated: {len(ratings)}")
-    print(f"Average rating: {df['property_score'].mean():.2f}")
-    print(f"Min rating: {df['property_score'].min():.1f}")
-    print(f"Max rating: {df['property_score'].max():.1f}")
+    print(f"Ratings saved to {output}")
+    print(f"Rated this run: {writer.count}")
+    print(f"Total images rated: {len(df)}")
+    if len(df):
+        print(f"Average rating: {df['property_score'].mean():.2f}")
+        print(f"Min rating: {df['property_score'].min():.1f}")
+        print(f"Max rating: {df['property_score'].max():.1f}")
     print("="*70)
+    if args.num_shards > 1:
+        print(f"\nWhen every shard is done: python rate_properties.py --merge --num-shards {args.num_shards}")
     print("\nNext step: Run 'python finetune_property_model.py' to fine-tune the model")
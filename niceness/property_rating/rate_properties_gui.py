@@ -1,8 +1,24 @@
+"""
+Tk tool for rating property photos 1-10 into property_ratings.csv.
+
+    python rate_properties_gui.py --prescores prescores.csv
+
+Display-sized thumbnails are decoded by a background prefetcher for the
+next/previous --prefetch images and kept in an on-disk cache
+(--thumb-cache), so moving between images does not wait on decoding
+full-size files. --prescores takes a CSV with image_path/property_score
+columns, e.g. from `rate_properties.py --auto --output prescores.csv`, and
+shows the model's score next to the rating box as a hint.
+"""
+
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
 import os
 import glob
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from pathlib import Path
 
@@ -12,21 +28,105 @@ from pathlib import Path
 IMAGES_DIR = "images"
 RATINGS_CSV = "property_ratings.csv"
 THUMBNAIL_SIZE = (600, 400)
+THUMBNAIL_CACHE_DIR = "cache/gui_thumbs"
+PREFETCH_RADIUS = 5
+PREFETCH_WORKERS = 2
+
+
+class ThumbnailCache:
+    """Display-sized JPEG thumbnails on disk, keyed by source path, size and mtime."""
+
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR, size=THUMBNAIL_SIZE):
+        self.cache_dir = cache_dir
+        self.size = size
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, image_path):
+        stat = os.stat(image_path)
+        key = f"{os.path.abspath(image_path)}|{stat.st_size}|{stat.st_mtime_ns}|{self.size}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".jpg")
+
+    def get(self, image_path):
+        """Thumbnail of `image_path` as a PIL image, decoding and caching it on a miss."""
+        cache_path = self._cache_path(image_path) if self.cache_dir else None
+        if cache_path and os.path.exists(cache_path):
+            with Image.open(cache_path) as cached:
+                cached.load()
+                return cached
+        with Image.open(image_path) as img:
+            img.draft("RGB", self.size)
+            img = img.convert("RGB")
+            img.thumbnail(self.size, Image.Resampling.LANCZOS)
+        if cache_path:
+            tmp_path = cache_path + ".tmp"
+            img.save(tmp_path, "JPEG", quality=90)
+            os.replace(tmp_path, cache_path)
+        return img
+
+
+class ThumbnailPrefetcher:
+    """
+    Decodes thumbnails around the current image on background threads.
+
+    Only PIL images are produced off the main thread; the Tk PhotoImage is
+    created by the GUI when the image is shown.
+    """
+
+    def __init__(self, image_files, thumbnails, radius=PREFETCH_RADIUS, workers=PREFETCH_WORKERS):
+        self.image_files = image_files
+        self.thumbnails = thumbnails
+        self.radius = radius
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.futures = {}
+
+    def request(self, index):
+        """Future for the thumbnail at `index`, scheduling it if needed."""
+        future = self.futures.get(index)
+        if future is None:
+            future = self.pool.submit(self.thumbnails.get, self.image_files[index])
+            self.futures[index] = future
+        return future
+
+    def prefetch_around(self, index):
+        """Schedule the next and previous `radius` images (next first) and drop ones far outside the window."""
+        for index_far in [i for i in self.futures if abs(i - index) > 2 * self.radius]:
+            self.futures.pop(index_far).cancel()
+        for offset in range(1, self.radius + 1):
+            for neighbour in (index + offset, index - offset):
+                if 0 <= neighbour < len(self.image_files):
+                    self.request(neighbour)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def load_prescores(csv_path):
+    """image_path -> model score from a CSV written by rate_properties.py --auto."""
+    if not csv_path or not os.path.exists(csv_path):
+        return {}
+    df = pd.read_csv(csv_path)
+    return dict(zip(df['image_path'], df['property_score']))
+
 
 class PropertyRatingGUI:
-    def __init__(self, root):
+    def __init__(self, root, images_dir=IMAGES_DIR, prescores=None, thumb_cache_dir=THUMBNAIL_CACHE_DIR,
+                 prefetch_radius=PREFETCH_RADIUS):
         self.root = root
         self.root.title("Property Photo Rating Tool")
         self.root.geometry("900x700")
+        self.prescores = prescores or {}
         
         # Get all images
         self.image_files = []
         for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp', '*.avif']:
-            self.image_files.extend(glob.glob(os.path.join(IMAGES_DIR, ext)))
+            self.image_files.extend(glob.glob(os.path.join(images_dir, ext)))
         self.image_files.sort()
+        self.prefetcher = ThumbnailPrefetcher(self.image_files, ThumbnailCache(thumb_cache_dir),
+                                              radius=prefetch_radius)
         
         if not self.image_files:
-            messagebox.showerror("Error", f"No images found in {IMAGES_DIR}")
+            messagebox.showerror("Error", f"No images found in {images_dir}")
             root.destroy()
             return
         
@@ -74,6 +174,10 @@ class PropertyRatingGUI:
         self.rating_input = ttk.Entry(input_frame, width=5, font=("Arial", 14))
         self.rating_input.pack(side=tk.LEFT, padx=5)
         self.rating_input.bind("<Return>", lambda e: self.next_image())
+
+        # Model pre-score hint
+        self.hint_label = ttk.Label(input_frame, text="", font=("Arial", 11), foreground="gray")
+        self.hint_label.pack(side=tk.LEFT, padx=10)
         
         # Rating display
         self.rating_display = ttk.Label(main_frame, text="5", font=("Arial", 20, "bold"), 
@@ -123,14 +227,19 @@ class PropertyRatingGUI:
         image_path = self.image_files[self.current_index]
         filename = os.path.basename(image_path)
         
-        # Load image
-        try:
-            img = Image.open(image_path)
-            img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
-            self.current_photo = ImageTk.PhotoImage(img)
-            self.image_label.config(image=self.current_photo)
-        except Exception as e:
-            self.image_label.config(text=f"Error loading image: {e}")
+        # Load image (usually already decoded by the prefetcher)
+        future = self.prefetcher.request(self.current_index)
+        self.prefetcher.prefetch_around(self.current_index)
+        if future.done():
+            self.show_photo(future)
+        else:
+            self.current_photo = None
+            self.image_label.config(image="", text="Loading...")
+            self.wait_for_photo(future, self.current_index)
+        
+        # Model hint
+        prescore = self.prescores.get(image_path)
+        self.hint_label.config(text=f"Model suggests: {prescore:.1f}" if prescore is not None else "")
         
         # Update info
         file_size = os.path.getsize(image_path) / 1024  # KB
@@ -154,6 +263,23 @@ class PropertyRatingGUI:
         
         self.rating_input.focus()
     
+    def show_photo(self, future):
+        try:
+            self.current_photo = ImageTk.PhotoImage(future.result())
+            self.image_label.config(image=self.current_photo, text="")
+        except Exception as e:
+            self.current_photo = None
+            self.image_label.config(image="", text=f"Error loading image: {e}")
+    
+    def wait_for_photo(self, future, index):
+        """Poll from the Tk event loop so the window stays responsive while decoding"""
+        if index != self.current_index:
+            return
+        if future.done():
+            self.show_photo(future)
+        else:
+            self.root.after(15, self.wait_for_photo, future, index)
+    
     def on_slider_change(self, value):
         """Update rating display when slider changes"""
         rating = float(value)
@@ -235,6 +361,17 @@ class PropertyRatingGUI:
         print(f"{'='*70}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate property photos in a GUI")
+    parser.add_argument("--images-dir", default=IMAGES_DIR)
+    parser.add_argument("--prescores", default=None,
+                        help="CSV of model scores (rate_properties.py --auto output) shown as hints")
+    parser.add_argument("--thumb-cache", default=THUMBNAIL_CACHE_DIR,
+                        help="On-disk thumbnail cache directory ('' disables it)")
+    parser.add_argument("--prefetch", type=int, default=PREFETCH_RADIUS,
+                        help="Images to decode ahead and behind the current one")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = PropertyRatingGUI(root)
+    app = PropertyRatingGUI(root, args.images_dir, load_prescores(args.prescores), args.thumb_cache, args.prefetch)
     root.mainloop()
+    app.prefetcher.close()
@@ -0,0 +1,89 @@
+"""
+Opt-in CPU speedups for NicenessModel training and scoring.
+
+    --bf16           bfloat16 autocast (matmuls/convs in bf16, losses in fp32)
+    --channels-last  NHWC memory format for the model and input batches
+    --compile        torch.compile the encoder (the heads are too small to matter)
+
+All three are off by default; benchmark_acceleration.py in niceness/training
+reports step time and validation loss for every combination.
+"""
+
+import contextlib
+
+import torch
+
+
+def add_acceleration_args(parser):
+    """Register --bf16/--channels-last/--compile on an argparse parser."""
+    parser.add_argument("--bf16", action="store_true", help="Run forward passes under bfloat16 autocast")
+    parser.add_argument("--channels-last", action="store_true", help="Use channels_last memory format")
+    parser.add_argument("--compile", action="store_true", help="torch.compile the image encoder")
+    return parser
+
+
+def prepare_model(model, channels_last=False, compile=False):
+    """Apply memory format and compilation in place. State dict keys are unchanged."""
+    if channels_last:
+        model.to(memory_format=torch.channels_last)
+    if compile:
+        # Module.compile() compiles in place, so checkpoints keep their usual keys
+        model.encoder.compile()
+    return model
+
+
+def prepare_batch(images, device, channels_last=False):
+    images = images.to(device, non_blocking=True)
+    if channels_last:
+        images = images.contiguous(memory_format=torch.channels_last)
+    return images
+
+
+def autocast(device, bf16=False):
+    """bfloat16 autocast on `device` when `bf16` is set, otherwise a no-op context."""
+    if not bf16:
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=torch.device(device).type, dtype=torch.bfloat16)
+
+
+class AcceleratedScorer:
+    """
+    Scoring runtime wrapping an eager NicenessModel with the acceleration options.
+
+    Called like the other runtimes: images [N, C, H, W] -> (scores [N], embeddings [N, D]),
+    both returned in fp32. `encode` and the `forward_*_embeddings` heads run with the same
+    options, for callers that cache embeddings; other attributes pass through to the model.
+    """
+
+    def __init__(self, model, bf16=False, channels_last=False, compile=False):
+        self.model = prepare_model(model, channels_last, compile)
+        self.bf16 = bf16
+        self.channels_last = channels_last
+        self.device = next(model.parameters()).device
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    @torch.no_grad()
+    def __call__(self, images):
+        images = prepare_batch(images, self.device, self.channels_last)
+        with autocast(self.device, self.bf16):
+            emb = self.model.encoder(images)
+            scores = self.model.ava_head(emb).squeeze(1)
+        return scores.float(), emb.float()
+
+    @torch.no_grad()
+    def encode(self, images):
+        images = prepare_batch(images, self.device, self.channels_last)
+        with autocast(self.device, self.bf16):
+            return self.model.encoder(images).float()
+
+    @torch.no_grad()
+    def forward_ava_embeddings(self, emb):
+        with autocast(self.device, self.bf16):
+            return self.model.forward_ava_embeddings(emb).float()
+
+    @torch.no_grad()
+    def forward_airbnb_embeddings(self, emb):
+        with autocast(self.device, self.bf16):
+            return self.model.forward_airbnb_embeddings(emb).float()
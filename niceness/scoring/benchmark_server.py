@@ -0,0 +1,92 @@
+"""
+Benchmark latency vs batch window for the micro-batching inference server.
+
+    python benchmark_server.py --windows 0 5 10 25 50 --concurrency 16 --requests 128
+
+For each max-wait window an in-process server is started on a free port and
+hammered by `--concurrency` client threads, each sending one image per
+request. Prints p50/p95 latency, throughput and the mean batch size the
+server actually formed. Uses random weights unless --checkpoint is given;
+the timings do not depend on the weights.
+"""
+
+import argparse
+import io
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from client import NicenessClient
+from inference import load_model
+from server import make_server
+
+
+def make_test_image(seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(300, 400, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def run_window(model, max_wait_ms, max_batch, concurrency, num_requests, images):
+    server = make_server(model, port=0, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # One client (and connection pool) per worker thread
+    local = threading.local()
+
+    def one_request(i):
+        if not hasattr(local, "client"):
+            local.client = NicenessClient(url)
+        start = time.perf_counter()
+        local.client.score_bytes([images[i % len(images)]])
+        return time.perf_counter() - start
+
+    try:
+        # Warm-up so the first batch does not include lazy initialisation
+        NicenessClient(url).score_bytes([images[0]])
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one_request, range(num_requests)))
+        wall = time.perf_counter() - start
+        stats = server.batcher.stats()
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.batcher.stop()
+
+    latencies.sort()
+    return {
+        "max_wait_ms": max_wait_ms,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "throughput": num_requests / wall,
+        "mean_batch": stats["mean_batch_size"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark inference server latency vs batch window")
+    parser.add_argument("--checkpoint", default="", help="Optional checkpoint (random weights if omitted)")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 5, 10, 25, 50],
+                        help="Max-wait windows to test, in milliseconds")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=128)
+    args = parser.parse_args()
+
+    model = load_model(args.checkpoint)
+    images = [make_test_image(seed) for seed in range(8)]
+
+    print(f"{'window_ms':>10} {'p50_ms':>10} {'p95_ms':>10} {'img/s':>10} {'mean_batch':>11}")
+    for window in args.windows:
+        result = run_window(model, window, args.max_batch, args.concurrency, args.requests, images)
+        print(f"{result['max_wait_ms']:>10.1f} {result['p50_ms']:>10.1f} {result['p95_ms']:>10.1f} "
+              f"{result['throughput']:>10.1f} {result['mean_batch']:>11.2f}")
@@ -0,0 +1,51 @@
+"""
+Client for the NicenessModel inference server (see server.py).
+
+    client = NicenessClient("http://127.0.0.1:8765")
+    scores = client.score_paths(["images/1.webp", "images/2.webp"])
+    scores, embeddings = client.score_bytes([data], embeddings=True)
+
+Only depends on `requests`, so scripts can score images without importing
+torch or loading the checkpoint themselves.
+"""
+
+import base64
+import os
+
+import requests
+
+DEFAULT_SERVER_URL = os.getenv("NICENESS_SERVER_URL", "http://127.0.0.1:8765")
+
+
+class NicenessClient:
+    def __init__(self, base_url: str = DEFAULT_SERVER_URL, timeout: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _post_score(self, payload: dict, embeddings: bool):
+        payload["embeddings"] = embeddings
+        res = self.session.post(f"{self.base_url}/score", json=payload, timeout=self.timeout)
+        res.raise_for_status()
+        data = res.json()
+        if embeddings:
+            return data["scores"], data["embeddings"]
+        return data["scores"]
+
+    def score_bytes(self, images: list[bytes], embeddings: bool = False):
+        """Score encoded image files (JPEG/PNG/WebP bytes). Returns scores, or (scores, embeddings)."""
+        encoded = [base64.b64encode(data).decode() for data in images]
+        return self._post_score({"images": encoded}, embeddings)
+
+    def score_paths(self, paths: list[str], embeddings: bool = False):
+        """Score images by path. The files are read locally and sent inline."""
+        images = []
+        for path in paths:
+            with open(path, "rb") as f:
+                images.append(f.read())
+        return self.score_bytes(images, embeddings)
+
+    def health(self) -> dict:
+        res = self.session.get(f"{self.base_url}/health", timeout=self.timeout)
+        res.raise_for_status()
+        return res.json()
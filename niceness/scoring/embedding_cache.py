@@ -0,0 +1,247 @@
+"""
+Persistent encoder embedding cache for NicenessModel.
+
+Embeddings are keyed by (encoder weights hash, image content hash), so a
+head-only fine-tune keeps every cached entry valid while any change to the
+encoder starts a fresh cache. Layout on disk:
+
+    <cache_dir>/<encoder_hash>/
+        embeddings.f16   memory-mapped [capacity, dim] matrix (or .f32)
+        index.json       {"dim": ..., "dtype": ..., "count": ..., "rows": {image_hash: row}}
+        lock             flock(2) target serialising writers across processes
+
+Several processes (the niceness worker, apply_niceness_scores.py) may share
+a cache directory. `put` holds an exclusive lock on the lock file while it
+reloads the index, allocates rows and rewrites index.json, so writers never
+hand out the same row or drop each other's keys. Readers pick up other
+processes' entries when index.json changes.
+
+Rescoring with new heads then only needs `forward_ava_embeddings` /
+`forward_airbnb_embeddings` on the cached matrix:
+
+    python embedding_cache.py --images-dir images --checkpoint checkpoints/property_model.pth
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one writer per cache directory
+    fcntl = None
+
+import numpy as np
+import torch
+
+# =====================
+# Configuration
+# =====================
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cache", "embeddings")
+EMBED_DIM = 1024
+INITIAL_CAPACITY = 1024
+DTYPES = {"float16": np.float16, "float32": np.float32}
+
+
+# =====================
+# Hashing
+# =====================
+def image_hash(data: bytes) -> str:
+    """Content hash of an encoded image file."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path) -> str:
+    with open(path, "rb") as f:
+        return image_hash(f.read())
+
+
+def _update_with_state(h, value):
+    if isinstance(value, torch.Tensor):
+        value = value.detach().cpu()
+        if value.is_quantized:
+            value = value.dequantize()
+        if value.dtype == torch.bfloat16:
+            value = value.float()
+        h.update(value.contiguous().numpy().tobytes())
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            _update_with_state(h, item)
+    else:
+        h.update(repr(value).encode())
+
+
+def encoder_fingerprint(model) -> str:
+    """Hash of the encoder weights; embeddings stay valid for as long as this does."""
+    h = hashlib.sha256()
+    for key, value in model.encoder.state_dict().items():
+        h.update(key.encode())
+        _update_with_state(h, value)
+    return h.hexdigest()[:16]
+
+
+# =====================
+# Cache
+# =====================
+class EmbeddingCache:
+    def __init__(self, cache_dir, encoder_hash, dim=EMBED_DIM, dtype="float16"):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {list(DTYPES)}")
+        self.root = os.path.join(cache_dir, encoder_hash)
+        os.makedirs(self.root, exist_ok=True)
+        self.index_path = os.path.join(self.root, "index.json")
+        self.lock_path = os.path.join(self.root, "lock")
+        self._lock = threading.Lock()
+
+        self.rows = {}
+        self.count = 0
+        self.dim = dim
+        self.dtype = dtype
+        self.index_version = None
+        with self._file_lock():
+            self._load_index()
+            self.matrix_path = os.path.join(self.root,
+                                            "embeddings.f16" if self.dtype == "float16" else "embeddings.f32")
+            self.itemsize = np.dtype(DTYPES[self.dtype]).itemsize
+            if not os.path.exists(self.matrix_path):
+                self._resize_file(INITIAL_CAPACITY)
+            self._open()
+
+    @classmethod
+    def for_model(cls, model, cache_dir=CACHE_DIR, dtype="float16"):
+        return cls(cache_dir, encoder_fingerprint(model), dtype=dtype)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    @contextmanager
+    def _file_lock(self, exclusive=True):
+        """Hold an flock on the cache's lock file (a no-op where fcntl is unavailable)."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load_index(self):
+        """Reload index.json if another process rewrote it since we last read it."""
+        try:
+            version = self._index_version()
+        except FileNotFoundError:
+            return
+        if version == self.index_version:
+            return
+        with open(self.index_path) as f:
+            index = json.load(f)
+        self.dim, self.dtype = index["dim"], index["dtype"]
+        self.rows, self.count = index["rows"], index["count"]
+        self.index_version = version
+
+    def _index_version(self):
+        # os.replace gives every rewrite a new inode, so this changes even within one mtime tick
+        stat = os.stat(self.index_path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _sync(self):
+        """Pick up rows added by other processes, remapping the matrix if they grew it."""
+        self._load_index()
+        if self.count > self.capacity:
+            self.matrix.flush()
+            del self.matrix
+            self._open()
+
+    def _resize_file(self, capacity):
+        with open(self.matrix_path, "ab") as f:
+            f.truncate(capacity * self.dim * self.itemsize)
+
+    def _open(self):
+        size = os.path.getsize(self.matrix_path)
+        self.capacity = size // (self.dim * self.itemsize)
+        self.matrix = np.memmap(self.matrix_path, dtype=DTYPES[self.dtype], mode="r+",
+                                shape=(self.capacity, self.dim))
+
+    def get(self, keys):
+        """
+        Look up embeddings for a list of image hashes.
+
+        Returns (embeddings float32 [len(keys), dim], hit mask [len(keys)] bool).
+        Rows for misses are zero.
+        """
+        out = np.zeros((len(keys), self.dim), dtype=np.float32)
+        hits = np.zeros(len(keys), dtype=bool)
+        with self._lock, self._file_lock(exclusive=False):
+            self._sync()
+            for i, key in enumerate(keys):
+                row = self.rows.get(key)
+                if row is not None:
+                    out[i] = self.matrix[row]
+                    hits[i] = True
+        return out, hits
+
+    def put(self, keys, embeddings):
+        """Store embeddings [len(keys), dim] for new image hashes and persist the index."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._sync()
+            new = [(key, emb) for key, emb in zip(keys, embeddings) if key not in self.rows]
+            if not new:
+                return
+            if self.count + len(new) > self.capacity:
+                self.matrix.flush()
+                del self.matrix
+                self._resize_file(max(self.capacity * 2, self.count + len(new)))
+                self._open()
+            for key, emb in new:
+                self.matrix[self.count] = emb
+                self.rows[key] = self.count
+                self.count += 1
+            self.matrix.flush()
+            self._write_index()
+
+    def all_embeddings(self) -> tuple[list[str], np.ndarray]:
+        """Every cached (image hash, embedding) pair, as a float32 matrix view in row order."""
+        with self._lock, self._file_lock(exclusive=False):
+            self._sync()
+            keys = sorted(self.rows, key=self.rows.get)
+            return keys, np.asarray(self.matrix[:self.count], dtype=np.float32)
+
+    def _write_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype, "count": self.count, "rows": self.rows}, f)
+        os.replace(tmp_path, self.index_path)
+        self.index_version = self._index_version()
+
+
+if __name__ == "__main__":
+    from inference import load_model, score_sources_cached
+
+    parser = argparse.ArgumentParser(description="Warm the encoder embedding cache for a directory of images")
+    parser.add_argument("--images-dir", default="images")
+    parser.add_argument("--checkpoint", default="checkpoints/property_model.pth")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--dtype", default="float16", choices=list(DTYPES))
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    image_files = []
+    for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp', '*.avif']:
+        image_files.extend(glob.glob(os.path.join(args.images_dir, ext)))
+    image_files.sort()
+
+    model = load_model(args.checkpoint)
+    cache = EmbeddingCache.for_model(model, args.cache_dir, args.dtype)
+    before = len(cache)
+    score_sources_cached(model, image_files, cache, batch_size=args.batch_size)
+    print(f"Cache {cache.root}: {before} -> {len(cache)} embeddings ({len(image_files)} images scanned)")
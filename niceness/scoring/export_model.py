@@ -0,0 +1,124 @@
+"""
+Export NicenessModel for CPU serving.
+
+    python export_model.py --checkpoint checkpoints/property_model.pth --output-dir exported
+    python export_model.py --int8 --static-backbone --calibration-csv property_ratings.csv
+
+Writes, depending on flags:
+    niceness.pt        TorchScript trace of the fp32 model
+    niceness_int8.pt   TorchScript trace with int8 Linear layers (and int8 backbone with --static-backbone)
+    niceness.onnx      ONNX graph of the fp32 model (opset 17, dynamic batch)
+
+Every artifact maps images [N, 3, 224, 224] -> (ava scores [N], embeddings [N, 1024])
+and can be selected in the scoring entry points with `--runtime torchscript`
+or `--runtime onnx` plus the artifact path.
+"""
+
+import argparse
+import os
+
+import pandas as pd
+import torch
+
+from inference import ScoreAndEmbed, inference_transform, load_image, load_model
+from quantization import quantize_dynamic_linear, quantize_static_backbone
+
+# =====================
+# Configuration
+# =====================
+CHECKPOINT_PATH = "checkpoints/property_model.pth"
+OUTPUT_DIR = "exported"
+RATINGS_CSV = "property_ratings.csv"
+ONNX_OPSET = 17
+
+
+def example_input(batch_size=1):
+    return torch.randn(batch_size, 3, 224, 224)
+
+
+@torch.no_grad()
+def export_torchscript(model, path):
+    """Trace ScoreAndEmbed(model) and save it with torch.jit."""
+    wrapper = ScoreAndEmbed(model).cpu().eval()
+    traced = torch.jit.trace(wrapper, example_input(2))
+    traced = torch.jit.freeze(traced)
+    traced.save(str(path))
+    return path
+
+
+@torch.no_grad()
+def export_onnx(model, path, opset=ONNX_OPSET):
+    """Export ScoreAndEmbed(model) to ONNX with a dynamic batch dimension."""
+    wrapper = ScoreAndEmbed(model).cpu().eval()
+    torch.onnx.export(
+        wrapper,
+        (example_input(2),),
+        str(path),
+        input_names=["images"],
+        output_names=["scores", "embeddings"],
+        dynamic_axes={"images": {0: "batch"}, "scores": {0: "batch"}, "embeddings": {0: "batch"}},
+        opset_version=opset,
+        dynamo=False,
+    )
+    return path
+
+
+def resolve_image_path(image_path, images_root=""):
+    """Ratings CSVs store Windows-style relative paths (imgs\\1.webp); make them usable here."""
+    image_path = str(image_path).replace("\\", os.sep)
+    if images_root and not os.path.isabs(image_path):
+        image_path = os.path.join(images_root, image_path)
+    return image_path
+
+
+def calibration_batches(ratings_csv, images_root="", num_batches=16, batch_size=8):
+    """Yield preprocessed batches of rated property photos for static quantization."""
+    df = pd.read_csv(ratings_csv)
+    paths = [resolve_image_path(p, images_root) for p in df["image_path"]]
+    paths = [p for p in paths if os.path.exists(p)][:num_batches * batch_size]
+    for start in range(0, len(paths), batch_size):
+        images = []
+        for path in paths[start:start + batch_size]:
+            try:
+                images.append(inference_transform(load_image(path)))
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+        if images:
+            yield torch.stack(images)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export NicenessModel to TorchScript/ONNX and int8")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="Model checkpoint path")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--no-torchscript", action="store_true", help="Skip the fp32 TorchScript export")
+    parser.add_argument("--onnx", action="store_true", help="Also export an fp32 ONNX model")
+    parser.add_argument("--int8", action="store_true", help="Also export an int8 TorchScript model")
+    parser.add_argument("--static-backbone", action="store_true",
+                        help="With --int8, statically quantize the EfficientNet backbone as well")
+    parser.add_argument("--calibration-csv", default=RATINGS_CSV,
+                        help="Ratings CSV whose images calibrate --static-backbone")
+    parser.add_argument("--images-root", default="", help="Prefix for relative image paths in the CSV")
+    parser.add_argument("--calibration-batches", type=int, default=16)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    model = load_model(args.checkpoint, torch.device("cpu"))
+
+    if not args.no_torchscript:
+        path = export_torchscript(model, os.path.join(args.output_dir, "niceness.pt"))
+        print(f"✓ TorchScript model saved to {path}")
+
+    if args.onnx:
+        path = export_onnx(model, os.path.join(args.output_dir, "niceness.onnx"))
+        print(f"✓ ONNX model saved to {path}")
+
+    if args.int8:
+        quantized = model
+        if args.static_backbone:
+            print("Calibrating static backbone quantization...")
+            batches = calibration_batches(args.calibration_csv, args.images_root, args.calibration_batches)
+            quantized = quantize_static_backbone(quantized, batches)
+        quantized = quantize_dynamic_linear(quantized)
+        path = export_torchscript(quantized, os.path.join(args.output_dir, "niceness_int8.pt"))
+        print(f"✓ Int8 TorchScript model saved to {path}")
@@ -0,0 +1,266 @@
+"""
+Shared NicenessModel loading and batched scoring helpers.
+
+Used by the scoring scripts and the background niceness worker so that every
+entry point preprocesses images the same way and scores a whole batch in a
+single forward pass.
+
+Scoring can run on one of several CPU runtimes (see `load_runtime`):
+    eager        plain PyTorch NicenessModel
+    int8         eager model with dynamic int8 quantization of the Linear layers
+    torchscript  a traced model written by export_model.py (optionally int8)
+    onnx         an ONNX model written by export_model.py, run with onnxruntime
+"""
+
+import os
+from io import BytesIO
+
+import torch
+import torch.nn as nn
+from PIL import Image
+from torchvision import transforms
+
+try:
+    from niceness.scoring.modeltest import NicenessModel
+except ImportError:
+    from modeltest import NicenessModel
+
+# =====================
+# Configuration
+# =====================
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+RUNTIMES = ("eager", "int8", "torchscript", "onnx")
+
+# Image preprocessing
+inference_transform = transforms.Compose([
+    transforms.Resize(256),
+    transforms.CenterCrop(224),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                        std=[0.229, 0.224, 0.225])
+])
+
+
+# =====================
+# Model Loading
+# =====================
+def load_model(checkpoint_path, device=DEVICE) -> NicenessModel:
+    """Build a NicenessModel, load `checkpoint_path` if it exists and switch to eval mode."""
+    model = NicenessModel(embed_dim=1024)
+    if os.path.exists(checkpoint_path):
+        state_dict = torch.load(checkpoint_path, map_location=device)
+        model.load_state_dict(state_dict)
+        print(f"Loaded weights from {checkpoint_path}")
+    else:
+        print(f"WARNING: Checkpoint not found at {checkpoint_path}. Using random initialization.")
+    model = model.to(device)
+    model.eval()
+    return model
+
+
+class ScoreAndEmbed(nn.Module):
+    """Export wrapper: images [N, C, H, W] -> (ava scores [N], encoder embeddings [N, D])."""
+
+    def __init__(self, model: NicenessModel):
+        super().__init__()
+        self.encoder = model.encoder
+        self.ava_head = model.ava_head
+
+    def forward(self, images):
+        emb = self.encoder(images)
+        return self.ava_head(emb).squeeze(1), emb
+
+
+class OnnxRuntimeScorer:
+    """Runs an exported ScoreAndEmbed ONNX graph with onnxruntime on the CPU."""
+
+    def __init__(self, onnx_path, num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx runtime needs onnxruntime: pip install onnxruntime") from e
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, images):
+        scores, emb = self.session.run(None, {self.input_name: images.cpu().numpy()})
+        return torch.from_numpy(scores), torch.from_numpy(emb)
+
+
+def load_runtime(runtime="eager", checkpoint_path="", artifact_path=None, device=DEVICE,
+                 bf16=False, channels_last=False, compile=False):
+    """
+    Load a scorer for the requested runtime.
+
+    eager/int8 build the model from `checkpoint_path`; torchscript/onnx load
+    the file written by export_model.py from `artifact_path`. Quantized and
+    exported runtimes always run on the CPU. The bf16/channels_last/compile
+    options (see acceleration.py) apply to the eager runtime only.
+    """
+    accelerated = bf16 or channels_last or compile
+    if accelerated and runtime != "eager":
+        raise ValueError("--bf16/--channels-last/--compile only apply to the eager runtime")
+    if runtime == "eager" and accelerated:
+        try:
+            from niceness.scoring.acceleration import AcceleratedScorer
+        except ImportError:
+            from acceleration import AcceleratedScorer
+        return AcceleratedScorer(load_model(checkpoint_path, device), bf16, channels_last, compile)
+    if runtime == "eager":
+        return load_model(checkpoint_path, device)
+    if runtime == "int8":
+        try:
+            from niceness.scoring.quantization import quantize_dynamic_linear
+        except ImportError:
+            from quantization import quantize_dynamic_linear
+        return quantize_dynamic_linear(load_model(checkpoint_path, torch.device("cpu")))
+    if runtime in ("torchscript", "onnx") and not artifact_path:
+        raise ValueError(f"The {runtime} runtime needs an exported model (run export_model.py first)")
+    if runtime == "torchscript":
+        module = torch.jit.load(str(artifact_path), map_location="cpu")
+        module.eval()
+        return module
+    if runtime == "onnx":
+        return OnnxRuntimeScorer(artifact_path)
+    raise ValueError(f"Unknown runtime {runtime!r}; expected one of {RUNTIMES}")
+
+
+def runtime_device(model, device=DEVICE) -> torch.device:
+    """Device inputs must be moved to for `model` (exported and quantized runtimes are CPU only)."""
+    if isinstance(model, NicenessModel):
+        try:
+            return next(model.parameters()).device
+        except StopIteration:
+            return torch.device("cpu")
+    return getattr(model, "device", torch.device("cpu"))
+
+
+# =====================
+# Scoring
+# =====================
+def load_image(source) -> Image.Image:
+    """Open an image from a path or raw bytes and convert it to RGB."""
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    return Image.open(source).convert("RGB")
+
+
+def _score_and_embed(model, batch):
+    if isinstance(model, NicenessModel):
+        emb = model.encoder(batch)
+        return model.ava_head(emb).squeeze(1), emb
+    return model(batch)
+
+
+@torch.no_grad()
+def score_batch(model, images, device=DEVICE) -> list[float]:
+    """
+    Score a list of PIL images with a single forward pass.
+
+    `model` is a NicenessModel or any scorer returned by `load_runtime`.
+    Returns one float per image, in input order.
+    """
+    if not images:
+        return []
+    batch = torch.stack([inference_transform(image) for image in images])
+    scores, _ = _score_and_embed(model, batch.to(runtime_device(model, device)))
+    return scores.float().cpu().tolist()
+
+
+@torch.no_grad()
+def score_and_embed_tensors(model, batch, device=DEVICE) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Run the encoder once over a preprocessed batch [N, C, H, W].
+
+    Returns (scores [N], embeddings [N, D]) on the CPU.
+    """
+    scores, emb = _score_and_embed(model, batch.to(runtime_device(model, device)))
+    return scores.float().cpu(), emb.float().cpu()
+
+
+def _encode(model, batch):
+    # An AcceleratedScorer encodes under its own autocast and memory format
+    if hasattr(type(model), "encode"):
+        return model.encode(batch)
+    return model.encoder(batch)
+
+
+def _read_source(source) -> bytes:
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    with open(source, "rb") as f:
+        return f.read()
+
+
+@torch.no_grad()
+def score_sources_cached(model, sources, cache, batch_size=32, head="ava", device=DEVICE) -> list:
+    """
+    Score images (paths or encoded bytes) going through an EmbeddingCache.
+
+    Only images whose content hash is not cached run through the encoder; every
+    score is then computed from embeddings by the chosen head ("ava" scores
+    each image, "airbnb" scores all sources as one listing). `model` must be a
+    NicenessModel (eager or int8) or an AcceleratedScorer so the heads can run
+    on their own.
+
+    Returns one score per source ("ava") or a one-element list ("airbnb");
+    sources that could not be read or decoded score None.
+    """
+    if not hasattr(model, "forward_ava_embeddings"):
+        raise ValueError("Cached scoring needs the eager or int8 runtime")
+    try:
+        from niceness.scoring.embedding_cache import image_hash
+    except ImportError:
+        from embedding_cache import image_hash
+
+    keys = []
+    for source in sources:
+        try:
+            data = _read_source(source)
+            keys.append((image_hash(data), data))
+        except Exception as e:
+            print(f"Error reading {source}: {e}")
+            keys.append((None, None))
+
+    hashes = [key for key, _ in keys if key is not None]
+    _, hits = cache.get(hashes)
+    hit_set = {key for key, hit in zip(hashes, hits) if hit}
+
+    # Encode the misses in batches and add them to the cache
+    misses = []
+    seen = set(hit_set)
+    for key, data in keys:
+        if key is not None and key not in seen:
+            seen.add(key)
+            misses.append((key, data))
+
+    encoder_device = runtime_device(model, device)
+    for start in range(0, len(misses), batch_size):
+        chunk_keys, tensors = [], []
+        for key, data in misses[start:start + batch_size]:
+            try:
+                tensors.append(inference_transform(load_image(data)))
+                chunk_keys.append(key)
+            except Exception as e:
+                print(f"Error decoding image {key[:12]}: {e}")
+        if tensors:
+            emb = _encode(model, torch.stack(tensors).to(encoder_device))
+            cache.put(chunk_keys, emb.float().cpu().numpy())
+
+    valid = [i for i, (key, _) in enumerate(keys) if key is not None and key in cache]
+    if not valid:
+        return [None] if head == "airbnb" else [None] * len(sources)
+
+    embeddings, _ = cache.get([keys[i][0] for i in valid])
+    emb = torch.from_numpy(embeddings).to(encoder_device)
+    if head == "airbnb":
+        return [model.forward_airbnb_embeddings(emb).item()]
+
+    scores = [None] * len(sources)
+    for i, score in zip(valid, model.forward_ava_embeddings(emb).float().cpu().tolist()):
+        scores[i] = score
+    return scores
@@ -50,16 +50,86 @@ class NicenessModel(nn.Module):
 
     def forward_ava(self, images):
         emb = self.encoder(images)
-        return self.ava_head(emb).squeeze(1)
+        return self.forward_ava_embeddings(emb)
 
     def forward_airbnb(self, images):
         """
         images: Tensor [N, C, H, W]
         """
         emb = self.encoder(images)               # [N, D]
+        return self.forward_airbnb_embeddings(emb)
+
+    def forward_ava_embeddings(self, emb):
+        """
+        emb: Tensor [N, D] of encoder outputs (e.g. from an embedding cache)
+        """
+        return self.ava_head(emb).squeeze(1)
+
+    def forward_airbnb_embeddings(self, emb):
+        """
+        emb: Tensor [N, D] of encoder outputs for the images of one listing
+        """
         pooled = emb.mean(dim=0, keepdim=True)   # [1, D]
         return self.airbnb_head(pooled).squeeze(1)
 
+    def forward_airbnb_listings(self, images, offsets):
+        """
+        images: Tensor [N, C, H, W] of the images of several listings, concatenated
+        offsets: LongTensor [L + 1]; listing i is images[offsets[i]:offsets[i + 1]]
+
+        Returns one score per listing [L], encoding all N images in one pass.
+        """
+        emb = self.encoder(images)               # [N, D]
+        return self.forward_airbnb_listings_embeddings(emb, offsets)
+
+    def forward_airbnb_listings_embeddings(self, emb, offsets):
+        """
+        emb: Tensor [N, D], offsets: LongTensor [L + 1] as in forward_airbnb_listings
+        """
+        pooled = segment_mean(emb, offsets)      # [L, D]
+        return self.airbnb_head(pooled).squeeze(1)
+
+
+# -----------------------------
+# Listing Batches
+# -----------------------------
+def listing_offsets(counts, device=None):
+    """
+    Offsets [L + 1] for listings with `counts` images each, e.g. [3, 2] -> [0, 3, 5]
+    """
+    counts = torch.as_tensor(counts, dtype=torch.long, device=device)
+    return torch.cat([counts.new_zeros(1), counts.cumsum(0)])
+
+
+def segment_mean(emb, offsets):
+    """
+    Mean of each segment emb[offsets[i]:offsets[i + 1]] -> [L, D]. Segments must be non-empty.
+    """
+    offsets = offsets.to(emb.device)
+    counts = offsets[1:] - offsets[:-1]
+    segment_ids = torch.repeat_interleave(torch.arange(len(counts), device=emb.device), counts)
+    sums = emb.new_zeros(len(counts), emb.shape[1]).index_add_(0, segment_ids, emb)
+    return sums / counts.unsqueeze(1).to(emb.dtype)
+
+
+def collate_listings(listings):
+    """
+    listings: list of Tensors [n_i, C, H, W] -> (images [sum n_i, C, H, W], offsets [L + 1])
+    """
+    images = torch.cat(listings)
+    return images, listing_offsets([len(listing) for listing in listings])
+
+
+def collate_listing_pairs(batch):
+    """
+    DataLoader collate for (images_a, images_b) listing pairs with any number of images each.
+
+    Returns (images_a, offsets_a, images_b, offsets_b) for train_airbnb_epoch.
+    """
+    images_a, offsets_a = collate_listings([pair[0] for pair in batch])
+    images_b, offsets_b = collate_listings([pair[1] for pair in batch])
+    return images_a, offsets_a, images_b, offsets_b
+
 
 # -----------------------------
 # AVA Training
@@ -96,17 +166,30 @@ def ranking_loss(score_a, score_b, margin=1.0):
 # Airbnb Training
 # -----------------------------
 def train_airbnb_epoch(model, dataloader, optimizer, device):
+    """
+    dataloader yields (images_a, offsets_a, images_b, offsets_b) batches of
+    listing pairs (see collate_listing_pairs), or a single (images_a, images_b)
+    pair per batch. Listing a of each pair should outrank listing b.
+    """
     model.train()
     total_loss = 0.0
 
-    for images_a, images_b in dataloader:
-        images_a = images_a.to(device)
-        images_b = images_b.to(device)
+    for batch in dataloader:
+        if len(batch) == 2:
+            images_a, images_b = batch
+            offsets_a = listing_offsets([len(images_a)])
+            offsets_b = listing_offsets([len(images_b)])
+        else:
+            images_a, offsets_a, images_b, offsets_b = batch
 
-        score_a = model.forward_airbnb(images_a)
-        score_b = model.forward_airbnb(images_b)
+        # Both sides of every pair in one encoder pass
+        images = torch.cat([images_a, images_b]).to(device)
+        offsets = torch.cat([offsets_a, offsets_b[1:] + offsets_a[-1]]).to(device)
+        scores = model.forward_airbnb_listings(images, offsets)
+        num_pairs = len(offsets_a) - 1
+        score_a, score_b = scores[:num_pairs], scores[num_pairs:]
 
-        loss = ranking_loss(score_a, score_b)
+        loss = ranking_loss(score_a, score_b).mean()
 
         optimizer.zero_grad()
         loss.backward()
@@ -133,10 +216,32 @@ def score_listing(model, images, device):
     """
     images: Tensor [N, C, H, W]
     """
+    return score_listings(model, images, listing_offsets([len(images)]), device)[0]
+
+
+@torch.no_grad()
+def score_listings(model, images, offsets, device, max_images=256):
+    """
+    images: Tensor [N, C, H, W] of several listings, offsets: LongTensor [L + 1]
+
+    Returns one sigmoid score per listing. Listings are encoded together in
+    chunks of whole listings of up to `max_images` images.
+    """
     model.eval()
-    images = images.to(device)
-    score = model.forward_airbnb(images)
-    return torch.sigmoid(score).item()
+    offsets = torch.as_tensor(offsets, dtype=torch.long)
+    scores = []
+    first = 0
+    num_listings = len(offsets) - 1
+    while first < num_listings:
+        # Always take at least one listing, even if it alone exceeds max_images
+        last = first + 1
+        while last < num_listings and offsets[last + 1] - offsets[first] <= max_images:
+            last += 1
+        chunk = images[offsets[first]:offsets[last]].to(device)
+        chunk_offsets = (offsets[first:last + 1] - offsets[first]).to(device)
+        scores.extend(torch.sigmoid(model.forward_airbnb_listings(chunk, chunk_offsets)).tolist())
+        first = last
+    return scores
 
 
 # -----------------------------
@@ -185,6 +290,23 @@ if __name__ == "__main__":
     print(f"✓ Final listing score: {final_score:.4f}")
     assert 0 <= final_score <= 1, "Score should be between 0 and 1"
     
+    # Test batched listings against one-listing-at-a-time scoring
+    print("\nTesting batched listing scoring...")
+    model.eval()
+    listings = [torch.randn(n, 3, 224, 224) for n in (1, 3, 2)]
+    flat_images, offsets = collate_listings(listings)
+    print(f"✓ Listing offsets: {offsets.tolist()}")
+    with torch.no_grad():
+        batched = model.forward_airbnb_listings(flat_images.to(device), offsets.to(device))
+        single = torch.cat([model.forward_airbnb(listing.to(device)) for listing in listings])
+    print(f"✓ Batched scores shape: {batched.shape}")
+    assert batched.shape == (len(listings),), "Expected one score per listing"
+    assert torch.allclose(batched, single, atol=1e-4), "Batched scores should match per-listing scores"
+    chunked = score_listings(model, flat_images, offsets, device, max_images=3)
+    assert torch.allclose(torch.tensor(chunked), torch.sigmoid(single).cpu(), atol=1e-4), \
+        "Chunked score_listings should match per-listing scores"
+    print("✓ Batched and chunked scores match per-listing scores")
+    
     # Test ranking loss
     print("\nTesting ranking loss...")
     images_a = torch.randn(3, 3, 224, 224).to(device)
@@ -194,6 +316,14 @@ if __name__ == "__main__":
     loss = ranking_loss(score_a, score_b)
     print(f"✓ Ranking loss: {loss.item():.4f}")
     
+    # Test batched pair training step
+    print("\nTesting train_airbnb_epoch with listing pairs...")
+    pairs = [(torch.randn(2, 3, 224, 224), torch.randn(3, 3, 224, 224)),
+             (torch.randn(1, 3, 224, 224), torch.randn(2, 3, 224, 224))]
+    optimizer = torch.optim.SGD(model.parameters(), lr=1e-4)
+    epoch_loss = train_airbnb_epoch(model, [collate_listing_pairs(pairs)], optimizer, device)
+    print(f"✓ Pair batch loss: {epoch_loss:.4f}")
+    
     # Test freeze_encoder
     print("\nTesting freeze_encoder...")
     freeze_encoder(model)
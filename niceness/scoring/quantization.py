@@ -0,0 +1,59 @@
+"""
+Int8 quantization for CPU inference of NicenessModel.
+
+- `quantize_dynamic_linear`: dynamic int8 quantization of every nn.Linear
+  (the encoder `fc` projection plus `ava_head`/`airbnb_head`). Needs no
+  calibration data and can be applied when the checkpoint is loaded.
+- `quantize_static_backbone`: post-training static quantization of the
+  EfficientNet-B3 `features` backbone via FX graph mode, calibrated on a few
+  batches of real images. Ops without a quantized kernel (e.g. SiLU) fall
+  back to float with quant/dequant stubs inserted around them.
+
+Both return a new model; the input model is left untouched.
+"""
+
+import copy
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+QUANTIZED_ENGINE = "x86" if "x86" in torch.backends.quantized.supported_engines else "qnnpack"
+
+
+def _set_engine():
+    torch.backends.quantized.engine = QUANTIZED_ENGINE
+
+
+def quantize_dynamic_linear(model: nn.Module) -> nn.Module:
+    """Dynamic int8 quantization of all Linear layers (weights int8, activations quantized on the fly)."""
+    _set_engine()
+    model = copy.deepcopy(model).cpu().eval()
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+@torch.no_grad()
+def quantize_static_backbone(model: nn.Module, calibration_batches) -> nn.Module:
+    """
+    Statically quantize `model.encoder.features` using FX graph mode.
+
+    calibration_batches: iterable of preprocessed image tensors [N, C, H, W]
+    used to observe activation ranges. 10-20 batches of real property photos
+    are enough; random noise gives poor ranges.
+    """
+    _set_engine()
+    model = copy.deepcopy(model).cpu().eval()
+    qconfig_mapping = get_default_qconfig_mapping(QUANTIZED_ENGINE)
+    example_inputs = (torch.randn(1, 3, 224, 224),)
+
+    prepared = prepare_fx(model.encoder.features, qconfig_mapping, example_inputs)
+    num_batches = 0
+    for batch in calibration_batches:
+        prepared(batch.cpu())
+        num_batches += 1
+    if num_batches == 0:
+        raise ValueError("Static quantization needs at least one calibration batch")
+
+    model.encoder.features = convert_fx(prepared)
+    return model
@@ -0,0 +1,150 @@
+"""
+Parity report and CPU throughput benchmark for the NicenessModel runtimes.
+
+    python runtime_report.py --checkpoint checkpoints/property_model.pth \
+        --torchscript exported/niceness_int8.pt --onnx exported/niceness.onnx
+
+Parity: every image in property_ratings.csv is scored with the eager fp32
+model and with each other runtime. Reports mean/max absolute score deltas,
+Spearman rank correlation against eager and Spearman correlation against
+the human ratings.
+
+Throughput: images/sec for each runtime over synthetic batches, and the
+speedup relative to eager.
+
+Results are printed and written to --output as JSON.
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+
+from export_model import resolve_image_path
+from inference import inference_transform, load_image, load_runtime, score_and_embed_tensors
+
+# =====================
+# Configuration
+# =====================
+CHECKPOINT_PATH = "checkpoints/property_model.pth"
+RATINGS_CSV = "property_ratings.csv"
+OUTPUT_PATH = "runtime_report.json"
+
+
+def spearman(a, b) -> float:
+    """Spearman rank correlation (Pearson on average ranks; ties handled like scipy)."""
+    rank_a = pd.Series(a).rank().to_numpy()
+    rank_b = pd.Series(b).rank().to_numpy()
+    return float(np.corrcoef(rank_a, rank_b)[0, 1])
+
+
+def load_rated_batches(ratings_csv, images_root="", batch_size=32):
+    """Preprocess every rated image once. Returns (list of batches, human ratings)."""
+    df = pd.read_csv(ratings_csv)
+    tensors, ratings = [], []
+    for row in df.itertuples(index=False):
+        path = resolve_image_path(row.image_path, images_root)
+        try:
+            tensors.append(inference_transform(load_image(path)))
+            ratings.append(float(row.property_score))
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+    batches = [torch.stack(tensors[i:i + batch_size]) for i in range(0, len(tensors), batch_size)]
+    return batches, np.array(ratings)
+
+
+def score_all(scorer, batches) -> np.ndarray:
+    scores = [score_and_embed_tensors(scorer, batch)[0] for batch in batches]
+    return torch.cat(scores).numpy() if scores else np.array([])
+
+
+def parity(runtimes, batches, ratings) -> dict:
+    reference = score_all(runtimes["eager"], batches)
+    report = {}
+    for name, scorer in runtimes.items():
+        scores = reference if name == "eager" else score_all(scorer, batches)
+        delta = np.abs(scores - reference)
+        report[name] = {
+            "images": int(len(scores)),
+            "mean_abs_delta": float(delta.mean()),
+            "max_abs_delta": float(delta.max()),
+            "spearman_vs_eager": spearman(scores, reference),
+            "spearman_vs_ratings": spearman(scores, ratings),
+        }
+    return report
+
+
+def throughput(runtimes, batch_size=16, iterations=10, warmup=2) -> dict:
+    batch = torch.randn(batch_size, 3, 224, 224)
+    report = {}
+    for name, scorer in runtimes.items():
+        for _ in range(warmup):
+            score_and_embed_tensors(scorer, batch)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            score_and_embed_tensors(scorer, batch)
+        elapsed = time.perf_counter() - start
+        report[name] = {"images_per_sec": batch_size * iterations / elapsed}
+
+    base = report["eager"]["images_per_sec"]
+    for name in report:
+        report[name]["speedup_vs_eager"] = report[name]["images_per_sec"] / base
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NicenessModel runtime parity report and CPU benchmark")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="Model checkpoint path")
+    parser.add_argument("--torchscript", default="", help="TorchScript artifact from export_model.py")
+    parser.add_argument("--onnx", default="", help="ONNX artifact from export_model.py")
+    parser.add_argument("--no-int8", action="store_true", help="Skip the in-process dynamic int8 runtime")
+    parser.add_argument("--ratings-csv", default=RATINGS_CSV)
+    parser.add_argument("--images-root", default="", help="Prefix for relative image paths in the CSV")
+    parser.add_argument("--skip-parity", action="store_true")
+    parser.add_argument("--skip-benchmark", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    cpu = torch.device("cpu")
+    runtimes = {"eager": load_runtime("eager", args.checkpoint, device=cpu)}
+    if not args.no_int8:
+        runtimes["int8"] = load_runtime("int8", args.checkpoint)
+    if args.torchscript:
+        runtimes["torchscript"] = load_runtime("torchscript", artifact_path=args.torchscript)
+    if args.onnx:
+        runtimes["onnx"] = load_runtime("onnx", artifact_path=args.onnx)
+
+    report = {"threads": torch.get_num_threads()}
+
+    if not args.skip_parity:
+        print("Scoring rated images for parity...")
+        batches, ratings = load_rated_batches(args.ratings_csv, args.images_root)
+        if not batches:
+            print(f"No images from {args.ratings_csv} could be loaded; skipping parity")
+        else:
+            report["parity"] = parity(runtimes, batches, ratings)
+            print(f"\n{'runtime':<12} {'images':>7} {'mean|Δ|':>9} {'max|Δ|':>9} {'ρ eager':>8} {'ρ human':>8}")
+            for name, row in report["parity"].items():
+                print(f"{name:<12} {row['images']:>7} {row['mean_abs_delta']:>9.4f} {row['max_abs_delta']:>9.4f} "
+                      f"{row['spearman_vs_eager']:>8.4f} {row['spearman_vs_ratings']:>8.4f}")
+
+    if not args.skip_benchmark:
+        print(f"\nBenchmarking (batch {args.batch_size}, {args.iterations} iterations, "
+              f"{torch.get_num_threads()} threads)...")
+        report["throughput"] = throughput(runtimes, args.batch_size, args.iterations)
+        print(f"\n{'runtime':<12} {'img/s':>9} {'speedup':>8}")
+        for name, row in report["throughput"].items():
+            print(f"{name:<12} {row['images_per_sec']:>9.1f} {row['speedup_vs_eager']:>7.2f}x")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
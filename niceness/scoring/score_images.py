@@ -1,12 +1,33 @@
+"""
+Score every image in IMAGES_DIR and write a browsable HTML viewer.
+
+    python score_images.py --images-dir images --output airbnb_viewer.html
+
+Next to the HTML file this writes
+    <name>_data.js      scores and metadata as JSON (a .js wrapper so the page also works from file://)
+    <name>_thumbs/      small JPEG thumbnails, regenerated only when the source file changes
+    <name>_scores.json  score cache keyed by path, file size and mtime
+
+Images are decoded in a thread pool and scored in batches; on later runs
+only new or modified images are scored, and the model is not loaded at all
+when every score is cached. The viewer renders one page of cards at a
+time and lazy-loads the thumbnails.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
-import base64
-import glob
-from pathlib import Path
 import torch
-from torchvision import transforms
 from PIL import Image
-from modeltest import NicenessModel
+from tqdm import tqdm
+
+from acceleration import add_acceleration_args
+from inference import load_image, load_runtime, score_batch
 
 # =====================
 # Configuration
@@ -14,43 +35,167 @@ from modeltest import NicenessModel
 IMAGES_DIR = "images"
 OUTPUT_HTML = "airbnb_viewer.html"
 CHECKPOINT_PATH = "checkpoints/property_model.pth"
+PROPERTY_RATINGS_CSV = "property_ratings.csv"
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# Score through a running server.py instead of loading the model here
+SERVER_URL = os.getenv("NICENESS_SERVER_URL")
+# CPU runtime: eager | int8 | torchscript | onnx (the last two need NICENESS_ARTIFACT_PATH)
+RUNTIME = os.getenv("NICENESS_RUNTIME", "eager")
+ARTIFACT_PATH = os.getenv("NICENESS_ARTIFACT_PATH")
+IMAGE_EXTENSIONS = ['*.jpg', '*.jpeg', '*.png', '*.webp', '*.avif']
+BATCH_SIZE = 32
+THUMB_SIZE = 400
+PAGE_SIZE = 60
+NUM_WORKERS = 8
+
+
+# =====================
+# Scoring
+# =====================
+def find_images(images_dir):
+    image_files = []
+    for ext in IMAGE_EXTENSIONS:
+        image_files.extend(glob.glob(os.path.join(images_dir, ext)))
+    return sorted(image_files)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def model_signature():
+    """Identifies the scorer; cached scores from a different one are discarded."""
+    if SERVER_URL:
+        return f"server:{SERVER_URL}"
+    weights = ARTIFACT_PATH if RUNTIME in ("torchscript", "onnx") else CHECKPOINT_PATH
+    mtime = os.path.getmtime(weights) if weights and os.path.exists(weights) else None
+    return f"{RUNTIME}:{weights}:{mtime}"
+
+
+def load_score_cache(path, signature):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Ignoring unreadable score cache {path}: {e}")
+        return {}
+    if cache.get("model") != signature:
+        print("Model changed since the last run, rescoring everything")
+        return {}
+    return cache.get("scores", {})
 
-# Load model
-print("Loading model...")
-model = NicenessModel(embed_dim=1024)
-if os.path.exists(CHECKPOINT_PATH):
-    state_dict = torch.load(CHECKPOINT_PATH, map_location=DEVICE)
-    model.load_state_dict(state_dict)
-model = model.to(DEVICE)
-model.eval()
-
-# Image preprocessing
-test_transform = transforms.Compose([
-    transforms.Resize(256),
-    transforms.CenterCrop(224),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                        std=[0.229, 0.224, 0.225])
-])
-
-# Score images
-print("Scoring images...")
-@torch.no_grad()
-def score_image(image_path):
+
+def save_score_cache(path, signature, scores):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"model": signature, "scores": scores}, f)
+    os.replace(tmp_path, path)
+
+
+def load_scorer(pool, acceleration=None):
+    """
+    Returns a function scoring a list of image paths, decoding them in `pool`.
+    `acceleration` holds load_runtime's bf16/channels_last/compile options.
+    """
+    if SERVER_URL:
+        from client import NicenessClient
+        client = NicenessClient(SERVER_URL)
+        print(f"Scoring via inference server at {SERVER_URL}")
+        return client.score_paths
+
+    print(f"Loading model ({RUNTIME} runtime)...")
+    model = load_runtime(RUNTIME, CHECKPOINT_PATH, ARTIFACT_PATH, DEVICE, **(acceleration or {}))
+    return lambda paths: score_batch(model, list(pool.map(load_image, paths)), DEVICE)
+
+
+def score_images(image_paths, cache, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS, acceleration=None):
+    """
+    Scores for `image_paths`, taken from `cache` where the file is unchanged.
+
+    `cache` maps path -> [size, mtime_ns, score] and is updated in place.
+    Images that fail to load score 0.0 and are retried on the next run.
+    """
+    scores = {}
+    pending = []
+    for path in image_paths:
+        entry = cache.get(path)
+        if entry is not None and entry[:2] == file_signature(path):
+            scores[path] = entry[2]
+        else:
+            pending.append(path)
+    print(f"{len(scores)} cached score(s), {len(pending)} image(s) to score")
+    if not pending:
+        return scores
+
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        scorer = load_scorer(pool, acceleration)
+        for start in tqdm(range(0, len(pending), batch_size), desc="Scoring"):
+            batch = pending[start:start + batch_size]
+            try:
+                batch_scores = scorer(batch)
+            except Exception as e:
+                # Retry one at a time so a single bad file only loses its own score
+                print(f"Batch failed ({e}), scoring individually")
+                batch_scores = []
+                for path in batch:
+                    try:
+                        batch_scores.append(scorer([path])[0])
+                    except Exception as e:
+                        print(f"Error processing {path}: {e}")
+                        batch_scores.append(None)
+            for path, score in zip(batch, batch_scores):
+                if score is None:
+                    scores[path] = 0.0
+                    continue
+                scores[path] = float(score)
+                cache[path] = file_signature(path) + [float(score)]
+    return scores
+
+
+# =====================
+# Thumbnails
+# =====================
+def thumbnail_name(path):
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:20] + ".jpg"
+
+
+def make_thumbnail(path, thumbs_dir, size=THUMB_SIZE):
+    """Write a JPEG thumbnail of `path` unless an up-to-date one exists. Returns its path or None."""
+    thumb_path = os.path.join(thumbs_dir, thumbnail_name(path))
     try:
-        image = Image.open(image_path).convert('RGB')
-        image_tensor = test_transform(image).unsqueeze(0).to(DEVICE)
-        score = model.forward_ava(image_tensor)
-        return score.item()
+        if os.path.exists(thumb_path) and os.path.getmtime(thumb_path) >= os.path.getmtime(path):
+            return thumb_path
+        with Image.open(path) as image:
+            image.draft("RGB", (size, size))
+            image = image.convert("RGB")
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            image.save(thumb_path, "JPEG", quality=80, optimize=True)
+        return thumb_path
     except Exception as e:
-        print(f"Error processing {image_path}: {e}")
-        return 0.0
+        print(f"Could not create thumbnail for {path}: {e}")
+        return None
+
+
+def build_thumbnails(paths, thumbs_dir, size=THUMB_SIZE, num_workers=NUM_WORKERS):
+    """Thumbnail every path in a thread pool. Returns {path: thumbnail path or None}."""
+    os.makedirs(thumbs_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        thumbs = list(tqdm(pool.map(lambda p: make_thumbnail(p, thumbs_dir, size), paths),
+                           total=len(paths), desc="Thumbnails"))
+    return dict(zip(paths, thumbs))
+
+
+def relative_url(path, output_dir):
+    return os.path.relpath(path, output_dir).replace(os.sep, "/").replace("\\", "/")
+
 
 # =====================
-# Generate HTML
+# Viewer
 # =====================
-html_content = """
+HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -325,6 +470,11 @@ html_content = """
             border-radius: 6px;
             border: 1px solid #eee;
         }
+
+        .more-btn {
+            display: block;
+            margin: 20px auto 0;
+        }
     </style>
 </head>
 <body>
@@ -353,9 +503,9 @@ html_content = """
         </div>
         
         <div class="controls">
-            <button class="sort-btn active" onclick="sortGallery('highest')">Highest Score</button>
-            <button class="sort-btn" onclick="sortGallery('lowest')">Lowest Score</button>
-            <button class="sort-btn" onclick="sortGallery('alphabetical')">Alphabetical</button>
+            <button class="sort-btn active" onclick="sortGallery('highest', this)">Highest Score</button>
+            <button class="sort-btn" onclick="sortGallery('lowest', this)">Lowest Score</button>
+            <button class="sort-btn" onclick="sortGallery('alphabetical', this)">Alphabetical</button>
         </div>
 
         <div class="ratings-panel">
@@ -389,14 +539,24 @@ html_content = """
                 </thead>
                 <tbody></tbody>
             </table>
+            <button class="sort-btn more-btn" id="ratings-more" onclick="renderRatingsPage()">Show more</button>
         </div>
         
         <div class="gallery" id="gallery"></div>
+        <button class="sort-btn more-btn" id="gallery-more" onclick="renderGalleryPage()">Load more</button>
     </div>
     
+    <script src="%DATA_SCRIPT%"></script>
     <script>
-        const propertyRatings = %PROPERTY_RATINGS_DATA%;
-        const listings = %LISTINGS_DATA%;
+        const viewerData = window.VIEWER_DATA || {listings: [], property_ratings: []};
+        const listings = viewerData.listings;
+        const propertyRatings = viewerData.property_ratings;
+        const PAGE_SIZE = %PAGE_SIZE%;
+
+        let galleryItems = listings;
+        let galleryShown = 0;
+        let ratingsItems = [];
+        let ratingsShown = 0;
         
         function getScoreBadgeClass(score) {
             if (score >= 3.5) return 'excellent';
@@ -411,57 +571,71 @@ html_content = """
             if (score >= 2.5) return 'Average';
             return 'Poor';
         }
-        
-        function renderGallery(data) {
-            const gallery = document.getElementById('gallery');
-            gallery.innerHTML = '';
+
+        function renderCard(listing) {
+            const card = document.createElement('div');
+            card.className = 'listing-card';
             
-            data.forEach(listing => {
-                const card = document.createElement('div');
-                card.className = 'listing-card';
-                
-                const imageSrc = listing.image_src || '';
-                const imageHTML = imageSrc 
-                    ? `<img src="${imageSrc}" alt="${listing.listing_name}">`
-                    : '<div class="no-image">No image available</div>';
-                
-                const badgeClass = getScoreBadgeClass(listing.avg_score);
-                const scoreLabel = getScoreLabel(listing.avg_score);
-                
-                card.innerHTML = `
-                    <div class="image-container">
-                        ${imageHTML}
-                        <div class="score-badge ${badgeClass}">${listing.avg_score.toFixed(2)}</div>
-                    </div>
-                    <div class="listing-info">
-                        <div class="listing-name">${listing.listing_name}</div>
-                        <div class="listing-id">ID: ${listing.listing_id}</div>
-                        <div class="score-details">
-                            <div class="detail-row">
-                                <span class="detail-label">Avg Score</span>
-                                <span class="detail-value">${listing.avg_score.toFixed(4)}</span>
-                            </div>
-                            <div class="detail-row">
-                                <span class="detail-label">Min</span>
-                                <span class="detail-value">${listing.min_score.toFixed(4)}</span>
-                            </div>
-                            <div class="detail-row">
-                                <span class="detail-label">Max</span>
-                                <span class="detail-value">${listing.max_score.toFixed(4)}</span>
-                            </div>
-                            <div class="detail-row">
-                                <span class="detail-label">Images</span>
-                                <span class="detail-value">${listing.num_images}</span>
-                            </div>
+            const imageSrc = listing.image_src || '';
+            const imageHTML = imageSrc 
+                ? `<img src="${imageSrc}" alt="${listing.listing_name}" loading="lazy" decoding="async">`
+                : '<div class="no-image">No image available</div>';
+            
+            const badgeClass = getScoreBadgeClass(listing.avg_score);
+            
+            card.innerHTML = `
+                <div class="image-container">
+                    ${imageHTML}
+                    <div class="score-badge ${badgeClass}" title="${getScoreLabel(listing.avg_score)}">${listing.avg_score.toFixed(2)}</div>
+                </div>
+                <div class="listing-info">
+                    <div class="listing-name">${listing.listing_name}</div>
+                    <div class="listing-id">ID: ${listing.listing_id}</div>
+                    <div class="score-details">
+                        <div class="detail-row">
+                            <span class="detail-label">Avg Score</span>
+                            <span class="detail-value">${listing.avg_score.toFixed(4)}</span>
+                        </div>
+                        <div class="detail-row">
+                            <span class="detail-label">Min</span>
+                            <span class="detail-value">${listing.min_score.toFixed(4)}</span>
+                        </div>
+                        <div class="detail-row">
+                            <span class="detail-label">Max</span>
+                            <span class="detail-value">${listing.max_score.toFixed(4)}</span>
+                        </div>
+                        <div class="detail-row">
+                            <span class="detail-label">Images</span>
+                            <span class="detail-value">${listing.num_images}</span>
                         </div>
                     </div>
-                `;
-                
-                gallery.appendChild(card);
+                </div>
+            `;
+            return card;
+        }
+
+        // Appends the next PAGE_SIZE cards; the sentinel observer calls this on scroll
+        function renderGalleryPage() {
+            const fragment = document.createDocumentFragment();
+            galleryItems.slice(galleryShown, galleryShown + PAGE_SIZE).forEach(listing => {
+                fragment.appendChild(renderCard(listing));
             });
+            galleryShown = Math.min(galleryShown + PAGE_SIZE, galleryItems.length);
+            document.getElementById('gallery').appendChild(fragment);
+
+            const more = document.getElementById('gallery-more');
+            more.style.display = galleryShown < galleryItems.length ? 'block' : 'none';
+            more.textContent = `Load more (${galleryShown} of ${galleryItems.length})`;
         }
         
-        function sortGallery(method) {
+        function renderGallery(data) {
+            galleryItems = data;
+            galleryShown = 0;
+            document.getElementById('gallery').innerHTML = '';
+            renderGalleryPage();
+        }
+        
+        function sortGallery(method, button) {
             let sorted = [...listings];
             
             if (method === 'highest') {
@@ -475,16 +649,18 @@ html_content = """
             renderGallery(sorted);
             
             // Update button states
-            document.querySelectorAll('.sort-btn').forEach(btn => btn.classList.remove('active'));
-            event.target.classList.add('active');
+            document.querySelectorAll('.controls .sort-btn').forEach(btn => btn.classList.remove('active'));
+            button.classList.add('active');
         }
         
         function updateStats() {
+            if (!listings.length) return;
             const total = listings.length;
             const scores = listings.map(l => l.avg_score);
             const mean = (scores.reduce((a, b) => a + b, 0) / total).toFixed(2);
-            const highest = Math.max(...scores).toFixed(2);
-            const lowest = Math.min(...scores).toFixed(2);
+            // reduce rather than Math.max(...scores), which overflows the stack for large arrays
+            const highest = scores.reduce((a, b) => Math.max(a, b)).toFixed(2);
+            const lowest = scores.reduce((a, b) => Math.min(a, b)).toFixed(2);
             
             document.getElementById('total-listings').textContent = total;
             document.getElementById('mean-score').textContent = mean;
@@ -496,8 +672,8 @@ html_content = """
             if (!propertyRatings.length) return;
             const scores = propertyRatings.map(r => r.property_score);
             const mean = (scores.reduce((a, b) => a + b, 0) / scores.length).toFixed(2);
-            const highest = Math.max(...scores).toFixed(2);
-            const lowest = Math.min(...scores).toFixed(2);
+            const highest = scores.reduce((a, b) => Math.max(a, b)).toFixed(2);
+            const lowest = scores.reduce((a, b) => Math.min(a, b)).toFixed(2);
 
             document.getElementById('ratings-total').textContent = propertyRatings.length;
             document.getElementById('ratings-mean').textContent = mean;
@@ -505,24 +681,42 @@ html_content = """
             document.getElementById('ratings-max').textContent = highest;
         }
 
-        function renderRatingsTable() {
+        function renderRatingsPage() {
             const tbody = document.querySelector('#ratings-table tbody');
-            tbody.innerHTML = '';
-
-            propertyRatings
-                .slice()
-                .sort((a, b) => b.property_score - a.property_score)
-                .forEach(row => {
-                    const tr = document.createElement('tr');
-                    const imgPath = row.image_path.replace(/\\\\/g, '/');
-                    tr.innerHTML = `
-                        <td><img src="${imgPath}" alt="${row.filename}"></td>
-                        <td>${row.filename}</td>
-                        <td>${row.property_score.toFixed(4)}</td>
-                        <td>${row.image_path}</td>
-                    `;
-                    tbody.appendChild(tr);
-                });
+            const fragment = document.createDocumentFragment();
+            ratingsItems.slice(ratingsShown, ratingsShown + PAGE_SIZE).forEach(row => {
+                const tr = document.createElement('tr');
+                const imgPath = row.thumb || row.image_path.replace(/\\\\/g, '/');
+                tr.innerHTML = `
+                    <td><img src="${imgPath}" alt="${row.filename}" loading="lazy" decoding="async"></td>
+                    <td>${row.filename}</td>
+                    <td>${row.property_score.toFixed(4)}</td>
+                    <td>${row.image_path}</td>
+                `;
+                fragment.appendChild(tr);
+            });
+            ratingsShown = Math.min(ratingsShown + PAGE_SIZE, ratingsItems.length);
+            tbody.appendChild(fragment);
+
+            const more = document.getElementById('ratings-more');
+            more.style.display = ratingsShown < ratingsItems.length ? 'block' : 'none';
+            more.textContent = `Show more (${ratingsShown} of ${ratingsItems.length})`;
+        }
+
+        function renderRatingsTable() {
+            ratingsItems = propertyRatings.slice().sort((a, b) => b.property_score - a.property_score);
+            ratingsShown = 0;
+            document.querySelector('#ratings-table tbody').innerHTML = '';
+            renderRatingsPage();
+        }
+
+        // Load the next gallery page when the "Load more" button scrolls into view
+        if ('IntersectionObserver' in window) {
+            new IntersectionObserver(entries => {
+                if (entries.some(e => e.isIntersecting) && galleryShown < galleryItems.length) {
+                    renderGalleryPage();
+                }
+            }, {rootMargin: '600px'}).observe(document.getElementById('gallery-more'));
         }
         
         // Initialize
@@ -535,67 +729,91 @@ html_content = """
 </html>
 """
 
-# Find images and create listing data
-print("Finding images...")
-listings_data = []
-
-# Get all images from imgs folder
-image_files = []
-for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp', '*.avif']:
-    image_files.extend(glob.glob(os.path.join(IMAGES_DIR, ext)))
-
-for image_path in image_files:
-    filename = os.path.basename(image_path)
-    
-    # Score the image
-    score = score_image(image_path)
-    
-    # Convert image to base64
-    with open(image_path, 'rb') as f:
-        image_data = base64.b64encode(f.read()).decode()
-        # Detect image type
-        ext = os.path.splitext(filename)[1].lower()
-        mime_types = {
-            '.jpg': 'jpeg', '.jpeg': 'jpeg', 
-            '.png': 'png', '.webp': 'webp', '.avif': 'avif'
-        }
-        mime = mime_types.get(ext, 'jpeg')
-        image_src = f"data:image/{mime};base64,{image_data}"
-    
-    listings_data.append({
-        'listing_id': filename,
-        'listing_name': filename,
-        'avg_score': float(score),
-        'min_score': float(score),
-        'max_score': float(score),
-        'num_images': 1,
-        'image_src': image_src
-    })
-
-# Sort by score
-listings_data.sort(key=lambda x: x['avg_score'], reverse=True)
-
-# Replace placeholder with actual data
-import json
-listings_json = json.dumps(listings_data)
-html_content = html_content.replace('%LISTINGS_DATA%', listings_json)
 
-# Property ratings (optional)
-property_ratings_data = []
-property_ratings_csv = "property_ratings.csv"
-if os.path.exists(property_ratings_csv):
+def load_property_ratings(ratings_csv=PROPERTY_RATINGS_CSV):
+    """Rows of the ratings CSV for the viewer's ratings table (empty if it is missing)."""
+    if not os.path.exists(ratings_csv):
+        return []
     try:
-        ratings_df = pd.read_csv(property_ratings_csv)
-        property_ratings_data = ratings_df[["image_path", "filename", "property_score"]].to_dict(orient="records")
+        ratings_df = pd.read_csv(ratings_csv)
+        return ratings_df[["image_path", "filename", "property_score"]].to_dict(orient="records")
     except Exception as exc:
-        print(f"WARNING: Failed to load {property_ratings_csv}: {exc}")
+        print(f"WARNING: Failed to load {ratings_csv}: {exc}")
+        return []
+
+
+def write_viewer(listings, property_ratings, output_html, data_script, page_size=PAGE_SIZE):
+    """Write the data script and the HTML page that loads it."""
+    with open(data_script, "w", encoding="utf-8") as f:
+        f.write("window.VIEWER_DATA = ")
+        json.dump({"listings": listings, "property_ratings": property_ratings}, f)
+        f.write(";\n")
+
+    output_dir = os.path.dirname(os.path.abspath(output_html))
+    html_content = (HTML_TEMPLATE
+                    .replace("%DATA_SCRIPT%", relative_url(data_script, output_dir))
+                    .replace("%PAGE_SIZE%", str(page_size)))
+    with open(output_html, "w", encoding="utf-8") as f:
+        f.write(html_content)
+
+
+def main(images_dir=IMAGES_DIR, output_html=OUTPUT_HTML, batch_size=BATCH_SIZE, thumb_size=THUMB_SIZE,
+         num_workers=NUM_WORKERS, use_cache=True, acceleration=None):
+    output_dir = os.path.dirname(os.path.abspath(output_html))
+    stem = os.path.splitext(output_html)[0]
+    data_script = stem + "_data.js"
+    thumbs_dir = stem + "_thumbs"
+    cache_path = stem + "_scores.json"
+
+    print("Finding images...")
+    image_files = find_images(images_dir)
+    print(f"Found {len(image_files)} images in {images_dir}")
+
+    # Score images
+    signature = model_signature()
+    cache = load_score_cache(cache_path, signature) if use_cache else {}
+    scores = score_images(image_files, cache, batch_size, num_workers, acceleration)
+    save_score_cache(cache_path, signature, cache)
+
+    property_ratings = load_property_ratings()
+    rated_paths = [row["image_path"] for row in property_ratings if os.path.exists(row["image_path"])]
+    thumbs = build_thumbnails(sorted(set(image_files) | set(rated_paths)), thumbs_dir, thumb_size, num_workers)
+
+    listings_data = []
+    for image_path in image_files:
+        filename = os.path.basename(image_path)
+        thumb = thumbs.get(image_path)
+        score = scores[image_path]
+        listings_data.append({
+            'listing_id': filename,
+            'listing_name': filename,
+            'avg_score': score,
+            'min_score': score,
+            'max_score': score,
+            'num_images': 1,
+            'image_src': relative_url(thumb, output_dir) if thumb else '',
+        })
+    listings_data.sort(key=lambda x: x['avg_score'], reverse=True)
+
+    for row in property_ratings:
+        thumb = thumbs.get(row["image_path"])
+        row["thumb"] = relative_url(thumb, output_dir) if thumb else None
+
+    write_viewer(listings_data, property_ratings, output_html, data_script)
+    print(f"\nHTML viewer created: {output_html} (data: {data_script}, thumbnails: {thumbs_dir})")
+    print(f"Open this file in your web browser to view the listings with their scores!")
 
-property_ratings_json = json.dumps(property_ratings_data)
-html_content = html_content.replace('%PROPERTY_RATINGS_DATA%', property_ratings_json)
 
-# Write HTML file
-with open(OUTPUT_HTML, 'w', encoding='utf-8') as f:
-    f.write(html_content)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score images and build the HTML viewer")
+    parser.add_argument("--images-dir", default=IMAGES_DIR)
+    parser.add_argument("--output", default=OUTPUT_HTML)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--thumb-size", type=int, default=THUMB_SIZE, help="Longest thumbnail side in px")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="Image decoding and thumbnail threads")
+    parser.add_argument("--no-cache", action="store_true", help="Rescore every image")
+    add_acceleration_args(parser)
+    args = parser.parse_args()
 
-print(f"\nHTML viewer created: {OUTPUT_HTML}")
-print(f"Open this file in your web browser to view the listings with their scores!")
+    main(args.images_dir, args.output, args.batch_size, args.thumb_size, args.workers, not args.no_cache,
+         {"bf16": args.bf16, "channels_last": args.channels_last, "compile": args.compile})
@@ -0,0 +1,209 @@
+"""
+Local NicenessModel inference server with dynamic micro-batching.
+
+    python server.py --checkpoint checkpoints/property_model.pth --port 8765
+
+The checkpoint is loaded once. Request handler threads decode and preprocess
+images in parallel, then hand the tensors to a single batching thread which
+waits up to --max-wait-ms for more work (or until --max-batch images are
+queued) and runs one encoder pass for the whole batch.
+
+API (JSON over HTTP):
+    POST /score   {"images": [<base64>...], "paths": [<local path>...], "embeddings": false}
+                  -> {"scores": [...], "embeddings": [[1024 floats]...]?}
+                  Images are scored in order: all of "images" first, then "paths".
+    GET  /health  -> {"status": "ok", "batches": ..., "images": ..., "mean_batch_size": ...}
+
+Use `client.NicenessClient` rather than talking to the API directly.
+"""
+
+import argparse
+import base64
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import torch
+
+from acceleration import add_acceleration_args
+from inference import DEVICE, RUNTIMES, inference_transform, load_image, load_runtime, score_and_embed_tensors
+
+# =====================
+# Configuration
+# =====================
+HOST = "127.0.0.1"
+PORT = 8765
+CHECKPOINT_PATH = "checkpoints/property_model.pth"
+MAX_BATCH = 32
+MAX_WAIT_MS = 10.0
+
+
+# =====================
+# Micro-batcher
+# =====================
+class MicroBatcher:
+    """Collects preprocessed image tensors from many threads and scores them in shared batches."""
+
+    def __init__(self, model, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, device=DEVICE):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.device = device
+        self.pending = queue.Queue()
+        self.batches = 0
+        self.images = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, tensor: torch.Tensor) -> Future:
+        """Queue one preprocessed image [C, H, W]; the future resolves to (score, embedding)."""
+        future = Future()
+        self.pending.put((tensor, future))
+        return future
+
+    def stop(self):
+        self._stopped.set()
+        self.pending.put(None)
+        self._thread.join()
+
+    def _collect(self) -> list:
+        first = self.pending.get()
+        if first is None:
+            return []
+        items = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped.set()
+                break
+            items.append(item)
+        return items
+
+    def _run(self):
+        while not self._stopped.is_set():
+            items = self._collect()
+            if not items:
+                continue
+            tensors = [tensor for tensor, _ in items]
+            futures = [future for _, future in items]
+            try:
+                scores, embeddings = score_and_embed_tensors(self.model, torch.stack(tensors), self.device)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.images += len(items)
+            for i, future in enumerate(futures):
+                future.set_result((scores[i].item(), embeddings[i]))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "images": self.images,
+            "mean_batch_size": self.images / self.batches if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+
+# =====================
+# HTTP API
+# =====================
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    batcher: MicroBatcher = None
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"detail": "Not found"})
+            return
+        self._send_json(200, {"status": "ok", **self.batcher.stats()})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self._send_json(404, {"detail": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            sources = [base64.b64decode(data) for data in request.get("images", [])]
+            sources.extend(request.get("paths", []))
+            tensors = [inference_transform(load_image(source)) for source in sources]
+        except Exception as e:
+            self._send_json(400, {"detail": f"Invalid request: {e}"})
+            return
+
+        try:
+            results = [future.result() for future in [self.batcher.submit(t) for t in tensors]]
+        except Exception as e:
+            self._send_json(500, {"detail": f"Inference failed: {e}"})
+            return
+
+        response = {"scores": [score for score, _ in results]}
+        if request.get("embeddings"):
+            response["embeddings"] = [embedding.tolist() for _, embedding in results]
+        self._send_json(200, response)
+
+    def log_message(self, format, *args):
+        # Keep the console quiet; per-request logging dominates at high request rates
+        pass
+
+
+def make_server(model, host=HOST, port=PORT, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+    """Create (but do not start) a ThreadingHTTPServer backed by a MicroBatcher."""
+    batcher = MicroBatcher(model, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    handler = type("BoundInferenceRequestHandler", (InferenceRequestHandler,), {"batcher": batcher})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.batcher = batcher
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-batching NicenessModel inference server")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="Model checkpoint path")
+    parser.add_argument("--runtime", default="eager", choices=RUNTIMES,
+                        help="CPU runtime (torchscript/onnx need --artifact)")
+    parser.add_argument("--artifact", default=None, help="Exported model from export_model.py")
+    add_acceleration_args(parser)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Maximum images per forward pass")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="How long the first queued image waits for a batch to fill")
+    args = parser.parse_args()
+
+    print(f"Device: {DEVICE}, runtime: {args.runtime}")
+    model = load_runtime(args.runtime, args.checkpoint, args.artifact,
+                         bf16=args.bf16, channels_last=args.channels_last, compile=args.compile)
+    server = make_server(model, args.host, args.port, args.max_batch, args.max_wait_ms)
+    print(f"Serving NicenessModel on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch}, max wait {args.max_wait_ms:.1f} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
+        server.batcher.stop()
@@ -0,0 +1,123 @@
+"""
+Benchmark bf16 autocast, channels_last and torch.compile for NicenessModel.
+
+    python benchmark_acceleration.py --checkpoint final_model.pth --samples 64 --steps 10
+
+Every combination of the three flags gets a fresh copy of the model and
+reports:
+    train step   mean wall time of a forward/backward/optimizer step
+    eval img/s   scoring throughput under torch.no_grad
+    val loss     MSE on a fixed validation set, and its delta vs the fp32 baseline
+
+Validation uses the first --samples rows of property_ratings.csv when the
+images are available, otherwise random images with random targets (the
+loss delta then only measures numerical drift).
+"""
+
+import argparse
+import copy
+import itertools
+import os
+import time
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+from modeltest import NicenessModel
+from acceleration import autocast, prepare_batch, prepare_model
+from train import PropertyRatingsDataset, val_transform
+
+# =====================
+# Configuration
+# =====================
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+RATINGS_CSV = "property_ratings.csv"
+BATCH_SIZE = 16
+
+
+def load_validation_set(ratings_csv, samples):
+    if os.path.exists(ratings_csv):
+        dataset = PropertyRatingsDataset(ratings_csv, transform=val_transform, max_samples=samples)
+        pairs = [dataset[i] for i in range(len(dataset))]
+        pairs = [(image, score) for image, score in pairs if image is not None]
+        if pairs:
+            return torch.stack([image for image, _ in pairs]), torch.stack([score for _, score in pairs])
+    print("Using random validation images (ratings CSV or images not found)")
+    generator = torch.Generator().manual_seed(0)
+    images = torch.randn(samples, 3, 224, 224, generator=generator)
+    scores = torch.rand(samples, generator=generator) * 9 + 1
+    return images, scores
+
+
+def run_config(base_model, images, scores, bf16, channels_last, compile, steps, batch_size):
+    model = prepare_model(copy.deepcopy(base_model).to(DEVICE), channels_last, compile)
+    criterion = nn.MSELoss()
+    optimizer = optim.AdamW(model.parameters(), lr=1e-5)
+    batch = prepare_batch(images[:batch_size], DEVICE, channels_last)
+    targets = scores[:batch_size].to(DEVICE)
+
+    # Training steps; the first step is warm-up (and compilation when enabled)
+    model.train()
+    step_times = []
+    for step in range(steps + 1):
+        start = time.perf_counter()
+        with autocast(DEVICE, bf16):
+            preds = model.forward_ava(batch)
+        loss = criterion(preds.float(), targets)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        if step > 0:
+            step_times.append(time.perf_counter() - start)
+
+    # Validation loss and throughput from the original weights
+    model.load_state_dict(base_model.state_dict())
+    model.eval()
+    total_loss, num_images = 0.0, 0
+    start = time.perf_counter()
+    with torch.no_grad():
+        for i in range(0, len(images), batch_size):
+            chunk = prepare_batch(images[i:i + batch_size], DEVICE, channels_last)
+            with autocast(DEVICE, bf16):
+                preds = model.forward_ava(chunk)
+            total_loss += criterion(preds.float(), scores[i:i + batch_size].to(DEVICE)).item() * len(chunk)
+            num_images += len(chunk)
+    eval_time = time.perf_counter() - start
+
+    return {
+        "step_ms": 1000 * sum(step_times) / len(step_times),
+        "eval_img_per_sec": num_images / eval_time,
+        "val_loss": total_loss / num_images,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bf16/channels_last/compile combinations")
+    parser.add_argument("--checkpoint", default="", help="Optional starting checkpoint")
+    parser.add_argument("--ratings-csv", default=RATINGS_CSV)
+    parser.add_argument("--samples", type=int, default=64, help="Validation images")
+    parser.add_argument("--steps", type=int, default=10, help="Timed training steps per configuration")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--no-compile", action="store_true", help="Skip the torch.compile configurations")
+    args = parser.parse_args()
+
+    base_model = NicenessModel(embed_dim=1024)
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        base_model.load_state_dict(torch.load(args.checkpoint, map_location="cpu"))
+    images, scores = load_validation_set(args.ratings_csv, args.samples)
+
+    compile_options = [False] if args.no_compile else [False, True]
+    results = []
+    for bf16, channels_last, compile in itertools.product([False, True], [False, True], compile_options):
+        result = run_config(base_model, images, scores, bf16, channels_last, compile, args.steps, args.batch_size)
+        results.append(((bf16, channels_last, compile), result))
+
+    baseline = results[0][1]
+    print(f"\nDevice: {DEVICE}, threads: {torch.get_num_threads()}, batch: {args.batch_size}")
+    print(f"{'bf16':>5} {'nhwc':>5} {'compile':>8} {'step_ms':>9} {'speedup':>8} {'eval img/s':>11} "
+          f"{'val_loss':>9} {'Δ loss':>9}")
+    for (bf16, channels_last, compile), r in results:
+        print(f"{str(bf16):>5} {str(channels_last):>5} {str(compile):>8} {r['step_ms']:>9.1f} "
+              f"{baseline['step_ms'] / r['step_ms']:>7.2f}x {r['eval_img_per_sec']:>11.1f} "
+              f"{r['val_loss']:>9.4f} {r['val_loss'] - baseline['val_loss']:>+9.4f}")
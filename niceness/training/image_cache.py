@@ -0,0 +1,135 @@
+"""
+Pre-decoded image cache for the training datasets.
+
+Decoding full-resolution WebP/JPEG files with PIL every epoch dominates
+epoch time on CPU trainers. This script decodes every rated image once,
+resizes it so the shortest side is 256 px and stores the uint8 RGB pixels
+back to back in a single memory-mapped file:
+
+    <output>.bin    raw uint8 HWC pixels for all images
+    <output>.json   {"short_side": 256, "entries": {image_path: [offset, height, width]}}
+
+Build it with:
+
+    python image_cache.py --ratings-csv property_ratings.csv --output cache/decoded_256
+
+and pass `--image-cache cache/decoded_256` to train.py or
+finetune_property_model.py. The datasets then augment the small cached
+images instead of re-decoding the originals; paths missing from the cache
+fall back to PIL.
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+from tqdm import tqdm
+
+# =====================
+# Configuration
+# =====================
+SHORT_SIDE = 256
+RATINGS_CSV = "property_ratings.csv"
+OUTPUT_PREFIX = "cache/decoded_256"
+
+
+def decode_resized(image_path, short_side=SHORT_SIDE) -> np.ndarray:
+    """Decode an image to RGB and resize it so its shortest side is `short_side` px."""
+    with Image.open(image_path) as image:
+        # Let JPEG decode at reduced resolution where possible
+        image.draft("RGB", (short_side * 2, short_side * 2))
+        image = image.convert("RGB")
+        width, height = image.size
+        scale = short_side / min(width, height)
+        if scale < 1:
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            image = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        return np.asarray(image, dtype=np.uint8)
+
+
+def build_image_cache(image_paths, output_prefix, short_side=SHORT_SIDE, num_workers=8) -> int:
+    """Decode `image_paths` in a thread pool and write the cache. Returns the number of images stored."""
+    os.makedirs(os.path.dirname(output_prefix) or ".", exist_ok=True)
+    entries = {}
+    offset = 0
+
+    def decode(path):
+        try:
+            return path, decode_resized(path, short_side)
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+            return path, None
+
+    tmp_bin = output_prefix + ".bin.tmp"
+    with open(tmp_bin, "wb") as f, ThreadPoolExecutor(max_workers=num_workers) as pool:
+        for path, pixels in tqdm(pool.map(decode, image_paths), total=len(image_paths), desc="Decoding"):
+            if pixels is None:
+                continue
+            height, width = pixels.shape[:2]
+            f.write(pixels.tobytes())
+            entries[path] = [offset, height, width]
+            offset += pixels.nbytes
+
+    os.replace(tmp_bin, output_prefix + ".bin")
+    with open(output_prefix + ".json", "w") as f:
+        json.dump({"short_side": short_side, "entries": entries}, f)
+    return len(entries)
+
+
+class DecodedImageCache:
+    """Read-only view of a cache written by `build_image_cache`."""
+
+    def __init__(self, prefix):
+        with open(prefix + ".json") as f:
+            index = json.load(f)
+        self.short_side = index["short_side"]
+        self.entries = index["entries"]
+        self.bin_path = prefix + ".bin"
+        self._data = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, image_path):
+        return image_path in self.entries
+
+    def __getstate__(self):
+        # Each DataLoader worker maps the file itself
+        state = self.__dict__.copy()
+        state["_data"] = None
+        return state
+
+    def get_array(self, image_path):
+        """Cached uint8 HWC pixels for `image_path`, or None if it is not cached."""
+        entry = self.entries.get(image_path)
+        if entry is None:
+            return None
+        if self._data is None:
+            self._data = np.memmap(self.bin_path, dtype=np.uint8, mode="r")
+        offset, height, width = entry
+        return self._data[offset:offset + height * width * 3].reshape(height, width, 3)
+
+    def get(self, image_path):
+        """Cached image as a PIL image, or None if it is not cached."""
+        pixels = self.get_array(image_path)
+        return None if pixels is None else Image.fromarray(np.array(pixels))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-decode rated images into a memory-mapped cache")
+    parser.add_argument("--ratings-csv", default=RATINGS_CSV)
+    parser.add_argument("--output", default=OUTPUT_PREFIX, help="Output path prefix (.bin/.json are added)")
+    parser.add_argument("--short-side", type=int, default=SHORT_SIDE)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.ratings_csv)
+    paths = [p for p in df["image_path"].drop_duplicates() if os.path.exists(p)]
+    print(f"Decoding {len(paths)} images from {args.ratings_csv}")
+    stored = build_image_cache(paths, args.output, args.short_side, args.workers)
+    size_mb = os.path.getsize(args.output + ".bin") / 1024 / 1024
+    print(f"✓ Cached {stored} images ({size_mb:.1f} MB) at {args.output}.bin")
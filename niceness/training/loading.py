@@ -0,0 +1,78 @@
+"""
+DataLoader construction shared by the training scripts.
+
+The datasets return (None, None) for images that fail to load. The default
+collate cannot batch those, so `collate_skip_failed` drops them and reports
+how many were dropped alongside each batch:
+
+    for images, scores, num_failed in loader:
+        ...
+
+`images`/`scores` are None when every sample in the batch failed. Samples
+may carry extra fields after the score (e.g. the sample index); they are
+collated the same way and come before `num_failed`.
+"""
+
+from torch.utils.data import DataLoader
+from torch.utils.data.dataloader import default_collate
+
+# =====================
+# Configuration
+# =====================
+NUM_WORKERS = 0
+PREFETCH_FACTOR = 2
+
+
+def collate_skip_failed(batch):
+    """Collate (image, score, ...) samples, dropping failed ones. Returns (images, scores, ..., num_failed)."""
+    loaded = [sample for sample in batch if sample[0] is not None]
+    num_failed = len(batch) - len(loaded)
+    if not loaded:
+        return (*[None] * len(batch[0]), num_failed)
+    return (*default_collate(loaded), num_failed)
+
+
+def build_loader(dataset, batch_size, shuffle, num_workers=NUM_WORKERS, prefetch_factor=PREFETCH_FACTOR,
+                 pin_memory=False, persistent_workers=True) -> DataLoader:
+    """
+    DataLoader with the failure-tolerant collate.
+
+    With num_workers > 0, workers are kept alive across epochs
+    (persistent_workers) and each prefetches `prefetch_factor` batches ahead.
+    """
+    kwargs = {}
+    if num_workers > 0:
+        kwargs["prefetch_factor"] = prefetch_factor
+        kwargs["persistent_workers"] = persistent_workers
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=shuffle,
+        num_workers=num_workers,
+        pin_memory=pin_memory,
+        collate_fn=collate_skip_failed,
+        **kwargs,
+    )
+
+
+def add_loader_args(parser):
+    """Register the data loading CLI arguments on an argparse parser."""
+    parser.add_argument("--num-workers", type=int, default=NUM_WORKERS,
+                        help="DataLoader worker processes (0 loads in the main process)")
+    parser.add_argument("--prefetch-factor", type=int, default=PREFETCH_FACTOR,
+                        help="Batches prefetched per worker")
+    parser.add_argument("--pin-memory", action="store_true",
+                        help="Pin host memory for faster host-to-device copies (CUDA only)")
+    parser.add_argument("--no-persistent-workers", action="store_true",
+                        help="Restart DataLoader workers every epoch")
+    return parser
+
+
+def loader_kwargs(args) -> dict:
+    """build_loader keyword arguments from parsed `add_loader_args` arguments."""
+    return {
+        "num_workers": args.num_workers,
+        "prefetch_factor": args.prefetch_factor,
+        "pin_memory": args.pin_memory,
+        "persistent_workers": not args.no_persistent_workers,
+    }
@@ -0,0 +1,255 @@
+"""
+Per-step timing for the training loop.
+
+With --profile, every training step is split into
+
+    data       waiting for the DataLoader to hand over the next batch
+    h2d        host-to-device copy (prepare_batch)
+    forward    model forward pass and loss
+    backward   loss.backward()
+    optimizer  optimizer.step() / zero_grad()
+
+and written as one JSON line per step to the trace file, followed by an
+epoch summary line ({"type": "epoch", ...}) that is also printed:
+images/sec, the share of time spent per phase, DataLoader worker CPU
+utilisation and peak RSS. Worker utilisation and worker RSS are read from
+/proc and are only reported on Linux. Utilisation adds the CPU time of
+workers that already exited (getrusage(RUSAGE_CHILDREN)), so it also holds
+with --no-persistent-workers; worker RSS only covers workers alive when
+sampled.
+
+--torch-profile START:COUNT additionally records steps START..START+COUNT-1
+of every epoch with torch.profiler and writes a Chrome trace (open in
+chrome://tracing or Perfetto) to --profile-dir.
+
+On CUDA each phase boundary synchronizes the device so the split is
+accurate; this slows training slightly, so profiling is off by default.
+"""
+
+import json
+import os
+import time
+
+import torch
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# =====================
+# Configuration
+# =====================
+PHASES = ("data", "h2d", "forward", "backward", "optimizer")
+PROFILE_DIR = "checkpoints/profiles"
+
+
+def add_profiler_args(parser):
+    """Register the profiling CLI arguments on an argparse parser."""
+    parser.add_argument("--profile", action="store_true",
+                        help="Time every training step and write a JSONL trace")
+    parser.add_argument("--trace", default=None,
+                        help="JSONL trace path (default: <checkpoint-dir>/<preset>_trace.jsonl)")
+    parser.add_argument("--torch-profile", default=None, metavar="START:COUNT",
+                        help="Capture steps START..START+COUNT-1 of each epoch with torch.profiler")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, help="Where torch.profiler traces are written")
+    return parser
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 1024 if os.uname().sysname != "Darwin" else peak / 1024 / 1024
+
+
+def child_process_stats():
+    """
+    (total CPU seconds, total RSS in MB) of this process's children, or None without /proc.
+
+    CPU time covers live children (from /proc) plus children that have
+    exited and been reaped, such as non-persistent DataLoader workers at the
+    end of an epoch. RSS only covers live children.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    parent = os.getpid()
+    ticks = os.sysconf("SC_CLK_TCK")
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    cpu_seconds, rss_bytes = 0.0, 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces; fields resume after the closing paren
+        fields = stat[stat.rfind(")") + 2:].split()
+        if int(fields[1]) != parent:
+            continue
+        cpu_seconds += (int(fields[11]) + int(fields[12])) / ticks
+        rss_bytes += int(fields[21]) * page_size
+    if resource is not None:
+        reaped = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_seconds += reaped.ru_utime + reaped.ru_stime
+    return cpu_seconds, rss_bytes / 1024 / 1024
+
+
+class TrainingProfiler:
+    """
+    Step timer used by `train_epoch`.
+
+    The loop calls `mark(phase)` at the end of each phase and `end_step` once
+    per batch. A disabled profiler makes every call a no-op.
+    """
+
+    def __init__(self, enabled=False, trace_path=None, device="cpu", num_workers=0,
+                 torch_profile=None, profile_dir=PROFILE_DIR):
+        self.enabled = enabled
+        self.device = torch.device(device)
+        self.num_workers = num_workers
+        self.profile_dir = profile_dir
+        self.torch_window = None
+        if enabled and torch_profile:
+            start, count = (int(v) for v in torch_profile.split(":"))
+            self.torch_window = (start, start + count)
+        self.trace = None
+        if enabled and trace_path:
+            os.makedirs(os.path.dirname(trace_path) or ".", exist_ok=True)
+            self.trace = open(trace_path, "a")
+        self._torch_profiler = None
+        self.epoch = 0
+
+    def _sync(self):
+        if self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+
+    def _write(self, record):
+        if self.trace is not None:
+            self.trace.write(json.dumps(record) + "\n")
+
+    def start_epoch(self, epoch):
+        if not self.enabled:
+            return
+        self.epoch = epoch
+        self.step_index = 0
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.num_images = 0
+        self.num_failed = 0
+        self.current = {}
+        self.children_start = child_process_stats() if self.num_workers else None
+        self.peak_worker_rss = 0.0
+        self.epoch_start = self._last = time.perf_counter()
+
+    def mark(self, phase):
+        """Record the time since the previous mark as `phase`."""
+        if not self.enabled:
+            return
+        if phase != "data":
+            self._sync()
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + now - self._last
+        self._last = now
+        if phase == "data":
+            self._maybe_start_torch_profiler()
+
+    def end_step(self, batch_size, failed=0, loss=None):
+        if not self.enabled:
+            return
+        for phase, seconds in self.current.items():
+            self.totals[phase] += seconds
+        self.num_images += batch_size
+        self.num_failed += failed
+        record = {"type": "step", "epoch": self.epoch, "step": self.step_index,
+                  "batch_size": batch_size, "failed": failed, "loss": loss}
+        record.update({f"{phase}_ms": round(1000 * self.current.get(phase, 0.0), 3) for phase in PHASES})
+        self._write(record)
+        self.current = {}
+        self.step_index += 1
+        self._maybe_stop_torch_profiler()
+        # Worker RSS is sampled periodically; reading /proc every step is wasteful
+        if self.num_workers and self.step_index % 20 == 1:
+            stats = child_process_stats()
+            if stats is not None:
+                self.peak_worker_rss = max(self.peak_worker_rss, stats[1])
+        self._last = time.perf_counter()
+
+    def _maybe_start_torch_profiler(self):
+        if self.torch_window is None or self._torch_profiler is not None:
+            return
+        if self.step_index == self.torch_window[0]:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if self.device.type == "cuda":
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self._torch_profiler = torch.profiler.profile(activities=activities, record_shapes=True,
+                                                          profile_memory=True)
+            self._torch_profiler.__enter__()
+
+    def _maybe_stop_torch_profiler(self, force=False):
+        if self._torch_profiler is None:
+            return
+        if not force and self.step_index < self.torch_window[1]:
+            return
+        self._torch_profiler.__exit__(None, None, None)
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"epoch{self.epoch}_steps{self.torch_window[0]}-{self.step_index - 1}.json")
+        self._torch_profiler.export_chrome_trace(path)
+        print(self._torch_profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=15))
+        print(f"✓ torch.profiler trace saved to {path}")
+        self._torch_profiler = None
+
+    def end_epoch(self):
+        """Write and print the epoch summary. Returns the summary dict (None when disabled)."""
+        if not self.enabled:
+            return None
+        self._maybe_stop_torch_profiler(force=True)
+        wall = time.perf_counter() - self.epoch_start
+        summary = {
+            "type": "epoch",
+            "epoch": self.epoch,
+            "steps": self.step_index,
+            "images": self.num_images,
+            "failed": self.num_failed,
+            "wall_s": round(wall, 3),
+            "images_per_sec": round(self.num_images / wall, 2) if wall > 0 else None,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        for phase in PHASES:
+            summary[f"{phase}_ms_per_step"] = round(1000 * self.totals[phase] / max(self.step_index, 1), 3)
+            summary[f"{phase}_share"] = round(self.totals[phase] / wall, 4) if wall > 0 else None
+
+        summary["worker_utilisation"] = None
+        summary["peak_worker_rss_mb"] = None
+        if self.children_start is not None:
+            end = child_process_stats()
+            if end is not None:
+                busy = end[0] - self.children_start[0]
+                summary["worker_utilisation"] = round(busy / (wall * self.num_workers), 4)
+                summary["peak_worker_rss_mb"] = round(max(self.peak_worker_rss, end[1]), 1)
+
+        self._write(summary)
+        if self.trace is not None:
+            self.trace.flush()
+        self.print_summary(summary)
+        return summary
+
+    @staticmethod
+    def print_summary(summary):
+        shares = "  ".join(f"{phase} {100 * (summary[f'{phase}_share'] or 0):.0f}%" for phase in PHASES)
+        print(f"Throughput: {summary['images_per_sec']} img/s over {summary['steps']} steps "
+              f"({summary['wall_s']:.1f}s)")
+        print(f"Time split: {shares}")
+        line = f"Peak RSS: {summary['peak_rss_mb']:.0f} MB" if summary["peak_rss_mb"] else "Peak RSS: n/a"
+        if summary["worker_utilisation"] is not None:
+            line += (f"  workers: {100 * summary['worker_utilisation']:.0f}% busy, "
+                     f"{summary['peak_worker_rss_mb']:.0f} MB RSS")
+        print(line)
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
@@ -1,11 +1,42 @@
+"""
+Train or fine-tune NicenessModel on property ratings.
+
+    python train.py                        # pretrain preset (was train.py)
+    python train.py --preset finetune      # finetune preset (was finetune_property_model.py)
+    python train.py --resume               # continue the last interrupted run of the preset
+
+Every epoch a full checkpoint (model, optimizer, scheduler, epoch, RNG
+state and early-stopping counters) is written to
+<checkpoint-dir>/<preset>_last.ckpt, so a killed job resumes where it
+stopped. The best and final weights are still exported as plain
+state_dicts under their usual names in --checkpoint-dir.
+
+The train/val split is made once from --seed and stored by image path in
+--split (checkpoints/split.json), so every run and both presets validate on
+the same images. Images added to the ratings CSV later are assigned by a
+hash of their path and appended to the file.
+
+--profile writes a per-step timing trace and prints an epoch summary; see
+profiling.py.
+"""
+
 import os
-import glob
+import argparse
+import copy
+import hashlib
+import json
+import random
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset
 from torchvision import transforms
 from modeltest import NicenessModel
+from image_cache import DecodedImageCache
+from loading import add_loader_args, build_loader, loader_kwargs
+from acceleration import add_acceleration_args, autocast, prepare_batch, prepare_model
+from profiling import TrainingProfiler, add_profiler_args
 import pandas as pd
 from tqdm import tqdm
 from PIL import Image
@@ -14,15 +45,40 @@ from PIL import Image
 # Configuration
 # =====================
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-BATCH_SIZE = 16
-LEARNING_RATE = 2e-4
-EPOCHS = 30
 IMAGES_DIR = "images"
 PROPERTY_RATINGS_CSV = "property_ratings.csv"
 CHECKPOINT_DIR = "checkpoints"
-EARLY_STOP_PATIENCE = 5
-os.makedirs(CHECKPOINT_DIR, exist_ok=True)
-PRETRAINED_PATH = "final_model.pth"
+SPLIT_PATH = os.path.join(CHECKPOINT_DIR, "split.json")
+VAL_FRACTION = 0.2
+SEED = 42
+
+# "{checkpoint_dir}" in init/best_path/final_path is filled in from --checkpoint-dir
+PRESETS = {
+    "pretrain": {
+        "batch_size": 16,
+        "lr": 2e-4,
+        "epochs": 30,
+        "patience": 5,
+        "optimizer": "adamw",
+        "scheduler": "warm_restarts",
+        "augmentation": "strong",
+        "init": ["final_model.pth"],
+        "best_path": os.path.join("{checkpoint_dir}", "best_model.pth"),
+        "final_path": os.path.join("{checkpoint_dir}", "final_model.pth"),
+    },
+    "finetune": {
+        "batch_size": 4,
+        "lr": 1e-5,  # Lower LR for fine-tuning
+        "epochs": 20,
+        "patience": 3,
+        "optimizer": "adam",
+        "scheduler": "cosine",
+        "augmentation": "light",
+        "init": ["final_model.pth", os.path.join("{checkpoint_dir}", "best_model.pth")],
+        "best_path": os.path.join("{checkpoint_dir}", "property_model.pth"),
+        "final_path": None,
+    },
+}
 
 print(f"Device: {DEVICE}")
 
@@ -31,8 +87,9 @@ print(f"Device: {DEVICE}")
 # Dataset
 # =====================
 class PropertyRatingsDataset(Dataset):
-    def __init__(self, ratings_csv, transform=None, max_samples=None):
+    def __init__(self, ratings_csv, transform=None, max_samples=None, image_cache=None):
         self.transform = transform
+        self.image_cache = image_cache  # Optional DecodedImageCache
         self.samples = []
 
         if not os.path.exists(ratings_csv):
@@ -53,15 +110,17 @@ class PropertyRatingsDataset(Dataset):
             self.samples.append((image_path, score))
 
         print(f"Loaded {len(self.samples)} images from {ratings_csv}")
-    
+
     def __len__(self):
         return len(self.samples)
-    
+
     def __getitem__(self, idx):
         image_path, score = self.samples[idx]
-        
+
         try:
-            image = Image.open(image_path).convert('RGB')
+            image = self.image_cache.get(image_path) if self.image_cache is not None else None
+            if image is None:
+                image = Image.open(image_path).convert('RGB')
             if self.transform:
                 image = self.transform(image)
             return image, torch.tensor(score, dtype=torch.float32)
@@ -69,6 +128,17 @@ class PropertyRatingsDataset(Dataset):
             print(f"Error loading {image_path}: {e}")
             return None, None
 
+    def image_paths(self):
+        return sorted({image_path for image_path, _ in self.samples})
+
+    def subset(self, image_paths, transform):
+        """Copy of this dataset restricted to `image_paths`, with its own transform."""
+        image_paths = set(image_paths)
+        subset = copy.copy(self)
+        subset.samples = [sample for sample in self.samples if sample[0] in image_paths]
+        subset.transform = transform
+        return subset
+
 
 # =====================
 # Data Augmentation
@@ -84,6 +154,15 @@ train_transform = transforms.Compose([
                         std=[0.229, 0.224, 0.225])
 ])
 
+finetune_transform = transforms.Compose([
+    transforms.RandomResizedCrop(224, scale=(0.8, 1.0)),
+    transforms.RandomHorizontalFlip(),
+    transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                        std=[0.229, 0.224, 0.225])
+])
+
 val_transform = transforms.Compose([
     transforms.Resize(256),
     transforms.CenterCrop(224),
@@ -92,152 +171,379 @@ val_transform = transforms.Compose([
                         std=[0.229, 0.224, 0.225])
 ])
 
+AUGMENTATIONS = {"strong": train_transform, "light": finetune_transform}
+
+
+# =====================
+# Train/Val Split
+# =====================
+def _hash_fraction(image_path):
+    digest = hashlib.sha1(image_path.encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) / 0xFFFFFFFF
+
+
+def load_or_create_split(image_paths, split_path=SPLIT_PATH, val_fraction=VAL_FRACTION, seed=SEED):
+    """
+    Deterministic train/val split by image path, persisted to `split_path`.
+
+    The first call shuffles `image_paths` with `seed`. Later calls reuse the
+    stored split; paths not in it are assigned by a hash of the path (so the
+    assignment does not depend on CSV order) and the file is updated.
+    Returns (train_paths, val_paths).
+    """
+    image_paths = sorted(set(image_paths))
+    if os.path.exists(split_path):
+        with open(split_path) as f:
+            split = json.load(f)
+    else:
+        shuffled = list(image_paths)
+        random.Random(seed).shuffle(shuffled)
+        num_val = int(round(val_fraction * len(shuffled)))
+        split = {"seed": seed, "val_fraction": val_fraction,
+                 "train": sorted(shuffled[num_val:]), "val": sorted(shuffled[:num_val])}
+
+    known = set(split["train"]) | set(split["val"])
+    new_paths = [p for p in image_paths if p not in known]
+    for path in new_paths:
+        split["val" if _hash_fraction(path) < split["val_fraction"] else "train"].append(path)
+    if new_paths or not os.path.exists(split_path):
+        os.makedirs(os.path.dirname(split_path) or ".", exist_ok=True)
+        with open(split_path, "w") as f:
+            json.dump(split, f, indent=1)
+        if new_paths and known:
+            print(f"Added {len(new_paths)} new image(s) to {split_path}")
+
+    present = set(image_paths)
+    return [p for p in split["train"] if p in present], [p for p in split["val"] if p in present]
+
+
+# =====================
+# Checkpoints
+# =====================
+def capture_rng_state():
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def restore_rng_state(state):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+
+def save_checkpoint(path, model, optimizer, scheduler, epoch, best_val_loss, patience_counter, config):
+    """Write a full training checkpoint atomically (a crash mid-write keeps the previous one)."""
+    checkpoint = {
+        "epoch": epoch,
+        "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "scheduler": scheduler.state_dict(),
+        "best_val_loss": best_val_loss,
+        "patience_counter": patience_counter,
+        "rng_state": capture_rng_state(),
+        "config": config,
+    }
+    tmp_path = path + ".tmp"
+    torch.save(checkpoint, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, model, optimizer, scheduler, device):
+    """Restore a checkpoint written by `save_checkpoint`. Returns the checkpoint dict."""
+    # RNG states include numpy objects, so this is not a weights-only load
+    checkpoint = torch.load(path, map_location=device, weights_only=False)
+    model.load_state_dict(checkpoint["model"])
+    optimizer.load_state_dict(checkpoint["optimizer"])
+    scheduler.load_state_dict(checkpoint["scheduler"])
+    restore_rng_state(checkpoint["rng_state"])
+    return checkpoint
+
+
+def build_optimizer(model, name, lr):
+    if name == "adamw":
+        return optim.AdamW(model.parameters(), lr=lr, weight_decay=0.01)
+    return optim.Adam(model.parameters(), lr=lr)
+
+
+def build_scheduler(optimizer, name, epochs):
+    if name == "warm_restarts":
+        return optim.lr_scheduler.CosineAnnealingWarmRestarts(optimizer, T_0=5, T_mult=2)
+    return optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=epochs)
+
+
+def load_initial_weights(model, paths, device):
+    for path in paths:
+        if path and os.path.exists(path):
+            model.load_state_dict(torch.load(path, map_location=device))
+            print(f"Loaded pretrained weights from {path}")
+            return path
+    print(f"WARNING: No pretrained checkpoint found ({' or '.join(paths)}). Using random initialization")
+    return None
+
 
 # =====================
 # Training Functions
 # =====================
-def train_epoch(model, dataloader, optimizer, criterion, device):
+def train_epoch(model, dataloader, optimizer, criterion, device, bf16=False, channels_last=False, profiler=None):
     model.train()
     total_loss = 0.0
     num_batches = 0
-    
+    num_failed = 0
+    profiler = profiler or TrainingProfiler()
+
     pbar = tqdm(dataloader, desc="Training")
-    for images, scores in pbar:
+    for images, scores, failed in pbar:
+        profiler.mark("data")
+        num_failed += failed
         # Handle None values from failed image loads
         if images is None:
+            profiler.end_step(0, failed)
             continue
-        
-        images = images.to(device)
-        scores = scores.to(device)
-        
+
+        images = prepare_batch(images, device, channels_last)
+        scores = scores.to(device, non_blocking=True)
+        profiler.mark("h2d")
+
         # Forward pass
-        preds = model.forward_ava(images)
-        loss = criterion(preds, scores)
-        
-        # Backward pass
-        optimizer.zero_grad()
+        with autocast(device, bf16):
+            preds = model.forward_ava(images)
+        loss = criterion(preds.float(), scores)
+        profiler.mark("forward")
+
+        # Backward pass (gradients are cleared after the step, so the time counts as optimizer)
         loss.backward()
+        profiler.mark("backward")
         optimizer.step()
-        
+        optimizer.zero_grad()
+        profiler.mark("optimizer")
+
         total_loss += loss.item()
         num_batches += 1
+        profiler.end_step(len(images), failed, loss.item())
         pbar.set_postfix({"loss": f"{loss.item():.4f}"})
-    
+
+    if num_failed:
+        print(f"Skipped {num_failed} image(s) that failed to load")
     return total_loss / max(num_batches, 1)
 
 
-def validate(model, dataloader, criterion, device):
+def validate(model, dataloader, criterion, device, bf16=False, channels_last=False):
     model.eval()
     total_loss = 0.0
     num_batches = 0
-    
+    num_failed = 0
+
     with torch.no_grad():
-        for images, scores in tqdm(dataloader, desc="Validating"):
+        for images, scores, failed in tqdm(dataloader, desc="Validating"):
+            num_failed += failed
             if images is None:
                 continue
-            
-            images = images.to(device)
-            scores = scores.to(device)
-            
-            preds = model.forward_ava(images)
-            loss = criterion(preds, scores)
-            
+
+            images = prepare_batch(images, device, channels_last)
+            scores = scores.to(device, non_blocking=True)
+
+            with autocast(device, bf16):
+                preds = model.forward_ava(images)
+            loss = criterion(preds.float(), scores)
+
             total_loss += loss.item()
             num_batches += 1
-    
+
+    if num_failed:
+        print(f"Skipped {num_failed} image(s) that failed to load")
     return total_loss / max(num_batches, 1)
 
 
+# =====================
+# Command Line
+# =====================
+def build_parser(preset="pretrain"):
+    parser = argparse.ArgumentParser(description="Train or fine-tune NicenessModel on property ratings")
+    parser.add_argument("--preset", default=preset, choices=sorted(PRESETS),
+                        help="Default hyperparameters and output paths (pretrain or finetune)")
+    parser.add_argument("--ratings-csv", default=PROPERTY_RATINGS_CSV)
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+    parser.add_argument("--split", default=SPLIT_PATH, help="Persisted train/val split (created if missing)")
+    parser.add_argument("--val-fraction", type=float, default=VAL_FRACTION)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--epochs", type=int, default=None, help="Override the preset")
+    parser.add_argument("--batch-size", type=int, default=None, help="Override the preset")
+    parser.add_argument("--lr", type=float, default=None, help="Override the preset")
+    parser.add_argument("--patience", type=int, default=None, help="Override the preset")
+    parser.add_argument("--init", default=None, help="Starting state_dict (default: the preset's)")
+    parser.add_argument("--resume", nargs="?", const="last", default=None,
+                        help="Resume from a full checkpoint (default: <checkpoint-dir>/<preset>_last.ckpt)")
+    parser.add_argument("--image-cache", default=None,
+                        help="Pre-decoded image cache prefix built by image_cache.py")
+    add_loader_args(parser)
+    add_acceleration_args(parser)
+    add_profiler_args(parser)
+    return parser
+
+
+def resolve_config(args):
+    """Preset defaults overridden by explicit command line values."""
+    config = dict(PRESETS[args.preset])
+    config["init"] = [path.format(checkpoint_dir=args.checkpoint_dir) for path in config["init"]]
+    for key in ("best_path", "final_path"):
+        if config[key]:
+            config[key] = config[key].format(checkpoint_dir=args.checkpoint_dir)
+    for key in ("epochs", "batch_size", "lr", "patience"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    if args.init:
+        config["init"] = [args.init]
+    config.update(preset=args.preset, ratings_csv=args.ratings_csv, split=args.split, seed=args.seed)
+    return config
+
+
 # =====================
 # Main Training Loop
 # =====================
-if __name__ == "__main__":
+def main(argv=None, preset="pretrain"):
+    args = build_parser(preset).parse_args(argv)
+    os.makedirs(args.checkpoint_dir, exist_ok=True)
+    last_path = os.path.join(args.checkpoint_dir, f"{args.preset}_last.ckpt")
+    resume_path = last_path if args.resume == "last" else args.resume
+
+    if resume_path:
+        if not os.path.exists(resume_path):
+            print(f"ERROR: {resume_path} not found, nothing to resume")
+            exit(1)
+        # The resumed run keeps its original hyperparameters, paths and split
+        config = torch.load(resume_path, map_location="cpu", weights_only=False)["config"]
+        last_path = os.path.join(args.checkpoint_dir, f"{config['preset']}_last.ckpt")
+    else:
+        config = resolve_config(args)
+
     print("\n" + "="*60)
-    print("Property Ratings Model Training")
+    print(f"Property Ratings Model Training ({config['preset']})")
     print("="*60)
-    
+
+    if not os.path.exists(config["ratings_csv"]):
+        print(f"ERROR: {config['ratings_csv']} not found!")
+        print("Please run 'python rate_properties.py' first")
+        exit(1)
+
+    if not resume_path:
+        random.seed(config["seed"])
+        np.random.seed(config["seed"])
+        torch.manual_seed(config["seed"])
+
+    image_cache = None
+    if args.image_cache:
+        image_cache = DecodedImageCache(args.image_cache)
+        print(f"Using pre-decoded image cache {args.image_cache} ({len(image_cache)} images)")
+
     # Load dataset
     print("\nLoading dataset...")
-    dataset = PropertyRatingsDataset(
-        ratings_csv=PROPERTY_RATINGS_CSV,
-        transform=train_transform,
-        max_samples=None  # Use all available data
-    )
-    
+    dataset = PropertyRatingsDataset(config["ratings_csv"], transform=None, image_cache=image_cache)
     if len(dataset) == 0:
-        print(f"ERROR: No images found! Make sure {IMAGES_DIR} and {PROPERTY_RATINGS_CSV} exist.")
+        print(f"ERROR: No images found! Make sure {IMAGES_DIR} and {config['ratings_csv']} exist.")
         exit(1)
-    
-    # Split into train/val
-    train_size = int(0.8 * len(dataset))
-    val_size = len(dataset) - train_size
-    train_dataset, val_dataset = torch.utils.data.random_split(
-        dataset, [train_size, val_size]
-    )
-    
-    # Use same transform for val but apply val_transform
-    val_dataset.dataset.transform = val_transform
-    
-    # Create dataloaders
-    train_loader = DataLoader(
-        train_dataset, batch_size=BATCH_SIZE, shuffle=True, num_workers=0
+
+    # Separate dataset objects so the train and val transforms never overlap
+    train_paths, val_paths = load_or_create_split(dataset.image_paths(), config["split"],
+                                                  args.val_fraction, config["seed"])
+    train_dataset = dataset.subset(train_paths, AUGMENTATIONS[config["augmentation"]])
+    val_dataset = dataset.subset(val_paths, val_transform)
+
+    train_loader = build_loader(
+        train_dataset, batch_size=config["batch_size"], shuffle=True, **loader_kwargs(args)
     )
-    val_loader = DataLoader(
-        val_dataset, batch_size=BATCH_SIZE, shuffle=False, num_workers=0
+    val_loader = build_loader(
+        val_dataset, batch_size=config["batch_size"], shuffle=False, **loader_kwargs(args)
     )
-    
+
     print(f"Train samples: {len(train_dataset)}")
     print(f"Val samples: {len(val_dataset)}")
-    
+
     # Initialize model
     print("\nInitializing model...")
     model = NicenessModel(embed_dim=1024).to(DEVICE)
+    if not resume_path:
+        load_initial_weights(model, config["init"], DEVICE)
+    prepare_model(model, channels_last=args.channels_last, compile=args.compile)
 
-    # Load pretrained weights if available
-    if os.path.exists(PRETRAINED_PATH):
-        state_dict = torch.load(PRETRAINED_PATH, map_location=DEVICE)
-        model.load_state_dict(state_dict)
-        print(f"Loaded pretrained weights from {PRETRAINED_PATH}")
-    
     # Optimizer and loss
-    optimizer = optim.AdamW(model.parameters(), lr=LEARNING_RATE, weight_decay=0.01)
-    criterion = nn.MSELoss()  # Changed to MSE for better score prediction
-    scheduler = optim.lr_scheduler.CosineAnnealingWarmRestarts(optimizer, T_0=5, T_mult=2)
-    
-    # Training loop
-    print("\nStarting training...\n")
+    optimizer = build_optimizer(model, config["optimizer"], config["lr"])
+    criterion = nn.MSELoss()
+    scheduler = build_scheduler(optimizer, config["scheduler"], config["epochs"])
+
+    start_epoch = 1
     best_val_loss = float('inf')
     patience_counter = 0
-    
-    for epoch in range(1, EPOCHS + 1):
-        print(f"\nEpoch {epoch}/{EPOCHS}")
-        
-        train_loss = train_epoch(model, train_loader, optimizer, criterion, DEVICE)
-        val_loss = validate(model, val_loader, criterion, DEVICE)
+    if resume_path:
+        checkpoint = load_checkpoint(resume_path, model, optimizer, scheduler, DEVICE)
+        start_epoch = checkpoint["epoch"] + 1
+        best_val_loss = checkpoint["best_val_loss"]
+        patience_counter = checkpoint["patience_counter"]
+        print(f"Resumed from {resume_path} after epoch {checkpoint['epoch']} "
+              f"(best val_loss: {best_val_loss:.4f})")
+
+    profiler = TrainingProfiler(
+        enabled=args.profile,
+        trace_path=args.trace or os.path.join(args.checkpoint_dir, f"{config['preset']}_trace.jsonl"),
+        device=DEVICE,
+        num_workers=args.num_workers,
+        torch_profile=args.torch_profile,
+        profile_dir=args.profile_dir,
+    )
+
+    # Training loop
+    print("\nStarting training...\n")
+    epochs = config["epochs"]
+    for epoch in range(start_epoch, epochs + 1):
+        if patience_counter >= config["patience"]:
+            print(f"\nEarly stopping already triggered before epoch {epoch}")
+            break
+        print(f"\nEpoch {epoch}/{epochs}")
+
+        profiler.start_epoch(epoch)
+        train_loss = train_epoch(model, train_loader, optimizer, criterion, DEVICE, args.bf16, args.channels_last,
+                                 profiler)
+        profiler.end_epoch()
+        val_loss = validate(model, val_loader, criterion, DEVICE, args.bf16, args.channels_last)
         scheduler.step()
-        
+
         print(f"Train Loss: {train_loss:.4f}")
         print(f"Val Loss: {val_loss:.4f}")
         print(f"LR: {optimizer.param_groups[0]['lr']:.6f}")
-        
-        # Save checkpoint
+
         if val_loss < best_val_loss:
             best_val_loss = val_loss
             patience_counter = 0
-            checkpoint_path = os.path.join(CHECKPOINT_DIR, "best_model.pth")
-            torch.save(model.state_dict(), checkpoint_path)
-            print(f"✓ Saved best model to {checkpoint_path} (val_loss: {val_loss:.4f})")
+            torch.save(model.state_dict(), config["best_path"])
+            print(f"✓ Saved best model to {config['best_path']} (val_loss: {val_loss:.4f})")
         else:
             patience_counter += 1
             print(f"No improvement for {patience_counter} epoch(s)")
-            
+
+        save_checkpoint(last_path, model, optimizer, scheduler, epoch, best_val_loss, patience_counter, config)
+
         # Early stopping
-        if patience_counter >= EARLY_STOP_PATIENCE:
+        if patience_counter >= config["patience"]:
             print(f"\nEarly stopping triggered after {epoch} epochs")
             break
-    
-    # Save final model
-    final_path = os.path.join(CHECKPOINT_DIR, "final_model.pth")
-    torch.save(model.state_dict(), final_path)
-    print(f"\n✓ Training complete! Final model saved to {final_path}")
+
+    profiler.close()
+    if config["final_path"]:
+        torch.save(model.state_dict(), config["final_path"])
+        print(f"\n✓ Training complete! Final model saved to {config['final_path']}")
+    else:
+        print("\n✓ Training complete!")
+    print(f"Best model saved to: {config['best_path']} (val_loss: {best_val_loss:.4f})")
+    print(f"Resumable checkpoint: {last_path}")
     print("="*60)
+
+
+if __name__ == "__main__":
+    main()
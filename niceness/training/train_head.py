@@ -0,0 +1,220 @@
+"""
+Frozen-backbone training of the NicenessModel heads.
+
+Instead of running EfficientNet forward and backward every step, the
+encoder (EfficientNet-B3 features + fc) is run once per image, optionally
+over a fixed number of augmented views, and only `ava_head` (or
+`airbnb_head`) is trained on the cached features. On the ~564 rated
+property images this takes seconds on CPU.
+
+    python train_head.py --head ava --views 4 --output checkpoints/property_model.pth
+
+The result is a normal full-model state_dict (encoder weights unchanged),
+loadable anywhere a checkpoint from finetune_property_model.py is.
+"""
+
+import argparse
+import copy
+import os
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import Dataset
+from tqdm import tqdm
+
+from modeltest import NicenessModel, freeze_encoder
+from image_cache import DecodedImageCache
+from loading import build_loader
+from train import (PropertyRatingsDataset, SPLIT_PATH, VAL_FRACTION, load_or_create_split, train_transform,
+                   val_transform)
+
+# =====================
+# Configuration
+# =====================
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+RATINGS_CSV = "property_ratings.csv"
+CHECKPOINT_PATH = "final_model.pth"
+FALLBACK_CHECKPOINT_PATH = "checkpoints/best_model.pth"
+OUTPUT_PATH = "checkpoints/property_model.pth"
+BATCH_SIZE = 64
+LEARNING_RATE = 1e-3
+EPOCHS = 300
+EARLY_STOP_PATIENCE = 30
+SEED = 42
+
+
+class TransformedSubset(Dataset):
+    """Subset of a PIL-returning ratings dataset with its own transform. Samples are (image, score, index)."""
+
+    def __init__(self, dataset, indices, transform):
+        self.dataset = dataset
+        self.indices = list(indices)
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        index = self.indices[idx]
+        image, score = self.dataset[index]
+        if image is None:
+            return None, None, index
+        return self.transform(image), score, index
+
+
+@torch.no_grad()
+def extract_features(model, dataset, indices, transform, device, num_workers=0, batch_size=32):
+    """
+    Encode every image in `indices` once. Images that fail to load are skipped.
+
+    Returns (features [N, D], scores [N], kept) with the features and scores
+    on the CPU; `kept` lists the dataset index of each of the N rows.
+    """
+    model.eval()
+    loader = build_loader(TransformedSubset(dataset, indices, transform), batch_size, shuffle=False,
+                          num_workers=num_workers)
+    features, targets, kept = [], [], []
+    for images, scores, batch_indices, _ in tqdm(loader, desc="Extracting features", leave=False):
+        if images is None:
+            continue
+        features.append(model.encoder(images.to(device)).float().cpu())
+        targets.append(scores.float())
+        kept.extend(batch_indices.tolist())
+    return torch.cat(features), torch.cat(targets), kept
+
+
+def head_forward(model, head, features):
+    if head == "airbnb":
+        # Each rated photo is treated as a one-image listing
+        return model.airbnb_head(features).squeeze(1)
+    return model.forward_ava_embeddings(features)
+
+
+def train_head(model, head, train_views, train_scores, val_features, val_scores, device,
+               epochs=EPOCHS, lr=LEARNING_RATE, batch_size=BATCH_SIZE, patience=EARLY_STOP_PATIENCE, seed=SEED):
+    """
+    Train one head on cached features.
+
+    train_views: [V, N, D] features for V views of the N training images; a
+    random view is picked per sample every epoch. Returns the best val loss
+    and leaves the best head weights loaded in `model`.
+    """
+    freeze_encoder(model)
+    head_module = model.airbnb_head if head == "airbnb" else model.ava_head
+    optimizer = optim.AdamW(head_module.parameters(), lr=lr, weight_decay=0.01)
+    criterion = nn.MSELoss()
+    generator = torch.Generator().manual_seed(seed)
+
+    train_views, train_scores = train_views.to(device), train_scores.to(device)
+    val_features, val_scores = val_features.to(device), val_scores.to(device)
+    num_views, num_train = train_views.shape[:2]
+
+    best_val_loss = float("inf")
+    best_state = copy.deepcopy(head_module.state_dict())
+    patience_counter = 0
+    for epoch in range(1, epochs + 1):
+        head_module.train()
+        order = torch.randperm(num_train, generator=generator)
+        views = torch.randint(num_views, (num_train,), generator=generator)
+        for start in range(0, num_train, batch_size):
+            idx = order[start:start + batch_size]
+            preds = head_forward(model, head, train_views[views[idx], idx])
+            loss = criterion(preds, train_scores[idx])
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+        head_module.eval()
+        with torch.no_grad():
+            val_loss = criterion(head_forward(model, head, val_features), val_scores).item()
+
+        if val_loss < best_val_loss:
+            best_val_loss = val_loss
+            best_state = copy.deepcopy(head_module.state_dict())
+            patience_counter = 0
+        else:
+            patience_counter += 1
+        if epoch % 25 == 0:
+            print(f"Epoch {epoch}/{epochs}  val loss {val_loss:.4f}  (best {best_val_loss:.4f})")
+        if patience_counter >= patience:
+            print(f"Early stopping triggered after {epoch} epochs")
+            break
+
+    head_module.load_state_dict(best_state)
+    return best_val_loss
+
+
+def load_pretrained(checkpoint_path, fallback_path, device) -> NicenessModel:
+    model = NicenessModel(embed_dim=1024).to(device)
+    for path in (checkpoint_path, fallback_path):
+        if path and os.path.exists(path):
+            model.load_state_dict(torch.load(path, map_location=device))
+            print(f"Loaded weights from {path}")
+            return model
+    print("WARNING: No pretrained checkpoint found. Using ImageNet encoder with random heads")
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train a NicenessModel head on frozen encoder features")
+    parser.add_argument("--head", default="ava", choices=["ava", "airbnb"])
+    parser.add_argument("--ratings-csv", default=RATINGS_CSV)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="Starting full-model checkpoint")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="Where to save the resulting checkpoint")
+    parser.add_argument("--views", type=int, default=1,
+                        help="Augmented views per training image (1 = un-augmented val transform)")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--lr", type=float, default=LEARNING_RATE)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--split", default=SPLIT_PATH,
+                        help="Persisted train/val split shared with train.py (created if missing)")
+    parser.add_argument("--val-fraction", type=float, default=VAL_FRACTION)
+    parser.add_argument("--image-cache", default=None, help="Pre-decoded image cache prefix")
+    parser.add_argument("--num-workers", type=int, default=0)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    image_cache = DecodedImageCache(args.image_cache) if args.image_cache else None
+    dataset = PropertyRatingsDataset(args.ratings_csv, transform=None, image_cache=image_cache)
+    if len(dataset) == 0:
+        print("ERROR: No valid property images found!")
+        exit(1)
+
+    # Same persisted split as train.py, so both entry points validate on the same images
+    train_paths, val_paths = load_or_create_split(dataset.image_paths(), args.split, args.val_fraction, args.seed)
+    train_paths, val_paths = set(train_paths), set(val_paths)
+    train_indices = [i for i, (image_path, _) in enumerate(dataset.samples) if image_path in train_paths]
+    val_indices = [i for i, (image_path, _) in enumerate(dataset.samples) if image_path in val_paths]
+    print(f"Train samples: {len(train_indices)}")
+    print(f"Val samples: {len(val_indices)}")
+
+    model = load_pretrained(args.checkpoint, FALLBACK_CHECKPOINT_PATH, DEVICE)
+
+    views = []
+    for view in range(args.views):
+        transform = val_transform if args.views == 1 else train_transform
+        features, scores, kept = extract_features(model, dataset, train_indices, transform, DEVICE, args.num_workers)
+        views.append((features, scores, kept))
+        print(f"Extracted view {view + 1}/{args.views}: {tuple(features.shape)}")
+    # A view can fail to load an image the others loaded; train only on images present in every view
+    loaded = [set(kept) for _, _, kept in views]
+    common = set.intersection(*loaded)
+    if len(common) < len(set.union(*loaded)):
+        print(f"Dropped {len(set.union(*loaded)) - len(common)} image(s) missing from some views")
+    train_indices = [i for i in train_indices if i in common]
+    train_views = []
+    for features, scores, kept in views:
+        row_of = {index: row for row, index in enumerate(kept)}
+        rows = torch.tensor([row_of[i] for i in train_indices], dtype=torch.long)
+        train_views.append(features[rows])
+        train_scores = scores[rows]
+    val_features, val_scores, _ = extract_features(model, dataset, val_indices, val_transform, DEVICE,
+                                                   args.num_workers)
+
+    best_val_loss = train_head(model, args.head, torch.stack(train_views), train_scores, val_features, val_scores,
+                               DEVICE, epochs=args.epochs, lr=args.lr, seed=args.seed)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    torch.save(model.state_dict(), args.output)
+    print(f"\n✓ Saved {args.head} head model to {args.output} (val_loss: {best_val_loss:.4f})")
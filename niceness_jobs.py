@@ -0,0 +1,73 @@
+"""
+Niceness scoring job queue.
+
+Jobs live in the `niceness_jobs` table. The API enqueues a job whenever a
+property photo is uploaded and `niceness_worker.py` picks pending jobs up,
+scores them in micro-batches and writes the photo's score and the
+property's aggregated `niceness_score` back.
+
+This module must stay free of torch/model imports: it is imported by the API.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Session, select
+
+from database import NicenessJob
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+def enqueue_scoring_job(session: Session, property_id: int, image_path: str,
+                        property_image_id: Optional[int] = None) -> NicenessJob:
+    """Insert a pending scoring job and return it (committed, with its id populated)."""
+    timestamp = datetime.now().isoformat()
+    job = NicenessJob(
+        property_id=property_id,
+        image_path=str(image_path),
+        status=JOB_PENDING,
+        created_at=timestamp,
+        updated_at=timestamp,
+        property_image_id=property_image_id,
+    )
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def latest_job_for_property(session: Session, property_id: int) -> Optional[NicenessJob]:
+    statement = (
+        select(NicenessJob)
+        .where(NicenessJob.property_id == property_id)
+        .order_by(NicenessJob.id.desc())
+    )
+    return session.exec(statement).first()
+
+
+def job_to_dict(job: NicenessJob) -> dict:
+    return {
+        "job_id": job.id,
+        "property_id": job.property_id,
+        "property_image_id": job.property_image_id,
+        "status": job.status,
+        "score": job.score,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+__all__ = [
+    "JOB_PENDING",
+    "JOB_RUNNING",
+    "JOB_DONE",
+    "JOB_FAILED",
+    "enqueue_scoring_job",
+    "latest_job_for_property",
+    "job_to_dict",
+]
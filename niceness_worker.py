@@ -0,0 +1,285 @@
+"""
+Background niceness scoring worker.
+
+Run alongside the API:
+
+    python niceness_worker.py
+
+The worker loads a single NicenessModel, polls the `niceness_jobs` table for
+pending jobs enqueued by `POST /properties/{id}/upload-image`, gathers them
+into micro-batches (up to --batch-size jobs, waiting at most --max-wait
+seconds for a batch to fill) and scores each batch in one forward pass.
+Scores are written to the job row so clients can poll
+`GET /niceness/jobs/{job_id}`. Gallery photos store their own score and the
+property's `niceness_score` becomes the mean over its scored photos; with
+--embedding-cache, photos already encoded once are never re-encoded.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_engine, MockProperty, NicenessJob, PropertyImage
+from model_registry import registry
+from niceness_jobs import JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED
+from property_images import refresh_property_niceness
+from niceness.scoring.acceleration import add_acceleration_args
+from niceness.scoring.inference import RUNTIMES, load_runtime, load_image, score_batch, score_sources_cached
+
+# =====================
+# Configuration
+# =====================
+CHECKPOINT_PATH = Path(__file__).parent / "niceness" / "checkpoints" / "property_model.pth"
+BATCH_SIZE = 16
+MAX_WAIT_SECONDS = 2.0
+POLL_INTERVAL_SECONDS = 1.0
+STALE_JOB_SECONDS = 15 * 60  # A running job untouched for this long is assumed abandoned
+REQUEUE_INTERVAL_SECONDS = 60.0
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def count_pending(session: Session) -> int:
+    return len(session.exec(select(NicenessJob.id).where(NicenessJob.status == JOB_PENDING)).all())
+
+
+def claim_jobs(session: Session, limit: int) -> list[NicenessJob]:
+    """Move up to `limit` pending jobs to running, oldest first, and return them."""
+    candidate_ids = session.exec(
+        select(NicenessJob.id)
+        .where(NicenessJob.status == JOB_PENDING)
+        .order_by(NicenessJob.id)
+        .limit(limit)
+    ).all()
+
+    claimed_ids = []
+    for job_id in candidate_ids:
+        # Conditional update so two workers never claim the same job
+        result = session.execute(
+            update(NicenessJob)
+            .where(NicenessJob.id == job_id, NicenessJob.status == JOB_PENDING)
+            .values(status=JOB_RUNNING, updated_at=_now())
+        )
+        if result.rowcount == 1:
+            claimed_ids.append(job_id)
+    session.commit()
+
+    if not claimed_ids:
+        return []
+    return session.exec(
+        select(NicenessJob).where(NicenessJob.id.in_(claimed_ids)).order_by(NicenessJob.id)
+    ).all()
+
+
+def requeue_stale_jobs(session: Session, stale_after: float = STALE_JOB_SECONDS) -> int:
+    """
+    Return jobs left running by a crashed worker to the pending state.
+
+    Only jobs whose `updated_at` is older than `stale_after` seconds are
+    touched, so batches held by other live workers are never claimed twice.
+    """
+    cutoff = (datetime.now() - timedelta(seconds=stale_after)).isoformat()
+    result = session.execute(
+        update(NicenessJob)
+        .where(NicenessJob.status == JOB_RUNNING, NicenessJob.updated_at < cutoff)
+        .values(status=JOB_PENDING, updated_at=_now())
+    )
+    session.commit()
+    return result.rowcount
+
+
+def wait_for_batch(engine, batch_size: int, max_wait: float, poll_interval: float,
+                   stale_after: float = STALE_JOB_SECONDS) -> None:
+    """
+    Block until at least one job is pending, then give the batch up to `max_wait` to fill.
+
+    While idle, stale jobs of crashed workers are requeued every REQUEUE_INTERVAL_SECONDS.
+    """
+    next_requeue = 0.0
+    while True:
+        with Session(engine) as session:
+            if time.monotonic() >= next_requeue:
+                requeued = requeue_stale_jobs(session, stale_after)
+                if requeued:
+                    print(f"Requeued {requeued} stale job(s)")
+                next_requeue = time.monotonic() + REQUEUE_INTERVAL_SECONDS
+            if count_pending(session) > 0:
+                break
+        time.sleep(poll_interval)
+
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        with Session(engine) as session:
+            if count_pending(session) >= batch_size:
+                return
+        time.sleep(min(0.1, max_wait))
+
+
+def _finish_job(session: Session, job: NicenessJob, status: str, score=None, error=None) -> bool:
+    """
+    Record a claimed job's result. Returns False, writing nothing, when the
+    job is no longer ours (deleted with its photo, or requeued as stale).
+    """
+    result = session.execute(
+        update(NicenessJob)
+        .where(NicenessJob.id == job.id, NicenessJob.status == JOB_RUNNING)
+        .values(status=status, score=score, error=error, updated_at=_now())
+    )
+    return result.rowcount == 1
+
+
+def score_jobs(model, jobs: list[NicenessJob], cache=None) -> list[tuple]:
+    """
+    Score the images of a batch of jobs. Returns (job, score, error) per job.
+
+    With an EmbeddingCache, images already seen by this encoder skip the
+    encoder and are scored from their cached embedding.
+    """
+    if cache is not None:
+        scores = score_sources_cached(model, [job.image_path for job in jobs], cache)
+        return [(job, score, None if score is not None else "Failed to load image")
+                for job, score in zip(jobs, scores)]
+
+    results = []
+    images = []
+    scorable = []
+    for job in jobs:
+        try:
+            images.append(load_image(job.image_path))
+            scorable.append(job)
+        except Exception as e:
+            results.append((job, None, f"Failed to load image: {e}"))
+    scores = score_batch(model, images)
+    results.extend((job, score, None) for job, score in zip(scorable, scores))
+    return sorted(results, key=lambda result: result[0].id)
+
+
+def process_batch(session: Session, model, jobs: list[NicenessJob], cache=None) -> tuple[int, int]:
+    """Score a claimed batch of jobs and write the results back. Returns (done, failed)."""
+    try:
+        results = score_jobs(model, jobs, cache)
+    except Exception as e:
+        results = [(job, None, f"Failed to score image: {e}") for job in jobs]
+
+    done = failed = 0
+    gallery_properties = set()
+    # Jobs are ordered by id, so the newest upload for a property wins
+    for job, score, error in results:
+        if error is not None:
+            if _finish_job(session, job, JOB_FAILED, error=error):
+                failed += 1
+            continue
+        if not _finish_job(session, job, JOB_DONE, score=score):
+            continue
+
+        if job.property_image_id is not None:
+            # Gallery photo: store its score and re-aggregate the property below.
+            # The photo may have been deleted while the job was running.
+            result = session.execute(
+                update(PropertyImage)
+                .where(PropertyImage.id == job.property_image_id)
+                .values(score=score)
+            )
+            if result.rowcount == 1:
+                gallery_properties.add(job.property_id)
+        else:
+            property_obj = session.get(MockProperty, job.property_id)
+            if property_obj is not None:
+                property_obj.niceness_score = score
+                session.add(property_obj)
+        done += 1
+
+    session.flush()
+    for property_id in gallery_properties:
+        refresh_property_niceness(session, property_id)
+    session.commit()
+    return done, failed
+
+
+def run_worker(checkpoint_path, batch_size=BATCH_SIZE, max_wait=MAX_WAIT_SECONDS,
+               poll_interval=POLL_INTERVAL_SECONDS, once=False, runtime="eager", artifact_path=None,
+               embedding_cache_dir=None, acceleration=None, stale_after=STALE_JOB_SECONDS):
+    engine = get_engine()
+    with Session(engine) as session:
+        requeued = requeue_stale_jobs(session, stale_after)
+        if requeued:
+            print(f"Requeued {requeued} stale job(s) left running by a previous worker")
+
+    print(f"Loading niceness model ({runtime} runtime)...")
+    registry.register("niceness", partial(load_runtime, runtime, checkpoint_path, artifact_path,
+                                          **(acceleration or {})))
+    model = registry.get("niceness")
+
+    cache = None
+    if embedding_cache_dir:
+        if runtime not in ("eager", "int8"):
+            raise ValueError("The embedding cache needs the eager or int8 runtime")
+        from niceness.scoring.embedding_cache import EmbeddingCache
+        cache = EmbeddingCache.for_model(model, embedding_cache_dir)
+        print(f"Using embedding cache at {cache.root} ({len(cache)} embeddings)")
+    print(f"Worker ready (batch size {batch_size}, max wait {max_wait:.2f}s)")
+
+    while True:
+        if once:
+            with Session(engine) as session:
+                if count_pending(session) == 0:
+                    return
+        else:
+            wait_for_batch(engine, batch_size, max_wait, poll_interval, stale_after)
+
+        with Session(engine) as session:
+            jobs = claim_jobs(session, batch_size)
+            if not jobs:
+                continue
+            start = time.perf_counter()
+            try:
+                done, failed = process_batch(session, model, jobs, cache)
+            except Exception as e:
+                # The jobs stay running until requeue_stale_jobs returns them to the queue
+                session.rollback()
+                print(f"❌ Batch of {len(jobs)} job(s) failed: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            skipped = len(jobs) - done - failed
+            print(f"Scored batch of {len(jobs)} job(s): {done} done, {failed} failed"
+                  f"{f', {skipped} skipped (removed)' if skipped else ''} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background niceness scoring worker")
+    parser.add_argument("--checkpoint", default=str(CHECKPOINT_PATH), help="Model checkpoint path")
+    parser.add_argument("--runtime", default="eager", choices=RUNTIMES,
+                        help="CPU runtime (torchscript/onnx need --artifact)")
+    parser.add_argument("--artifact", default=None, help="Exported model from niceness/scoring/export_model.py")
+    parser.add_argument("--embedding-cache", default=None,
+                        help="Directory of a persistent encoder embedding cache (eager/int8 runtimes)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Maximum jobs per forward pass")
+    parser.add_argument("--max-wait", type=float, default=MAX_WAIT_SECONDS,
+                        help="Seconds to wait for a batch to fill once a job is pending")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS,
+                        help="Seconds between queue polls while idle")
+    parser.add_argument("--stale-after", type=float, default=STALE_JOB_SECONDS,
+                        help="Seconds after which a running job is assumed abandoned and requeued")
+    parser.add_argument("--once", action="store_true", help="Drain the queue and exit")
+    add_acceleration_args(parser)
+    args = parser.parse_args()
+
+    try:
+        run_worker(args.checkpoint, args.batch_size, args.max_wait, args.poll_interval, args.once,
+                   args.runtime, args.artifact, args.embedding_cache,
+                   {"bf16": args.bf16, "channels_last": args.channels_last, "compile": args.compile},
+                   args.stale_after)
+    except KeyboardInterrupt:
+        print("\nWorker stopped")
@@ -0,0 +1,186 @@
+"""
+Text-to-photo search over property photos with CLIP.
+
+Every property photo is encoded once into the persistent
+`embeddings/photo_store.py` store, with metadata recording which properties
+and image URLs it belongs to. The index is kept up to date incrementally:
+
+    - gallery uploads are indexed in a background task after the request
+    - apply_niceness_scores.py indexes the cover images it downloads
+    - on API startup, `sync_photo_index` indexes any photo still missing
+
+A query then costs one CLIP text encode plus a matrix-vector product over
+the stored embeddings. Properties are ranked by their best-matching photo.
+
+The CLIP model is loaded through model_registry.py the first time it is needed.
+"""
+
+import logging
+import os
+import threading
+from typing import Optional
+
+import requests
+from sqlmodel import Session, select
+
+from database import MockProperty, PropertyImage
+from embeddings.photo_store import PhotoEmbeddingStore, source_key
+from model_registry import CLIP_MODEL, CLIP_PRETRAINED, registry
+
+log = logging.getLogger(__name__)
+
+# =====================
+# Configuration
+# =====================
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+# Photos fetched per query before grouping by property
+CANDIDATE_PHOTOS = 200
+DOWNLOAD_TIMEOUT = 10
+
+_store = None
+_init_lock = threading.Lock()
+_index_lock = threading.Lock()
+
+
+def get_embedder():
+    """The shared CLIP `Embedder` from the model registry."""
+    return registry.get("clip")
+
+
+def get_store() -> PhotoEmbeddingStore:
+    """The photo store (loading it does not need the CLIP model)."""
+    global _store
+    with _init_lock:
+        if _store is None:
+            _store = PhotoEmbeddingStore(CLIP_MODEL, CLIP_PRETRAINED)
+        return _store
+
+
+def local_image_path(image_url: str) -> Optional[str]:
+    """Local file behind an /images/... URL served by the API, if it exists."""
+    if not image_url or not image_url.startswith("/images/"):
+        return None
+    path = os.path.join(IMAGES_DIR, image_url[len("/images/"):])
+    return path if os.path.exists(path) else None
+
+
+def _photos(meta) -> list:
+    """[property_id, image_url] pairs a stored photo belongs to."""
+    return list(meta.get("photos", [])) if meta else []
+
+
+def index_property_photos(items) -> int:
+    """
+    Add photos to the index. `items` are (source, property_id, image_url) with
+    `source` a local path or encoded bytes. Returns the number of photos encoded.
+    """
+    if not items:
+        return 0
+    store = get_store()
+    with _index_lock:
+        # The same photo may appear for several properties; merge them into one entry
+        sources, merged = {}, {}
+        for source, property_id, image_url in items:
+            try:
+                key = source_key(source)
+            except OSError as e:
+                log.warning(f"Cannot index {image_url}: {e}")
+                continue
+            sources.setdefault(key, source)
+            photos = _photos(merged.get(key) or store.metadata.get(key))
+            if [property_id, image_url] not in photos:
+                photos.append([property_id, image_url])
+            merged[key] = {"photos": photos}
+        keys = list(sources)
+        if all(key in store for key in keys):
+            # Metadata-only update; no need to load CLIP
+            return store.index_images(None, [sources[key] for key in keys], [merged[key] for key in keys],
+                                      keys=keys)
+        with registry.use("clip") as embedder:
+            return store.index_images(embedder, [sources[key] for key in keys], [merged[key] for key in keys],
+                                      keys=keys)
+
+
+def index_property_photos_safe(items) -> None:
+    """`index_property_photos` for background tasks: failures are logged, never raised."""
+    try:
+        encoded = index_property_photos(items)
+        if encoded:
+            log.info(f"Indexed {encoded} new photo(s) for photo search")
+    except Exception as e:
+        log.warning(f"Photo indexing failed: {e}")
+
+
+def forget_property_photo(property_id: int, image_url: str) -> None:
+    """Detach a deleted photo from a property so it no longer matches searches for it."""
+    store = get_store()
+    with _index_lock:
+        for key, meta in list(store.metadata.items()):
+            photos = _photos(meta)
+            if [property_id, image_url] in photos:
+                photos.remove([property_id, image_url])
+                store.set_metadata(key, {"photos": photos})
+        store.save()
+
+
+def sync_photo_index(session: Session) -> int:
+    """
+    Index every property photo (gallery files and cover images) not yet in the store.
+
+    Covers that are remote URLs are downloaded once; URLs already recorded in
+    the store metadata are skipped. Returns the number of photos encoded.
+    """
+    store = get_store()
+    known_urls = {url for meta in store.metadata.values() for _, url in _photos(meta)}
+    items = []
+    for image in session.exec(select(PropertyImage)).all():
+        if image.image not in known_urls and os.path.exists(image.image_path):
+            items.append((image.image_path, image.property_id, image.image))
+            known_urls.add(image.image)
+
+    for property_obj in session.exec(select(MockProperty)).all():
+        url = property_obj.image
+        if not url or url in known_urls:
+            continue
+        local_path = local_image_path(url)
+        if local_path:
+            items.append((local_path, property_obj.id, url))
+        elif url.startswith("http"):
+            try:
+                response = requests.get(url, timeout=DOWNLOAD_TIMEOUT)
+                response.raise_for_status()
+                items.append((response.content, property_obj.id, url))
+            except requests.RequestException as e:
+                log.warning(f"Could not download {url} for photo search: {e}")
+                continue
+        known_urls.add(url)
+    return index_property_photos(items)
+
+
+def search_photos(query: str, limit: int = 10, candidates: int = CANDIDATE_PHOTOS) -> list[dict]:
+    """
+    Properties ranked by their best-matching photo for a text query.
+
+    Returns [{"property_id", "score", "image"}] with `score` the cosine
+    similarity of the best photo, highest first.
+    """
+    store = get_store()
+    with registry.use("clip") as embedder:
+        query_embedding = embedder.embed_texts([query])[0].numpy()
+    best = {}
+    for _, similarity, meta in store.search(query_embedding, k=candidates)[0]:
+        for property_id, image_url in _photos(meta):
+            if property_id not in best or similarity > best[property_id]["score"]:
+                best[property_id] = {"property_id": property_id, "score": similarity, "image": image_url}
+    return sorted(best.values(), key=lambda match: match["score"], reverse=True)[:limit]
+
+
+__all__ = [
+    "get_embedder",
+    "get_store",
+    "index_property_photos",
+    "index_property_photos_safe",
+    "forget_property_photo",
+    "sync_photo_index",
+    "search_photos",
+]
@@ -0,0 +1,161 @@
+"""
+Property photo galleries.
+
+Each uploaded photo becomes a `PropertyImage` row with its own niceness
+score. Files are stored content-addressed (property_<id>_<hash>.<ext>), so
+re-uploading a photo the property already has is a no-op and only new photos
+are queued for scoring. `MockProperty.niceness_score` is the mean of the
+scored photos and is recomputed without touching the model whenever a photo
+is scored or removed.
+
+Like niceness_jobs.py this module must stay free of torch/model imports.
+"""
+
+import hashlib
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from database import MockProperty, NicenessJob, PropertyImage
+from niceness_jobs import JOB_RUNNING, enqueue_scoring_job
+
+ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp"}
+
+
+def image_extension(filename: Optional[str]) -> str:
+    """Lower-case extension of an uploaded file. Raises ValueError if it is missing or not allowed."""
+    if not filename:
+        raise ValueError("File must have a filename")
+    file_ext = filename.split(".")[-1].lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"File type not allowed. Allowed: {ALLOWED_EXTENSIONS}")
+    return file_ext
+
+
+def property_images(session: Session, property_id: int) -> list[PropertyImage]:
+    statement = (
+        select(PropertyImage)
+        .where(PropertyImage.property_id == property_id)
+        .order_by(PropertyImage.position, PropertyImage.id)
+    )
+    return session.exec(statement).all()
+
+
+def add_property_image(session: Session, property_id: int, data: bytes, file_ext: str,
+                       images_dir: Path) -> tuple[PropertyImage, Optional[NicenessJob]]:
+    """
+    Store one photo for a property and queue it for scoring.
+
+    Returns (image, job). When the property already has a photo with the same
+    content, the existing row is returned and job is None.
+    """
+    content_hash = hashlib.sha256(data).hexdigest()
+    existing = session.exec(
+        select(PropertyImage).where(
+            PropertyImage.property_id == property_id,
+            PropertyImage.content_hash == content_hash,
+        )
+    ).first()
+    if existing is not None:
+        return existing, None
+
+    filename = f"property_{property_id}_{content_hash[:16]}.{file_ext}"
+    file_path = Path(images_dir) / filename
+    with open(file_path, "wb") as f:
+        f.write(data)
+
+    position = len(property_images(session, property_id))
+    image = PropertyImage(
+        property_id=property_id,
+        image=f"/images/{filename}",
+        image_path=str(file_path),
+        content_hash=content_hash,
+        position=position,
+        created_at=datetime.now().isoformat(),
+    )
+    session.add(image)
+    session.commit()
+    session.refresh(image)
+
+    job = enqueue_scoring_job(session, property_id, file_path, property_image_id=image.id)
+    return image, job
+
+
+def remove_property_image(session: Session, image: PropertyImage) -> None:
+    """
+    Delete a photo, its file and its jobs, then refresh the property's score.
+
+    Jobs a worker has already claimed are left alone; the worker finds the
+    photo gone and skips storing its score.
+    """
+    property_id = image.property_id
+    session.execute(
+        delete(NicenessJob)
+        .where(NicenessJob.property_image_id == image.id, NicenessJob.status != JOB_RUNNING)
+    )
+    session.delete(image)
+    session.commit()
+    if os.path.exists(image.image_path):
+        os.remove(image.image_path)
+
+    property_obj = session.get(MockProperty, property_id)
+    if property_obj is not None:
+        if property_obj.image == image.image:
+            remaining = property_images(session, property_id)
+            property_obj.image = remaining[0].image if remaining else None
+        refresh_property_niceness(session, property_id, property_obj)
+        session.commit()
+
+
+def aggregate_niceness(scores: list[float]) -> Optional[float]:
+    """Property-level niceness from per-photo scores (mean of the scored photos)."""
+    scores = [score for score in scores if score is not None]
+    if not scores:
+        return None
+    return sum(scores) / len(scores)
+
+
+def refresh_property_niceness(session: Session, property_id: int,
+                              property_obj: Optional[MockProperty] = None) -> Optional[float]:
+    """
+    Recompute `niceness_score` from the stored per-photo scores (no model needed).
+
+    Properties without scored gallery photos keep their existing score (e.g.
+    the cover score, or the last one while new photos wait to be scored).
+    The caller commits.
+    """
+    property_obj = property_obj or session.get(MockProperty, property_id)
+    if property_obj is None:
+        return None
+    score = aggregate_niceness([image.score for image in property_images(session, property_id)])
+    if score is not None:
+        property_obj.niceness_score = score
+        session.add(property_obj)
+    return property_obj.niceness_score
+
+
+def property_image_to_dict(image: PropertyImage) -> dict:
+    return {
+        "id": image.id,
+        "property_id": image.property_id,
+        "image": image.image,
+        "position": image.position,
+        "score": image.score,
+        "created_at": image.created_at,
+    }
+
+
+__all__ = [
+    "ALLOWED_EXTENSIONS",
+    "image_extension",
+    "property_images",
+    "add_property_image",
+    "remove_property_image",
+    "aggregate_niceness",
+    "refresh_property_niceness",
+    "property_image_to_dict",
+]
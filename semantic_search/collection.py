@@ -1,14 +1,12 @@
 import chromadb
 from chromadb import Settings
-from sentence_transformers import SentenceTransformer
-
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from model_registry import registry
 
 
 def embed_text(text: str):
-    """Generate embeddings using SentenceTransformer"""
+    """Generate embeddings using SentenceTransformer (loaded on first use)"""
     cleaned_text = " ".join(text.split())
-    embedding = model.encode(cleaned_text, convert_to_tensor=False)
+    embedding = registry.get("sentence-transformer").encode(cleaned_text, convert_to_tensor=False)
     return embedding.tolist()
 
 class Collection:
@@ -0,0 +1,52 @@
+"""
+Startup timeline for the API process.
+
+Records how long after process start each startup milestone was reached
+(imports finished, database ready, first model loaded, search indexes
+built) and prints one line per milestone:
+
+    [startup] +0.84s imports
+    [startup] +1.02s database ready
+
+Times are measured from when the OS started the process, so interpreter
+boot and module imports are included. GET /startup returns the same events.
+"""
+
+import os
+import threading
+import time
+
+
+def _process_age_seconds() -> float:
+    """Seconds since this process started (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 is the start time in clock ticks since boot; the command name may contain spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupTimeline:
+    def __init__(self):
+        self.start = time.perf_counter() - _process_age_seconds()
+        self.events = []
+        self.lock = threading.Lock()
+
+    def mark(self, event: str) -> float:
+        """Record `event` and return the seconds elapsed since process start."""
+        elapsed = time.perf_counter() - self.start
+        with self.lock:
+            self.events.append({"event": event, "seconds": round(elapsed, 3)})
+        print(f"[startup] +{elapsed:.2f}s {event}")
+        return elapsed
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {"events": list(self.events)}
+
+
+timeline = StartupTimeline()
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+# The API modules import each other as top-level modules (database, models, geo, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """A fresh SQLite database with every table created."""
+    monkeypatch.setenv("SQLITE_DB_PATH", str(tmp_path / "test.db"))
+    import database
+    engine = database.init()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    """Shrink the shared HTTP retry backoff so retry tests run quickly."""
+    import http_retry
+    monkeypatch.setattr(http_retry, "BACKOFF_SECONDS", 0.01)
+
+
+@pytest.fixture
+def stub_server():
+    """
+    Start a stub API server: `stub_server(start_in_background, **options)`
+    returns whatever `start_in_background` does. Every server started is shut
+    down after the test.
+    """
+    servers = []
+
+    def start(start_in_background, **kwargs):
+        server, url = start_in_background(**kwargs)
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,120 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session, select
+
+from database import EpcCacheEntry
+from enrichment import epc
+from enrichment.epc_stub_server import fake_record, start_in_background
+from models import Property
+from models.costs import COST_VERSION
+
+pytestmark = pytest.mark.usefixtures("fast_backoff")
+
+
+def queries(n, postcode="S1 4BT"):
+    return [(f"{i} Broad Lane", postcode) for i in range(1, n + 1)]
+
+
+def make_property(session, address_line_1, postcode="S1 4BT", **fields):
+    contract_start = datetime(2026, 9, 1, tzinfo=timezone.utc)
+    property_obj = Property(
+        address_line_1=address_line_1, address_line_2="", city="Sheffield", postcode=postcode,
+        latitude=53.38, longitude=-1.47, bedrooms=4, bathrooms=2, unihomes_bills=0, rent_weekly=120.0,
+        contract_start=contract_start, contract_end=contract_start + timedelta(days=300), **fields,
+    )
+    session.add(property_obj)
+    return property_obj
+
+
+def test_fetch_epcs_stays_under_the_rate_limit(stub_server):
+    rate = 10
+    # A token bucket allows its burst on top of `rate` within any one-second window
+    server, search_url = stub_server(start_in_background, max_rps=2 * rate)
+
+    start = time.perf_counter()
+    results = epc.fetch_epcs(queries(25), max_workers=8, rate=rate, base_url=search_url)
+    elapsed = time.perf_counter() - start
+
+    assert server.counters["throttled"] == 0
+    assert server.counters["requests"] == 25
+    assert elapsed >= (25 - rate) / rate * 0.9
+    assert len(results) == 25
+
+
+def test_fetch_epcs_retries_429(stub_server):
+    server, search_url = stub_server(start_in_background, max_rps=5)
+
+    results = epc.fetch_epcs(queries(12), max_workers=8, rate=1000, base_url=search_url)
+
+    assert server.counters["throttled"] > 0
+    assert results == {epc.epc_cache_key(address, postcode): fake_record(address, postcode)
+                       for address, postcode in queries(12)}
+
+
+def test_non_retryable_status_skips_the_address(stub_server):
+    server, search_url = stub_server(start_in_background)
+
+    # The stub answers 404 outside the search path, which must not be retried or raised
+    assert epc.fetch_epcs(queries(3), rate=1000, base_url=f"{search_url}/missing") == {}
+
+
+def test_cached_epcs_reuses_found_records_and_misses(stub_server, engine):
+    server, search_url = stub_server(start_in_background)
+    wanted = queries(3) + [("4 Broad Lane", "S1 9ZZ")]
+    with Session(engine) as session:
+        first = epc.cached_epcs(session, wanted, base_url=search_url, rate=1000)
+        second = epc.cached_epcs(session, wanted, base_url=search_url, rate=1000)
+
+    assert first == second
+    assert first[epc.epc_cache_key("4 Broad Lane", "S1 9ZZ")] is None
+    assert server.counters["requests"] == 4
+
+
+def test_expired_cache_entries_are_refetched(stub_server, engine):
+    server, search_url = stub_server(start_in_background)
+    wanted = queries(3)
+    with Session(engine) as session:
+        epc.cached_epcs(session, wanted, base_url=search_url, rate=1000)
+        entry = session.get(EpcCacheEntry, epc.epc_cache_key(*wanted[0]))
+        entry.expires_at = (datetime.now() - timedelta(seconds=1)).isoformat()
+        session.add(entry)
+        session.commit()
+
+        epc.cached_epcs(session, wanted, base_url=search_url, rate=1000)
+        entry = session.get(EpcCacheEntry, epc.epc_cache_key(*wanted[0]))
+
+    assert server.counters["requests"] == 4
+    assert entry.expires_at > (datetime.now() + timedelta(days=epc.CACHE_TTL_DAYS - 1)).isoformat()
+
+
+def test_enrich_properties_sets_columns(stub_server, engine):
+    server, search_url = stub_server(start_in_background)
+    with Session(engine) as session:
+        make_property(session, "1 Broad Lane")
+        make_property(session, "2 Broad Lane")
+        make_property(session, "3 Nowhere Road", postcode="S1 9ZZ")
+        session.commit()
+
+        stats = epc.enrich_properties(session, base_url=search_url, rate=1000)
+        properties = {p.address_line_1: p for p in session.exec(select(Property)).all()}
+
+        assert stats == {"properties": 3, "enriched": 2, "not_found": 1, "failed": 0}
+        for address in ("1 Broad Lane", "2 Broad Lane"):
+            record = fake_record(address, "S1 4BT")
+            property_obj = properties[address]
+            consumption = int(record["energy-consumption-current"]) * float(record["total-floor-area"])
+            assert property_obj.epc_rating == record["current-energy-rating"]
+            assert property_obj.floor_area_m2 == float(record["total-floor-area"])
+            assert property_obj.energy_consumption_kwh == consumption
+            assert property_obj.energy_cost_annual == pytest.approx(property_obj.get_energy_cost_estimate(consumption))
+            assert property_obj.epc_updated_at is not None
+            assert property_obj.cost_version == COST_VERSION
+        missing = properties["3 Nowhere Road"]
+        assert missing.epc_rating is None and missing.energy_cost_annual is None
+        assert server.counters["requests"] == 3
+
+        # Only the property without an EPC is looked at again, and its miss comes from the cache
+        assert epc.enrich_properties(session, base_url=search_url, rate=1000)["properties"] == 1
+        assert server.counters["requests"] == 3
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, select
+
+from database import MockProperty, PostcodeLocation
+from geo import geocoding
+from geo.postcodes_stub_server import fake_location, start_in_background
+
+pytestmark = pytest.mark.usefixtures("fast_backoff")
+
+
+def postcodes(n):
+    return [f"S{i // 90 + 1} {i % 9 + 1}{chr(65 + i % 10)}{chr(65 + i // 10 % 9)}" for i in range(n)]
+
+
+def test_bulk_lookups_are_chunked_at_100(stub_server):
+    server, base_url = stub_server(start_in_background)
+    wanted = postcodes(250)
+
+    results = geocoding.lookup_postcodes(wanted, base_url=base_url)
+
+    assert server.counters["bulk_requests"] == 3
+    assert server.counters["postcodes"] == 250
+    assert results == {geocoding.normalize_postcode(p): fake_location(p) for p in wanted}
+
+
+def test_retries_injected_429(stub_server):
+    server, base_url = stub_server(start_in_background, fail_every=2)
+    wanted = postcodes(300)
+
+    results = geocoding.lookup_postcodes(wanted, base_url=base_url, max_workers=1)
+
+    assert server.counters["throttled"] > 0
+    assert len(results) == 300
+    assert all(location is not None for location in results.values())
+
+
+def test_non_retryable_status_skips_the_chunk(stub_server):
+    server, base_url = stub_server(start_in_background)
+
+    # The stub answers 404 outside /postcodes, which must not be retried or raised
+    assert geocoding.lookup_postcodes(["S1 2AB"], base_url=f"{base_url}/missing") == {}
+    assert server.counters["requests"] == 0
+
+
+def test_found_postcodes_and_misses_are_cached(stub_server, engine):
+    server, base_url = stub_server(start_in_background)
+    with Session(engine) as session:
+        first = geocoding.geocode_postcodes(session, ["s12ab", "S1 9ZZ"], base_url=base_url)
+        requests_after_first = server.counters["requests"]
+        second = geocoding.geocode_postcodes(session, ["S1 2AB", "s19zz"], base_url=base_url)
+
+    assert first == second == {"S1 2AB": fake_location("S1 2AB"), "S1 9ZZ": None}
+    assert requests_after_first == 1
+    assert server.counters["requests"] == 1
+
+
+def test_cached_misses_expire(stub_server, engine):
+    server, base_url = stub_server(start_in_background)
+    with Session(engine) as session:
+        geocoding.geocode_postcodes(session, ["S1 9ZZ"], base_url=base_url)
+        entry = session.exec(select(PostcodeLocation).where(PostcodeLocation.postcode == "S1 9ZZ")).one()
+        entry.fetched_at = (datetime.now() - timedelta(days=geocoding.NOT_FOUND_TTL_DAYS + 1)).isoformat()
+        session.add(entry)
+        session.commit()
+
+        geocoding.geocode_postcodes(session, ["S1 9ZZ"], base_url=base_url)
+
+    assert server.counters["bulk_requests"] == 2
+
+
+def test_backfill_property_locations_sets_columns(stub_server, engine):
+    server, base_url = stub_server(start_in_background)
+    addresses = ["1 Broad Lane, Sheffield S1 4BT", "2 Broad Lane, Sheffield s14bt",
+                 "3 West Street, Sheffield S1 4EZ", "Flat 9, Nowhere S1 9ZZ", "No postcode here"]
+    with Session(engine) as session:
+        for address in addresses:
+            session.add(MockProperty(price_per_person=120, city="Sheffield", address=address, bedrooms=3,
+                                     bathrooms=1, distance=10, vibe="quiet", bills_included=True))
+        session.commit()
+
+        stats = geocoding.backfill_property_locations(session, base_url=base_url)
+        properties = {p.address: p for p in session.exec(select(MockProperty)).all()}
+
+    assert stats == {"properties": 5, "geocoded": 3, "no_postcode": 1, "not_found": 1}
+    assert server.counters["bulk_requests"] == 1
+    for address, postcode in [(addresses[0], "S1 4BT"), (addresses[1], "S1 4BT"), (addresses[2], "S1 4EZ")]:
+        assert properties[address].postcode == postcode
+        assert (properties[address].latitude, properties[address].longitude) == fake_location(postcode)
+    assert properties[addresses[3]].postcode == "S1 9ZZ"
+    assert properties[addresses[3]].latitude is None
+    assert properties[addresses[4]].postcode is None